@@ -1,7 +1,51 @@
+import re
+
 import usaddress
 
+DIRECTIONALS = frozenset(['N', 'S', 'E', 'W'])
+
+DIRECTIONAL_WORDS = frozenset(['NORTH', 'SOUTH', 'EAST', 'WEST'])
+"""
+Street names that usaddress can tag as a directional when there's no
+street type, like "1234 E SOUTH".  Addresses like these aren't handled by
+the fast path.
+"""
+
+STREET_TYPES = frozenset([
+    'AVE', 'BLVD', 'CIR', 'CT', 'DR', 'HWY', 'LN', 'PKWY', 'PL', 'RD', 'ST',
+    'TER', 'WAY',
+])
+
+OCCUPANCY_WORDS = frozenset([
+    'APT', 'BLDG', 'BSMT', 'DEPT', 'FL', 'FLR', 'FLOOR', 'FRNT', 'FRONT',
+    'LOT', 'LOWR', 'OFC', 'PH', 'REAR', 'RM', 'ROOM', 'SIDE', 'SPC', 'STE',
+    'SUITE', 'TRLR', 'UNIT', 'UPPR',
+])
+"""
+Words that usaddress can tag as part of an occupancy, which we drop from
+anonymized addresses.  Addresses containing these aren't handled by the
+fast path.
+"""
+
+STREET_NAME_RE = re.compile(r'^[A-Z]{2,}$')
+NUMBERED_STREET_NAME_RE = re.compile(r'^\d+(ST|ND|RD|TH)$')
+
+
 class AddressAnonymizer(object):
-    """Anonymize addresses to the 100 block"""
+    """
+    Anonymize addresses to the 100 block
+
+    Most addresses in the data look like "1234 W MADISON ST": an address
+    number, a directional, one or two words of a street name and an
+    optional street type.  None of these components are dropped, so these
+    addresses are anonymized by rounding the number, without parsing them
+    with usaddress, which is much slower.  Everything else is parsed.
+
+    Args:
+        fast_path (bool): Anonymize common address formats without
+            parsing them with usaddress.
+
+    """
     skip_component_types = [
         'AddressNumberSuffix',
         'OccupancyIdentifier',
@@ -9,24 +53,70 @@ class AddressAnonymizer(object):
     ]
     """Don't include address components of these types in the anonymized output"""
 
-    def __init__(self):
+    def __init__(self, fast_path=True):
+        self.fast_path = fast_path
         self._cache = {}
 
     def anonymize(self, address):
         try:
             return self._cache[address]
         except KeyError:
-            parsed = usaddress.parse(address)
-            anonymized = ' '.join(self._anonymize_parsed(parsed))
+            anonymized = None
+            if self.fast_path:
+                anonymized = self._anonymize_common(address)
+            if anonymized is None:
+                parsed = usaddress.parse(address)
+                anonymized = ' '.join(self._anonymize_parsed(parsed))
             self._cache[address] = anonymized
             return anonymized
 
+    def _anonymize_common(self, address):
+        """
+        Anonymize an address in the common "1234 W MADISON ST" format
+
+        Returns:
+            The anonymized address, or ``None`` if the address isn't in the
+            common format.
+
+        """
+        tokens = address.split()
+        if len(tokens) < 3 or len(tokens) > 5:
+            return None
+
+        number, directional = tokens[0], tokens[1]
+        if not number.isdigit() or directional not in DIRECTIONALS:
+            return None
+
+        names = tokens[2:]
+        if len(names) > 1 and names[-1] in STREET_TYPES:
+            names = names[:-1]
+        elif len(names) == 1 and names[0] in DIRECTIONAL_WORDS:
+            return None
+
+        if len(names) > 2:
+            return None
+
+        # Numbered street names, like "63RD", can be confused with floors,
+        # like "2ND", after the street name
+        if not (STREET_NAME_RE.match(names[0]) or
+                NUMBERED_STREET_NAME_RE.match(names[0])):
+            return None
+
+        for name in names:
+            if name in OCCUPANCY_WORDS:
+                return None
+        for name in names[1:]:
+            if not STREET_NAME_RE.match(name):
+                return None
+
+        return ' '.join([self._anonymize_address_number(number)] + tokens[1:])
+
     def _anonymize_parsed(self, components):
         anonymized = []
         for c, c_type in components:
             if c_type == 'AddressNumber':
                 c = self._anonymize_address_number(c)
-            elif c_type in self.skip_component_types: 
+            elif c_type in self.skip_component_types:
                 continue
 
             anonymized.append(c)
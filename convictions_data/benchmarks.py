@@ -0,0 +1,180 @@
+"""
+Benchmarks for the cleaning and parsing code that runs for every record
+
+Each benchmark is a function that takes a list of synthetic raw records,
+from ``convictions_data.synthetic``, and returns a function to time and
+the number of items that function processes.  Use the ``run_benchmarks``
+management command to run them and store the results.
+
+"""
+from collections import OrderedDict
+import subprocess
+import timeit
+
+from convictions_data import statute
+from convictions_data.address import AddressAnonymizer
+from convictions_data.cleaner import CityStateCleaner, CityStateSplitter
+from convictions_data.models import Disposition, RawDisposition
+from convictions_data.synthetic import RawDispositionGenerator
+
+BENCHMARKS = OrderedDict()
+"""Benchmark functions, by name"""
+
+STATUTE_ERRORS = (statute.StatuteFormatError, statute.ILCSLookupError,
+    statute.MultipleMatchingILCSError)
+
+
+def benchmark(fn):
+    """Register a benchmark function"""
+    BENCHMARKS[fn.__name__] = fn
+    return fn
+
+
+@benchmark
+def parse_statute(records):
+    statutes = [r['statute'] for r in records]
+
+    def run():
+        for s in statutes:
+            try:
+                statute.parse_statute(s)
+            except STATUTE_ERRORS:
+                pass
+
+    return run, len(statutes)
+
+
+@benchmark
+def strip_attempted_statute(records):
+    statutes = [r['statute'] for r in records]
+
+    def run():
+        for s in statutes:
+            statute.strip_attempted_statute(s)
+
+    return run, len(statutes)
+
+
+@benchmark
+def split_city_state(records):
+    city_states = [r['city_state'] for r in records if r['city_state']]
+
+    def run():
+        for city_state in city_states:
+            CityStateSplitter.split_city_state(city_state)
+
+    return run, len(city_states)
+
+
+@benchmark
+def clean_city_state(records):
+    cities_states = [CityStateSplitter.split_city_state(r['city_state'])
+                     for r in records if r['city_state']]
+
+    def run():
+        for city, state in cities_states:
+            CityStateCleaner.clean_city_state(city, state)
+
+    return run, len(cities_states)
+
+
+@benchmark
+def parse_date(records):
+    dates = [r[field] for r in records
+             for field in ('dob', 'arrest_date', 'initial_date', 'chrgdispdate')]
+
+    def run():
+        for d in dates:
+            Disposition._parse_date(d)
+
+    return run, len(dates)
+
+
+@benchmark
+def parse_sentence(records):
+    sentences = [r[field] for r in records for field in ('minsent', 'maxsent')]
+
+    def run():
+        for s in sentences:
+            Disposition._parse_sentence(s)
+
+    return run, len(sentences)
+
+
+@benchmark
+def anonymize_address(records):
+    addresses = [r['st_address'] for r in records if r['st_address']]
+
+    def run():
+        # A new anonymizer each run, so results aren't cached between runs
+        anonymizer = AddressAnonymizer()
+        for address in addresses:
+            anonymizer.anonymize(address)
+
+    return run, len(addresses)
+
+
+@benchmark
+def load_from_raw(records):
+    """
+    Create ``Disposition`` models from unsaved raw records
+
+    This includes the database queries that loading some fields runs.
+    """
+    raw_dispositions = [RawDisposition(**r) for r in records]
+
+    def run():
+        for raw in raw_dispositions:
+            Disposition(raw_disposition=raw)
+
+    return run, len(raw_dispositions)
+
+
+def run_benchmarks(names=None, num_records=1000, repeat=5, seed=0):
+    """
+    Run benchmarks
+
+    Args:
+        names (list): Names of the benchmarks to run.  Default is to run
+            all of them.
+        num_records (int): Number of synthetic raw records to generate for
+            the benchmarks.
+        repeat (int): Number of times to run each benchmark.
+        seed: Seed for generating the records, so the same records are
+            used each time.
+
+    Returns:
+        Ordered dictionary keyed by benchmark name.  Values are
+        dictionaries with the number of ``items`` processed, the fastest
+        (``best``), ``median`` and ``mean`` run times in seconds and the
+        number of ``items_per_second`` in the fastest run.
+
+    """
+    records = list(RawDispositionGenerator(seed).records(num_records))
+    results = OrderedDict()
+    for name, fn in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+
+        run, num_items = fn(records)
+        timings = sorted(timeit.repeat(run, repeat=repeat, number=1))
+        best = timings[0]
+        results[name] = {
+            'items': num_items,
+            'best': round(best, 6),
+            'median': round(timings[len(timings) // 2], 6),
+            'mean': round(sum(timings) / len(timings), 6),
+            'items_per_second': round(num_items / best, 1) if best else None,
+        }
+
+    return results
+
+
+def get_commit():
+    """Return the abbreviated hash of the current git commit, if any"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.STDOUT).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
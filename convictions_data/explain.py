@@ -0,0 +1,179 @@
+"""
+Show the query plans of the queries that the analysis depends on
+
+The exports and reports combine filters on disposition dates, case numbers,
+charge classes and geographies.  The composite and partial indexes for
+these are added by migrations, but nothing checks that the database
+actually uses them.  This runs the key QuerySets under ``EXPLAIN`` and
+reports which indexes each plan uses, so a change to a query or an index
+that makes a plan fall back to a sequential scan can be caught.
+
+Plans depend on the size of the tables, so on a small database, like the
+test database, the planner may not use an index even though it would on
+the full data.
+
+"""
+from collections import namedtuple, OrderedDict
+import re
+
+from django.db import connections
+
+from convictions_data.models import Conviction, Disposition
+from convictions_data.query import START_DATE
+
+PLAN_INDEX_RES = (
+    # PostgreSQL
+    re.compile(r'Index (?:Only )?Scan (?:Backward )?using (\S+)'),
+    re.compile(r'Bitmap Index Scan on (\S+)'),
+    # SQLite
+    re.compile(r'USING (?:COVERING )?INDEX (\S+)'),
+)
+"""Regular expressions matching the name of an index used in a plan"""
+
+WorkloadQuery = namedtuple('WorkloadQuery', ['name', 'queryset', 'index'])
+"""
+A query in the analysis workload
+
+``index`` is part of the definition of the index that the query is
+expected to use, for example ``(case_number, chrgdispdate)``.
+"""
+
+
+def explain(queryset, analyze=False):
+    """
+    Return the query plan of a QuerySet
+
+    Args:
+        queryset (QuerySet): Query to explain.
+        analyze (bool): Run the query and include the actual timings and
+            row counts in the plan.  PostgreSQL only.
+
+    Returns:
+        List of the lines of the plan.
+
+    """
+    connection = connections[queryset.db]
+    sql, params = queryset.query.sql_with_params()
+    if connection.vendor == 'postgresql':
+        prefix = "EXPLAIN ANALYZE " if analyze else "EXPLAIN "
+    elif connection.vendor == 'sqlite':
+        prefix = "EXPLAIN QUERY PLAN "
+    else:
+        raise ValueError("Can't explain queries for the {} backend".format(
+            connection.vendor))
+
+    cursor = connection.cursor()
+    cursor.execute(prefix + sql, params)
+    # SQLite returns the plan description in the last column
+    return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_indexes(plan):
+    """Return the names of the indexes used in a query plan"""
+    names = []
+    for line in plan:
+        for regex in PLAN_INDEX_RES:
+            for name in regex.findall(line):
+                name = name.strip('"')
+                if name not in names:
+                    names.append(name)
+
+    return names
+
+
+def index_definitions(using='default'):
+    """
+    Return a dictionary of index names to their definitions
+
+    Quotes are removed from the definitions so they can be compared
+    between databases.
+    """
+    connection = connections[using]
+    cursor = connection.cursor()
+    if connection.vendor == 'postgresql':
+        cursor.execute("SELECT indexname, indexdef FROM pg_indexes "
+                       "WHERE schemaname = current_schema()")
+    else:
+        cursor.execute("SELECT name, sql FROM sqlite_master "
+                       "WHERE type = 'index' AND sql IS NOT NULL")
+
+    return dict((name, definition.replace('"', ''))
+                for name, definition in cursor.fetchall())
+
+
+def get_workload():
+    """
+    Return the key queries of the analysis
+
+    Returns:
+        List of ``WorkloadQuery`` tuples.
+
+    """
+    geography = Conviction.objects.exclude(community_area=None)\
+        .values_list('community_area', 'place', 'iucr_category').first()
+    community_area_id, place_id, iucr_category = geography or (0, 0, "")
+
+    return [
+        WorkloadQuery('in_analysis',
+            Disposition.objects.in_analysis()
+                .order_by('case_number', 'chrgdispdate')
+                .values_list('id', flat=True),
+            "(case_number, chrgdispdate) WHERE"),
+        WorkloadQuery('initial_dispositions',
+            Disposition.objects.in_analysis().from_initial_chrgdispdate()
+                .values_list('id', flat=True),
+            "(case_number, chrgdispdate)"),
+        WorkloadQuery('class_change',
+            Disposition.objects.filter(initial_date__gte=START_DATE,
+                chrgclass='4', final_chrgclass='3')
+                .values_list('case_number', flat=True).distinct(),
+            "(chrgclass, final_chrgclass)"),
+        WorkloadQuery('community_area_category',
+            Conviction.objects.filter(community_area=community_area_id,
+                iucr_category=iucr_category),
+            "(community_area_id, iucr_category)"),
+        WorkloadQuery('place_category',
+            Conviction.objects.filter(place=place_id,
+                iucr_category=iucr_category),
+            "(place_id, iucr_category)"),
+        WorkloadQuery('community_area_statutes',
+            Conviction.objects.filter(community_area=community_area_id)
+                .most_common_statutes(),
+            "(community_area_id, lower("),
+    ]
+
+
+def check_workload(names=None, analyze=False, using='default'):
+    """
+    Explain the queries of the analysis workload
+
+    Args:
+        names (list): Only explain the queries with these names.  Default
+            is to explain all of them.
+        analyze (bool): Run the queries and include their actual timings
+            in the plans.  PostgreSQL only.
+
+    Returns:
+        Ordered dictionary keyed by query name.  Values are dictionaries
+        with the lines of the ``plan``, the names of the ``indexes`` it
+        uses, the ``expected_index`` and whether the plan ``uses_expected``
+        index.
+
+    """
+    definitions = index_definitions(using)
+    results = OrderedDict()
+    for query in get_workload():
+        if names and query.name not in names:
+            continue
+
+        plan = explain(query.queryset.using(using), analyze=analyze)
+        indexes = plan_indexes(plan)
+        results[query.name] = {
+            'plan': plan,
+            'indexes': indexes,
+            'expected_index': query.index,
+            'uses_expected': any(query.index in definitions.get(name, "")
+                                 for name in indexes),
+        }
+
+    return results
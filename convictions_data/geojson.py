@@ -0,0 +1,84 @@
+"""
+Streaming GeoJSON output
+
+djgeojson's ``Serializer`` builds a dictionary for the entire
+FeatureCollection and dumps it all at once.  The functions in this module
+write the same output, byte for byte, one feature at a time.  They build
+the same dictionaries that djgeojson does, in the same order, so the keys
+are serialized in the same order.
+
+"""
+import json
+
+from django.contrib.gis.geos import GEOSGeometry
+
+from djgeojson import GEOJSON_DEFAULT_SRID
+from djgeojson.serializers import DjangoGeoJSONEncoder
+
+_FEATURES_PLACEHOLDER = "__FEATURES__"
+
+
+def get_crs(srid=GEOJSON_DEFAULT_SRID):
+    """Return the crs member of a FeatureCollection, like djgeojson"""
+    crs = {}
+    crs["type"] = "link"
+    properties = {}
+    properties["href"] = "http://spatialreference.org/ref/epsg/%s/" % (str(srid))
+    properties["type"] = "proj4"
+    crs["properties"] = properties
+    return crs
+
+
+def feature(properties, geometry, srid=GEOJSON_DEFAULT_SRID):
+    """
+    Build a GeoJSON Feature dictionary the way djgeojson does
+
+    Args:
+        properties: Iterable of (name, value) pairs, in order.
+        geometry: The feature's geometry, as a ``GEOSGeometry`` or a
+            string representation.  It should already be simplified, if
+            necessary.
+        srid (int): Output SRID.  The geometry is transformed if it has a
+            different SRID.
+
+    Returns:
+        Dictionary representing the feature.
+
+    """
+    current = {"type": "Feature", "properties": {}}
+    if geometry is not None and not isinstance(geometry, GEOSGeometry):
+        geometry = GEOSGeometry(geometry)
+    if geometry is not None and geometry.srid and geometry.srid != srid:
+        geometry.transform(srid)
+    current['geometry'] = geometry
+    for name, value in properties:
+        current['properties'][name] = value
+
+    return current
+
+
+def iter_feature_collection(features, srid=GEOJSON_DEFAULT_SRID):
+    """
+    Generate chunks of a serialized GeoJSON FeatureCollection
+
+    Args:
+        features: Iterable of dictionaries as returned by ``feature()``.
+        srid (int): SRID used for the crs member.
+
+    Yields:
+        Strings that, when concatenated, are the same as the output of
+        djgeojson's ``Serializer.serialize()`` for the same features.
+
+    """
+    feature_collection = {"type": "FeatureCollection",
+                          "features": [_FEATURES_PLACEHOLDER]}
+    feature_collection["crs"] = get_crs(srid)
+    prefix, suffix = json.dumps(feature_collection,
+        cls=DjangoGeoJSONEncoder).split(json.dumps(_FEATURES_PLACEHOLDER))
+
+    yield prefix
+    for i, f in enumerate(features):
+        if i > 0:
+            yield ", "
+        yield json.dumps(f, cls=DjangoGeoJSONEncoder)
+    yield suffix
@@ -0,0 +1,51 @@
+from datetime import datetime
+from optparse import make_option
+
+from django.core.management import base
+
+from convictions_data.profiling import CommandProfiler
+
+class BaseCommand(base.BaseCommand):
+    """
+    Base class for this app's management commands
+
+    This adds a ``--profile`` option to every command that reports the
+    number of SQL queries, the time spent in the database, the slowest
+    and most repeated statements, CPU time and peak memory use of the
+    command.
+    """
+    option_list = base.BaseCommand.option_list + (
+        make_option('--profile',
+            action='store_true',
+            default=False,
+            help=("Record the queries, time and memory used by the command "
+                  "and write a JSON report")),
+        make_option('--profile-output',
+            action='store',
+            dest='profile_output',
+            default=None,
+            help=("Write the profile report to this file.  Default is "
+                  "<command>_profile_<timestamp>.json in the current "
+                  "directory")),
+    )
+
+    def get_command_name(self):
+        return self.__module__.rsplit('.', 1)[-1]
+
+    def execute(self, *args, **options):
+        if not options.get('profile'):
+            return super(BaseCommand, self).execute(*args, **options)
+
+        command_name = self.get_command_name()
+        profiler = CommandProfiler(command_name, args)
+        profiler.start()
+        try:
+            return super(BaseCommand, self).execute(*args, **options)
+        finally:
+            profiler.stop()
+            path = options.get('profile_output') or \
+                "{}_profile_{}.json".format(command_name,
+                    datetime.now().strftime("%Y%m%d%H%M%S"))
+            profiler.write(path)
+            self.stderr.write(profiler.summary())
+            self.stderr.write("Wrote profile to {}".format(path))
@@ -0,0 +1,36 @@
+from optparse import make_option
+
+from django.db import transaction
+
+from convictions_data.management.base import BaseCommand
+from convictions_data.models import AnonymizedAddress, Disposition
+
+class Command(BaseCommand):
+    help = ("Anonymize and store disposition addresses that haven't already "
+            "been anonymized, for exporting public data")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size',
+            action='store',
+            type='int',
+            dest='batch_size',
+            default=1000,
+            help="Number of addresses to store in each query",
+        ),
+        make_option('--rebuild',
+            action='store_true',
+            default=False,
+            help=("Delete the stored anonymized addresses first, for "
+                  "example after changing how addresses are anonymized"),
+        ),
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['rebuild']:
+                AnonymizedAddress.objects.all().delete()
+
+            num_anonymized = Disposition.objects.all().anonymize_addresses(
+                batch_size=options['batch_size'])
+
+        self.stdout.write("Anonymized {} new addresses".format(num_anonymized))
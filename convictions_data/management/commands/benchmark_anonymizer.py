@@ -0,0 +1,62 @@
+from optparse import make_option
+import time
+
+
+from convictions_data.address import AddressAnonymizer
+from convictions_data.management.base import BaseCommand
+from convictions_data.models import Disposition
+
+class Command(BaseCommand):
+    help = ("Compare the speed of anonymizing addresses with and without "
+            "the fast path for common address formats and check that the "
+            "results match")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--limit',
+            action='store',
+            type='int',
+            default=10000,
+            help="Number of distinct disposition addresses to anonymize"),
+        make_option('--file',
+            action='store',
+            default=None,
+            help=("Read addresses from this file, one per line, instead of "
+                  "from the dispositions")),
+    )
+
+    def handle(self, *args, **options):
+        addresses = self.get_addresses(options['file'], options['limit'])
+
+        results = {}
+        for label, fast_path in (("usaddress", False), ("fast path", True)):
+            anonymizer = AddressAnonymizer(fast_path=fast_path)
+            start = time.time()
+            results[fast_path] = [anonymizer.anonymize(a) for a in addresses]
+            elapsed = time.time() - start
+            self.stdout.write("{}: {} addresses in {:.3f}s, {:.0f} "
+                "addresses/sec".format(label, len(addresses), elapsed,
+                    len(addresses) / elapsed if elapsed else 0))
+
+        anonymizer = AddressAnonymizer()
+        num_common = sum(1 for a in addresses
+                         if anonymizer._anonymize_common(a) is not None)
+        self.stdout.write("{} of {} addresses ({:.1f}%) used the fast "
+            "path".format(num_common, len(addresses),
+                100.0 * num_common / len(addresses) if addresses else 0))
+
+        mismatches = [(a, fast, slow) for a, fast, slow
+                      in zip(addresses, results[True], results[False])
+                      if fast != slow]
+        self.stdout.write("{} mismatches".format(len(mismatches)))
+        for address, fast, slow in mismatches:
+            self.stderr.write("{!r}: fast path {!r}, usaddress {!r}".format(
+                address, fast, slow))
+
+    def get_addresses(self, path, limit):
+        if path is not None:
+            with open(path) as f:
+                addresses = [line.strip() for line in f if line.strip()]
+            return addresses[:limit]
+
+        return list(Disposition.objects.order_by('st_address')
+            .values_list('st_address', flat=True).distinct()[:limit])
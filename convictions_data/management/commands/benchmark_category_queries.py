@@ -0,0 +1,148 @@
+import json
+from optparse import make_option
+import time
+
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+
+from convictions_data.management.base import BaseCommand
+from convictions_data.models import Conviction, Disposition
+from convictions_data.query.categories import get_category_queries
+
+TEXT_INDEX_OPCLASSES = ('gin_trgm_ops', 'text_pattern_ops')
+"""Operator classes of the indexes for text search lookups"""
+
+class Command(BaseCommand):
+    help = ("Time counting the records in each category, optionally without "
+            "the text search indexes, to compare query speeds")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--model',
+            action='store',
+            type='choice',
+            choices=['conviction', 'disposition'],
+            default='conviction',
+            help="Query this model.  Default is conviction"),
+        make_option('--repeat',
+            action='store',
+            type='int',
+            default=3,
+            help=("Number of times to run each query.  The fastest time is "
+                  "reported")),
+        make_option('--without-text-indexes',
+            action='store_true',
+            dest='without_text_indexes',
+            default=False,
+            help=("Drop the trigram and pattern indexes for the duration of "
+                  "the benchmark, to see how fast the queries are without "
+                  "them.  The indexes are restored when the benchmark "
+                  "finishes.  PostgreSQL only")),
+        make_option('--output',
+            action='store',
+            default=None,
+            help="Write the timings to this JSON file"),
+        make_option('--compare',
+            action='store',
+            default=None,
+            help=("Compare the timings to those in this JSON file, written "
+                  "by an earlier run with --output")),
+    )
+
+    def handle(self, *args, **options):
+        model = Conviction if options['model'] == 'conviction' else Disposition
+
+        with transaction.atomic():
+            # Dropping an index is transactional in PostgreSQL, so roll
+            # back to this savepoint to restore the indexes
+            sid = transaction.savepoint()
+            dropped = []
+            if options['without_text_indexes']:
+                dropped = self.drop_text_indexes(model)
+            try:
+                results = self.time_queries(model, options['repeat'])
+            finally:
+                transaction.savepoint_rollback(sid)
+
+        report = {
+            'model': options['model'],
+            'text_indexes': not options['without_text_indexes'],
+            'dropped_indexes': dropped,
+            'repeat': options['repeat'],
+            'seconds': round(sum(r['seconds'] for r in results), 6),
+            'queries': results,
+        }
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.write_comparison(json.load(f), report)
+        else:
+            for r in results:
+                self.stdout.write("{}: {} records in {:.4f}s".format(
+                    r['name'], r['count'], r['seconds']))
+            self.stdout.write("total: {:.4f}s".format(report['seconds']))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+    def drop_text_indexes(self, model):
+        if connection.vendor != 'postgresql':
+            raise CommandError("--without-text-indexes requires PostgreSQL")
+
+        cursor = connection.cursor()
+        cursor.execute("SELECT indexname, indexdef FROM pg_indexes "
+                       "WHERE tablename = %s", [model._meta.db_table])
+        names = [name for name, definition in cursor.fetchall()
+                 if any(o in definition for o in TEXT_INDEX_OPCLASSES)]
+        for name in names:
+            cursor.execute('DROP INDEX "{}"'.format(name))
+
+        return names
+
+    def time_queries(self, model, repeat):
+        """
+        Count the records matching each category query
+
+        Returns:
+            List of dictionaries with the ``name`` of each category, the
+            ``count`` of matching records and the fastest time, in
+            ``seconds``, of ``repeat`` runs of the query.
+
+        """
+        results = []
+        for name, q in get_category_queries().items():
+            timings = []
+            for i in range(repeat):
+                start = time.time()
+                count = model.objects.filter(q).count()
+                timings.append(time.time() - start)
+
+            results.append({
+                'name': name,
+                'count': count,
+                'seconds': round(min(timings), 6),
+            })
+
+        return results
+
+    def write_comparison(self, before, after):
+        before_seconds = dict((r['name'], r['seconds'])
+                              for r in before['queries'])
+        for r in after['queries']:
+            seconds = before_seconds.get(r['name'])
+            if seconds is None:
+                continue
+
+            self.stdout.write("{}: {:.4f}s -> {:.4f}s ({})".format(
+                r['name'], seconds, r['seconds'],
+                self.format_speedup(seconds, r['seconds'])))
+
+        self.stdout.write("total: {:.4f}s -> {:.4f}s ({})".format(
+            before['seconds'], after['seconds'],
+            self.format_speedup(before['seconds'], after['seconds'])))
+
+    def format_speedup(self, before, after):
+        if not after:
+            return "n/a"
+
+        return "{:.1f}x".format(before / after)
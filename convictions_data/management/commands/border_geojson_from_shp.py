@@ -3,9 +3,10 @@ from optparse import make_option
 
 import fiona
 
-from django.core.management.base import BaseCommand
 from django.contrib.gis.geos import Polygon
 
+from convictions_data.management.base import BaseCommand
+
 class Command(BaseCommand):
     args = "<chicago_shapefile> <cook_county_shapefile>"
     help = ("Extract Chicago from a shapefile and export it as a geoJSON file "
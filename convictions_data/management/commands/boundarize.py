@@ -1,6 +1,5 @@
-from django.core.management.base import BaseCommand
-
-from convictions_data.models import Disposition
+from convictions_data.management.base import BaseCommand
+from convictions_data.models import Disposition, GeographyConvictionStats
 
 class Command(BaseCommand):
     help = "Detect community area of geocoded disposition"
@@ -23,3 +22,7 @@ class Command(BaseCommand):
                 self.stdout.write("Failed")
 
             i += 1
+
+        # Convictions are counted by the geographies of their dispositions,
+        # so stored statistics are out of date
+        GeographyConvictionStats.objects.all().delete()
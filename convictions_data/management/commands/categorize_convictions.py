@@ -0,0 +1,21 @@
+from django.db import transaction
+
+from convictions_data.management.base import BaseCommand
+from convictions_data.models import Conviction, GeographyConvictionStats
+
+class Command(BaseCommand):
+    help = ("Set the category flags and drug categories on convictions "
+            "based on their statutes, charge descriptions and IUCR codes")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            counts = Conviction.objects.all().categorize()
+            num_drug_categories = Conviction.objects.all()\
+                .set_drug_categories()
+            # The stored statistics count the old flags
+            GeographyConvictionStats.objects.all().delete()
+
+        for flag, count in counts.items():
+            self.stdout.write("{}: {}".format(flag, count))
+
+        self.stdout.write("drug categories: {}".format(num_drug_categories))
@@ -1,9 +1,10 @@
 from optparse import make_option
 
-from django.core.management.base import BaseCommand
 from django.db import transaction
 
-from convictions_data.models import Conviction, Disposition
+from convictions_data.management.base import BaseCommand
+from convictions_data.models import (Conviction, Disposition,
+    GeographyConvictionStats)
 
 class Command(BaseCommand):
     help = "Create convictions based on disposition records"
@@ -15,6 +16,14 @@ class Command(BaseCommand):
             default=False,
             help="Delete previously created models",
         ),
+        make_option('--no-categorize',
+            action='store_false',
+            dest='categorize',
+            default=True,
+            help=("Don't set the category flags and drug categories of the "
+                  "convictions.  Run categorize_convictions before using "
+                  "them"),
+        ),
     )
 
     def handle(self, *args, **options):
@@ -26,3 +35,11 @@ class Command(BaseCommand):
         
         with transaction.atomic():
             qs.create_convictions() 
+
+            if options['categorize']:
+                # Reports filter on the category flags, so set them on
+                # the new convictions right away
+                Conviction.objects.all().categorize()
+                Conviction.objects.all().set_drug_categories()
+                # The stored statistics count the old flags
+                GeographyConvictionStats.objects.all().delete()
@@ -1,7 +1,6 @@
 from optparse import make_option
 
-from django.core.management.base import BaseCommand
-
+from convictions_data.management.base import BaseCommand
 from convictions_data.models import Disposition, RawDisposition
 
 class Command(BaseCommand):
@@ -1,5 +1,4 @@
-from django.core.management.base import BaseCommand
-
+from convictions_data.management.base import BaseCommand
 from convictions_data.models import Disposition, Municipality
 
 class Command(BaseCommand):
@@ -0,0 +1,54 @@
+from optparse import make_option
+
+from django.core.management.base import CommandError
+
+from convictions_data.explain import check_workload
+from convictions_data.management.base import BaseCommand
+
+class Command(BaseCommand):
+    help = ("Show the query plans of the key analysis queries and whether "
+            "they use the indexes added for them")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--query',
+            action='append',
+            dest='queries',
+            default=None,
+            help=("Only explain the query with this name.  Can be specified "
+                  "more than once")),
+        make_option('--analyze',
+            action='store_true',
+            default=False,
+            help=("Run the queries and show their actual timings.  "
+                  "PostgreSQL only")),
+        make_option('--plans',
+            action='store_true',
+            default=False,
+            help="Show the full query plans"),
+        make_option('--strict',
+            action='store_true',
+            default=False,
+            help="Exit with an error if any query doesn't use its index"),
+    )
+
+    def handle(self, *args, **options):
+        results = check_workload(options['queries'],
+            analyze=options['analyze'])
+
+        missed = []
+        for name, result in results.items():
+            if result['uses_expected']:
+                status = "uses {}".format(", ".join(result['indexes']))
+            else:
+                status = "doesn't use an index on {}".format(
+                    result['expected_index'])
+                missed.append(name)
+
+            self.stdout.write("{}: {}".format(name, status))
+            if options['plans']:
+                for line in result['plan']:
+                    self.stdout.write("    {}".format(line))
+
+        if options['strict'] and missed:
+            raise CommandError("Queries not using their indexes: {}".format(
+                ", ".join(missed)))
@@ -1,7 +1,12 @@
 import json
+from optparse import make_option
+import time
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
+from convictions_data.management.base import BaseCommand
 from convictions_data.models import Conviction
 
 class Command(BaseCommand):
@@ -9,6 +14,38 @@ class Command(BaseCommand):
     help = ("Export a JSON file of total convictions and convictions by "
             "major cateogries broken down by age buckets")
 
+    option_list = BaseCommand.option_list + (
+        make_option('--compare',
+            action='store_true',
+            dest='compare',
+            default=False,
+            help=("Also calculate the counts with a query per age range and "
+                  "category, write the timings of both methods to stderr "
+                  "and fail if the results don't match"),
+        ),
+    )
+
     def handle(self, *args, **options):
+        if options['compare']:
+            self._compare()
+
         convictions_by_age = Conviction.objects.counts_by_age_range()
         self.stdout.write(json.dumps(convictions_by_age))
+
+    def _compare(self):
+        results = []
+        for method_name in ('counts_by_age_range',
+                'counts_by_age_range_per_bucket'):
+            # Capture queries to count them, without turning on DEBUG
+            with CaptureQueriesContext(connection) as queries:
+                start = time.time()
+                result = getattr(Conviction.objects, method_name)()
+                elapsed = time.time() - start
+            results.append(result)
+            self.stderr.write("{}: {:.3f}s, {} queries".format(
+                method_name, elapsed, len(queries)))
+
+        if results[0] != results[1]:
+            raise CommandError("The counts from the category flags don't "
+                "match the counts from the category queries.  Run "
+                "categorize_convictions and try again")
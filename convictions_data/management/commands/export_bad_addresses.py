@@ -1,7 +1,6 @@
 from csv import DictWriter
 
-from django.core.management.base import BaseCommand
-
+from convictions_data.management.base import BaseCommand
 from convictions_data.models import Disposition
 
 class Command(BaseCommand):
@@ -1,9 +1,10 @@
+from collections import OrderedDict
 import json
 from optparse import make_option
 
-from django.core.management.base import BaseCommand
-
+from convictions_data.management.base import BaseCommand
 from convictions_data.models import CensusPlace, County
+from convictions_data.topojson import DEFAULT_QUANTIZATION, topology
 
 class Command(BaseCommand):
     help = "Export a geoJSON file of the outline of the city of Chicago"
@@ -14,6 +15,18 @@ class Command(BaseCommand):
             default=0.002,
             help="Tolerance value for simplifying geometries"
         ),
+        make_option('--topojson',
+            action='store_true',
+            default=False,
+            help=("Export TopoJSON, with shared boundaries stored once and "
+                  "quantized coordinates, instead of GeoJSON")
+        ),
+        make_option('--quantization',
+            type="float",
+            default=DEFAULT_QUANTIZATION,
+            help=("Number of distinct values for quantized TopoJSON "
+                  "coordinates along each dimension")
+        ),
     )
 
     def get_chicago_border_feature(self, tolerance):
@@ -43,8 +56,21 @@ class Command(BaseCommand):
         }
 
     def handle(self, *args, **options):
+        if options['topojson']:
+            # Simplify the arcs of the topology rather than the borders, so
+            # the parts of the borders that are shared still match
+            borders = OrderedDict([("borders", [
+                self.get_chicago_border_feature(0),
+                self.get_cook_county_border_feature(0),
+            ])])
+            self.stdout.write(json.dumps(topology(borders,
+                quantization=options['quantization'],
+                simplify=options['simplify'])))
+            return
+
         chicago_border = self.get_chicago_border_feature(options['simplify']) 
         cook_border = self.get_cook_county_border_feature(options['simplify'])
+
         geojson_dict = {
             "type": "FeatureCollection",
             "features": [
@@ -1,8 +1,7 @@
 import csv
 from optparse import make_option
 
-from django.core.management.base import BaseCommand
-
+from convictions_data.management.base import BaseCommand
 from convictions_data.models import Disposition
 
 class Command(BaseCommand):
@@ -25,17 +24,13 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         filter_method_name = options['filter']
         classes = ['4', '3', '2', '1', 'X', 'M']
+        years = list(range(2005, 2010))
         labels = [self._felony_label(cc) for cc in classes]
         writer = csv.writer(self.stdout)
         writer.writerow(['Year'] + labels)
-        for yr in range(2005, 2010):
-            cols = [yr]
-            for chrgclass in classes:
-                qs = Disposition.objects.all().initial_date_in_year(yr)
-                filter_method = getattr(qs, filter_method_name)
-                qs = filter_method()
-                cnt = qs.filter(final_chrgclass=chrgclass).num_cases()
-               
-                cols.append(cnt)
 
-            writer.writerow(cols)
+        qs = getattr(Disposition.objects.all(), filter_method_name)()
+        counts = qs.pivot('initial_date__year', 'final_chrgclass', years,
+            classes)
+        for yr, row_counts in zip(years, counts):
+            writer.writerow([yr] + row_counts)
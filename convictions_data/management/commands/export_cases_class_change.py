@@ -2,8 +2,7 @@ import csv
 from datetime import datetime
 from optparse import make_option
 
-from django.core.management.base import BaseCommand
-
+from convictions_data.management.base import BaseCommand
 from convictions_data.models import Disposition
 
 class Command(BaseCommand):
@@ -32,11 +31,12 @@ class Command(BaseCommand):
         writer = csv.writer(self.stdout)
         writer.writerow([''] + labels)
         qs = Disposition.objects.all().filter(initial_date__gte=datetime(2005, 1, 1))
-        for class_from in classes:
+        counts = qs.pivot('chrgclass', 'final_chrgclass', classes, classes)
+        totals = qs.distinct_counts('chrgclass')
+        for class_from, row_counts in zip(classes, counts):
             cols = [self._chrgclass_label(class_from)]
-            total_from = qs.filter(chrgclass=class_from).num_cases()
-            for class_to in classes:
-                cnt = qs.filter(chrgclass=class_from, final_chrgclass=class_to).num_cases()
+            total_from = totals.get((class_from,), 0)
+            for cnt in row_counts:
                 if options['percentage']:
                     val = cnt / total_from
                 else:
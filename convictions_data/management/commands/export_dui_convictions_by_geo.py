@@ -1,8 +1,7 @@
 import csv
 from optparse import make_option
 
-from django.core.management.base import BaseCommand
-
+from convictions_data.management.base import BaseCommand
 import convictions_data.models
 
 class Command(BaseCommand):
@@ -23,7 +22,8 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         model_cls = getattr(convictions_data.models, options['model'])
-        qs = model_cls.objects.all().with_dui_annotations().order_by('-num_dui')
+        geos = model_cls.objects.all().with_dui_annotations()\
+            .order_by('-num_dui')
        
         fieldnames = ['name', 'count', 'pct', 'per_capita'] 
         writer = csv.DictWriter(self.stdout,
@@ -31,7 +31,7 @@ class Command(BaseCommand):
 
         writer.writeheader()
 
-        for geo in qs[:options['count']]:
+        for geo in geos[:options['count']]:
             row = {
                 'name': geo.name,
                 'count': geo.num_dui,
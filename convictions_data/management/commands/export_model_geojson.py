@@ -1,8 +1,9 @@
+import json
 from optparse import make_option
 
-from django.core.management.base import BaseCommand
-
+from convictions_data.management.base import BaseCommand
 import convictions_data.models
+from convictions_data.topojson import DEFAULT_QUANTIZATION
 
 class Command(BaseCommand):
     args = "<model>"
@@ -19,6 +20,18 @@ class Command(BaseCommand):
             default=0.002,
             help="Tolerance value for simplifying geometries"
         ),
+        make_option('--topojson',
+            action='store_true',
+            default=False,
+            help=("Export TopoJSON, with shared boundaries stored once and "
+                  "quantized coordinates, instead of GeoJSON")
+        ),
+        make_option('--quantization',
+            type="float",
+            default=DEFAULT_QUANTIZATION,
+            help=("Number of distinct values for quantized TopoJSON "
+                  "coordinates along each dimension")
+        ),
     )
     
 
@@ -39,4 +52,14 @@ class Command(BaseCommand):
         if options['name'] is not None:
             qs = qs.filter(name=options['name'])
 
-        self.stdout.write(qs.geojson(simplify=options['simplify']))
+        if options['topojson']:
+            topology = qs.topojson(simplify=options['simplify'],
+                quantization=options['quantization'])
+            self.stdout.write(json.dumps(topology))
+            return
+
+        # Write the features as they're serialized rather than building the
+        # entire FeatureCollection in memory
+        for chunk in qs.iter_geojson(simplify=options['simplify']):
+            self.stdout.write(chunk, ending='')
+        self.stdout.write('')
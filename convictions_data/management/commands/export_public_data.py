@@ -1,11 +1,83 @@
 import csv
 import datetime
+import gzip
+import hashlib
+import json
+from multiprocessing import Pool, cpu_count
 from optparse import make_option
+import os
+import time
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Max
 
+from convictions_data.management.base import BaseCommand
 from convictions_data.models import Disposition
 
+MANIFEST_FILENAME = "manifest.json"
+
+
+def get_year_filter_kwargs(year):
+    filter_kwargs = {}
+    if year != 2005:
+        # Include records with initial dates before our window with 2005
+        # That means, don't set a lower bound if the year is 2005
+        filter_kwargs['initial_date__gte'] = datetime.date(year, 1, 1)
+
+    filter_kwargs['initial_date__lt'] = datetime.date(year + 1, 1, 1)
+
+    return filter_kwargs
+
+
+def export_partition(partition):
+    """
+    Write one partition of the export to a file
+
+    This is run in worker processes.
+
+    Args:
+        partition: Dictionary with the ``name`` of the partition, the
+            ``filter_kwargs`` that select its dispositions, the ``path`` of
+            the output file and whether to ``compress`` it.
+
+    Returns:
+        Dictionary describing the output file, for the manifest.
+
+    """
+    start = time.time()
+    qs = Disposition.objects.filter(**partition['filter_kwargs'])\
+        .order_by('case_number', 'sequence_number')
+
+    path = partition['path']
+    if partition['compress']:
+        f = gzip.open(path, 'wt', newline='')
+    else:
+        f = open(path, 'w', newline='')
+
+    num_rows = 0
+    with f:
+        writer = csv.DictWriter(f, fieldnames=Disposition.objects.EXPORT_FIELDS)
+        writer.writeheader()
+        for disp in qs.anonymized_values():
+            writer.writerow(disp)
+            num_rows += 1
+
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+
+    return {
+        'partition': partition['name'],
+        'filename': os.path.basename(path),
+        'rows': num_rows,
+        'bytes': os.path.getsize(path),
+        'sha256': sha256.hexdigest(),
+        'seconds': round(time.time() - start, 3),
+    }
+
+
 class Command(BaseCommand):
     help = ("Export disposition records to CSV removing personal information.")
     option_list = BaseCommand.option_list + (
@@ -15,30 +87,169 @@ class Command(BaseCommand):
             default=None,
             dest='year',
             help="Only export records for this year"),
+        make_option('--output-dir',
+            action='store',
+            default=None,
+            dest='output_dir',
+            help=("Export partitions of the records to separate files in "
+                  "this directory, in parallel, with a manifest, instead of "
+                  "writing a single CSV to stdout")),
+        make_option('--partition',
+            action='store',
+            type='choice',
+            choices=['year', 'case'],
+            default='year',
+            help=("Partition records by the year of their initial date or "
+                  "by ranges of case numbers.  Default is year")),
+        make_option('--shards',
+            action='store',
+            type='int',
+            default=None,
+            help=("Number of case number ranges when partitioning by case.  "
+                  "Default is the number of processes")),
+        make_option('--processes',
+            action='store',
+            type='int',
+            default=cpu_count(),
+            help=("Number of processes to export partitions in.  Default is "
+                  "the number of CPUs")),
+        make_option('--no-compress',
+            action='store_false',
+            dest='compress',
+            default=True,
+            help="Don't gzip the partition files"),
     )
 
     def handle(self, *args, **options):
+        if options['output_dir'] is not None:
+            self.export_partitions(options)
+            return
+
         writer = csv.DictWriter(self.stdout,
             fieldnames=Disposition.objects.EXPORT_FIELDS)
 
         qs = Disposition.objects.all()
         if options['year']:
             assert options['year'] >= 2005 and options['year'] <= 2009
-            filter_kwargs = self._get_year_filter_kwargs(options['year'])
+            filter_kwargs = get_year_filter_kwargs(options['year'])
             qs = qs.filter(**filter_kwargs)
 
         writer.writeheader()
 
-        for disp in qs.order_by('case_number', 'sequence_number').anonymized_values(): 
+        for disp in qs.order_by('case_number', 'sequence_number').anonymized_values():
             writer.writerow(disp)
 
-    def _get_year_filter_kwargs(self, year):
-        filter_kwargs = {}
-        if year != 2005:
-            # Include records with initial dates before our window with 2005
-            # That means, don't set a lower bound if the year is 2005
-            filter_kwargs['initial_date__gte'] = datetime.date(year, 1, 1)
+    def export_partitions(self, options):
+        output_dir = options['output_dir']
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+
+        if options['partition'] == 'year':
+            partitions = self.get_year_partitions(options['year'])
+        else:
+            if options['year']:
+                raise CommandError("--year can only be used with year "
+                                   "partitions")
+            partitions = self.get_case_partitions(options['shards'] or
+                options['processes'])
+
+        extension = ".csv.gz" if options['compress'] else ".csv"
+        for partition in partitions:
+            partition['path'] = os.path.join(output_dir,
+                "dispositions_{}{}".format(partition['name'], extension))
+            partition['compress'] = options['compress']
+
+        start = time.time()
+        # Anonymize new addresses once, up front, so the workers only have
+        # to look them up
+        num_anonymized = Disposition.objects.all().anonymize_addresses()
+        self.stdout.write("Anonymized {} new addresses".format(num_anonymized))
+
+        # Each worker opens its own database connection
+        connection.close()
+        if options['processes'] > 1 and len(partitions) > 1:
+            pool = Pool(min(options['processes'], len(partitions)))
+            try:
+                files = pool.map(export_partition, partitions, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            files = [export_partition(p) for p in partitions]
+
+        manifest = {
+            'created': datetime.datetime.now().isoformat(),
+            'partition': options['partition'],
+            'fields': Disposition.objects.EXPORT_FIELDS,
+            'rows': sum(f['rows'] for f in files),
+            'seconds': round(time.time() - start, 3),
+            'files': files,
+        }
+        with open(os.path.join(output_dir, MANIFEST_FILENAME), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        self.stdout.write("Exported {} records to {} files in {}".format(
+            manifest['rows'], len(files), output_dir))
+
+    def get_year_partitions(self, year=None):
+        """
+        Return partitions for each year of initial dates
+
+        The first year includes earlier dates.  Records without an
+        initial date are in their own partition so that the partitions
+        include every record.
+        """
+        if year:
+            years = [year]
+        else:
+            max_date = Disposition.objects.aggregate(
+                max_date=Max('initial_date'))['max_date']
+            last_year = max(max_date.year, 2005) if max_date else 2005
+            years = range(2005, last_year + 1)
+
+        partitions = [{
+                'name': str(y),
+                'filter_kwargs': get_year_filter_kwargs(y),
+            }
+            for y in years]
+
+        if not year and Disposition.objects.filter(initial_date__isnull=True).exists():
+            partitions.append({
+                'name': "unknown_year",
+                'filter_kwargs': {'initial_date__isnull': True},
+            })
+
+        return partitions
+
+    def get_case_partitions(self, num_shards):
+        """
+        Return partitions of contiguous ranges of case numbers
+
+        All the records for a case are in the same partition, and
+        concatenating the partitions in order gives the same order as the
+        single file export.
+        """
+        case_numbers = Disposition.objects.order_by('case_number')\
+            .values_list('case_number', flat=True).distinct()
+        num_cases = case_numbers.count()
+        num_shards = max(min(num_shards, num_cases), 1)
+
+        # The first case number of each shard after the first
+        boundaries = [case_numbers[i * num_cases // num_shards]
+                      for i in range(1, num_shards)]
 
-        filter_kwargs['initial_date__lt'] = datetime.date(year + 1, 1, 1)
+        partitions = []
+        lower = None
+        for i, upper in enumerate(boundaries + [None]):
+            filter_kwargs = {}
+            if lower is not None:
+                filter_kwargs['case_number__gte'] = lower
+            if upper is not None:
+                filter_kwargs['case_number__lt'] = upper
+            partitions.append({
+                'name': "cases_{:03d}".format(i),
+                'filter_kwargs': filter_kwargs,
+            })
+            lower = upper
 
-        return filter_kwargs
+        return partitions
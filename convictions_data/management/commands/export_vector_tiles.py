@@ -0,0 +1,198 @@
+from multiprocessing import Pool, cpu_count
+from optparse import make_option
+
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Count
+
+from convictions_data.management.base import BaseCommand
+import convictions_data.models
+from convictions_data.models import Conviction, County
+from convictions_data.vectortile import (DEFAULT_BUFFER, DEFAULT_EXTENT,
+    MBTilesWriter, init_worker, render_tile, tiles_for_extent)
+
+class Command(BaseCommand):
+    args = "<filename>"
+    help = ("Export an MBTiles file of vector tiles of geography boundaries "
+            "with conviction attributes")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--model',
+            action='append',
+            dest='models',
+            default=None,
+            help=("Include a layer for this model.  Can be specified more "
+                  "than once.  Default is CommunityArea, CensusPlace and "
+                  "County")),
+        make_option('--min-zoom',
+            type='int',
+            dest='min_zoom',
+            default=8,
+            help="Lowest zoom level to render"),
+        make_option('--max-zoom',
+            type='int',
+            dest='max_zoom',
+            default=14,
+            help="Highest zoom level to render"),
+        make_option('--processes',
+            type='int',
+            default=cpu_count(),
+            help=("Number of processes to render tiles in.  Default is the "
+                  "number of CPUs")),
+        make_option('--extent',
+            type='int',
+            default=DEFAULT_EXTENT,
+            help="Size of each tile's coordinate grid"),
+        make_option('--buffer',
+            type='int',
+            default=DEFAULT_BUFFER,
+            help=("Number of tile units to include beyond the edges of each "
+                  "tile")),
+        make_option('--batch-size',
+            type='int',
+            dest='batch_size',
+            default=500,
+            help="Number of tiles to write to the database at once"),
+    )
+
+    def handle(self, *args, **options):
+        try:
+            path = args[0]
+        except IndexError:
+            raise CommandError("You must specify an output filename")
+
+        model_names = options['models']
+        if model_names is None:
+            model_names = ['CommunityArea', 'CensusPlace', 'County']
+
+        layers = [self.get_layer(model_name) for model_name in model_names]
+        extent = self.get_extent(layers)
+        if extent is None:
+            raise CommandError("There are no geographies to export")
+
+        tiles = [tile for zoom in range(options['min_zoom'],
+                                        options['max_zoom'] + 1)
+                 for tile in tiles_for_extent(extent, zoom)]
+
+        # Geometries are sent to the workers as WKB so they can be pickled
+        layers = [(name, [(bytes(geom.wkb), properties)
+                          for geom, properties in features])
+                  for name, features in layers]
+        init_args = (layers, options['extent'], options['buffer'])
+
+        writer = MBTilesWriter(path)
+        writer.write_metadata(self.get_metadata(layers, extent, options))
+
+        # Don't share the database connection with the worker processes
+        connection.close()
+
+        if options['processes'] > 1:
+            pool = Pool(options['processes'], init_worker, init_args)
+            rendered = pool.imap_unordered(render_tile, tiles, chunksize=16)
+        else:
+            pool = None
+            init_worker(*init_args)
+            rendered = (render_tile(tile) for tile in tiles)
+
+        num_tiles = 0
+        batch = []
+        try:
+            for zoom, x, y, data in rendered:
+                if data is None:
+                    continue
+
+                batch.append((zoom, x, y, data))
+                if len(batch) >= options['batch_size']:
+                    writer.write_tiles(batch)
+                    num_tiles += len(batch)
+                    batch = []
+
+            writer.write_tiles(batch)
+            num_tiles += len(batch)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+            writer.close()
+
+        self.stdout.write("Wrote {} tiles of {} checked to {}".format(
+            num_tiles, len(tiles), path))
+
+    def get_layer(self, model_name):
+        """
+        Return the name and features of a tile layer for a model
+
+        Returns:
+            Tuple of the layer name and a list of tuples of a
+            ``GEOSGeometry`` and a dictionary of properties.
+
+        """
+        if model_name == 'County':
+            return 'county', self.get_county_features()
+
+        model_cls = getattr(convictions_data.models, model_name)
+        qs = model_cls.objects.all()
+        if model_name == 'CensusPlace':
+            # Like the GeoJSON export, only include suburban Cook County
+            # places
+            qs = qs.filter(in_cook_county=True).exclude(name="Chicago")
+
+        features = [(f['geometry'], f['properties'])
+                    for f in qs.iter_features(simplify=None)
+                    if f['geometry'] is not None]
+        return model_cls._meta.model_name, features
+
+    def get_county_features(self):
+        # Convictions aren't related to counties, but the county name is
+        # stored with each conviction
+        num_convictions = dict(Conviction.objects.order_by()
+            .values_list('county').annotate(num=Count('id')))
+        return [(county.geom, {
+                    'name': county.name,
+                    'geoid10': county.geoid10,
+                    'num_convictions': num_convictions.get(county.name, 0),
+                })
+                for county in County.objects.all()]
+
+    def get_extent(self, layers):
+        extents = [geom.extent for name, features in layers
+                   for geom, properties in features]
+        if not extents:
+            return None
+
+        return (min(e[0] for e in extents), min(e[1] for e in extents),
+                max(e[2] for e in extents), max(e[3] for e in extents))
+
+    def get_metadata(self, layers, extent, options):
+        vector_layers = []
+        for name, features in layers:
+            fields = {}
+            for geom, properties in features:
+                for key, value in properties.items():
+                    if isinstance(value, bool):
+                        fields[key] = "Boolean"
+                    elif isinstance(value, (int, float)):
+                        fields[key] = "Number"
+                    elif value is not None:
+                        fields[key] = "String"
+            vector_layers.append({
+                'id': name,
+                'fields': fields,
+                'minzoom': options['min_zoom'],
+                'maxzoom': options['max_zoom'],
+            })
+
+        return {
+            'name': "Convictions",
+            'format': "pbf",
+            'type': "overlay",
+            'version': "1",
+            'description': "Boundaries of {} with conviction attributes".format(
+                ", ".join(name for name, features in layers)),
+            'minzoom': str(options['min_zoom']),
+            'maxzoom': str(options['max_zoom']),
+            'bounds': ",".join(str(v) for v in extent),
+            'center': "{},{},{}".format((extent[0] + extent[2]) / 2,
+                (extent[1] + extent[3]) / 2, options['min_zoom']),
+            'json': {'vector_layers': vector_layers},
+        }
@@ -1,7 +1,6 @@
 import csv
 
-from django.core.management.base import BaseCommand
-
+from convictions_data.management.base import BaseCommand
 from convictions_data.models import CensusPlace
 
 class Command(BaseCommand):
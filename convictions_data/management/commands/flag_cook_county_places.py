@@ -1,6 +1,6 @@
-from django.core.management.base import BaseCommand
 from django.db.models import Q
 
+from convictions_data.management.base import BaseCommand
 from convictions_data.models import CensusPlace, County
 
 class Command(BaseCommand):
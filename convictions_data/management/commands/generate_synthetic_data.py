@@ -0,0 +1,59 @@
+import csv
+from optparse import make_option
+
+from django.core.management.base import CommandError
+
+from convictions_data.management.base import BaseCommand
+from convictions_data.models import RawDisposition
+from convictions_data.synthetic import (RawDispositionGenerator,
+    write_boundaries)
+
+class Command(BaseCommand):
+    args = "<csv_filename>"
+    help = ("Generate a CSV of synthetic raw dispositions, and optionally "
+            "matching boundaries, for load testing")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--records',
+            action='store',
+            type='int',
+            default=10000,
+            help="Number of records to generate"),
+        make_option('--seed',
+            action='store',
+            type='int',
+            default=0,
+            help="Seed for generating the records"),
+        make_option('--boundaries-dir',
+            action='store',
+            dest='boundaries_dir',
+            default=None,
+            help=("Also write Cook County-like boundaries, as GeoJSON files "
+                  "that can be loaded with load_spatial_data, to this "
+                  "directory")),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError("You must specify a CSV filename")
+
+        csv_filename = args[0]
+        # Use the same headers as the raw data.  load_dispositions_csv
+        # lowercases them.
+        fields = [f.name for f in RawDisposition._meta.fields
+                  if f.name != 'id']
+
+        generator = RawDispositionGenerator(options['seed'])
+        with open(csv_filename, 'w') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow([f.upper() for f in fields])
+            for record in generator.records(options['records']):
+                writer.writerow([record[f] for f in fields])
+
+        self.stdout.write("Wrote {} records to {}".format(options['records'],
+            csv_filename))
+
+        if options['boundaries_dir']:
+            paths = write_boundaries(options['boundaries_dir'])
+            for name, path in paths.items():
+                self.stdout.write("Wrote {} to {}".format(name, path))
@@ -1,11 +1,12 @@
 from optparse import make_option
 import logging
 
-from django.core.management.base import BaseCommand
 from django.db.models import Q
 
+from convictions_data.management.base import BaseCommand
 from convictions_data.models import Disposition
 from convictions_data.signals import pre_geocode_page, post_geocode_page
+from convictions_data.synthetic import SyntheticGeocoder
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +34,12 @@ class Command(BaseCommand):
             dest='force',
             default=False,
             help='Geocode, even if the record already has a lat/lon'),
+        make_option('--synthetic',
+            action='store_true',
+            dest='synthetic',
+            default=False,
+            help=('Place synthetic records in the synthetic boundaries '
+                  'instead of using the geocoding service')),
     )
 
     def handle(self, *args, **options):
@@ -46,4 +53,8 @@ class Command(BaseCommand):
         if not options['force']:
             qs = qs.ungeocoded()
 
-        qs.geocode(timeout=options['timeout'])
+        geocoder = None
+        if options['synthetic']:
+            geocoder = SyntheticGeocoder()
+
+        qs.geocode(timeout=options['timeout'], geocoder=geocoder)
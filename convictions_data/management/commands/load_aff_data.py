@@ -1,9 +1,11 @@
 import csv 
 import re
 
-from django.core.management.base import BaseCommand, CommandError
+from django.core.management.base import CommandError
 
+from convictions_data.management.base import BaseCommand
 import convictions_data.models
+from convictions_data.models import GeographyConvictionStats
 
 class Command(BaseCommand):
     args = "<model> <field> <geoid_col> <estimate_col> <moe_col> <file>"
@@ -58,6 +60,10 @@ class Command(BaseCommand):
 
                 row_num += 1
 
+        # The stored per-capita statistics depend on the population
+        GeographyConvictionStats.objects.for_geography_model(model_cls)\
+            .delete()
+
     def parse_value(self, val):
         """
         Parse values from AFF CSVs.
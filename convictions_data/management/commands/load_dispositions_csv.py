@@ -2,8 +2,7 @@ import csv
 import logging
 from optparse import make_option
 
-from django.core.management.base import BaseCommand
-
+from convictions_data.management.base import BaseCommand
 from convictions_data.models import RawDisposition
 
 class Command(BaseCommand):
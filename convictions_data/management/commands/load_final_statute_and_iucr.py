@@ -1,8 +1,8 @@
 import logging
 
-from django.core.management.base import BaseCommand
 from django.db import transaction
 
+from convictions_data.management.base import BaseCommand
 from convictions_data.models import Disposition
 from convictions_data.statute import (get_iucr, IUCRLookupError,
     ILCSLookupError, StatuteFormatError)
@@ -1,6 +1,8 @@
-from django.core.management.base import BaseCommand
+from optparse import make_option
+
 from django.contrib.gis.utils import LayerMapping
 
+from convictions_data.management.base import BaseCommand
 import convictions_data.models
 from convictions_data.signals import post_load_spatial_data
 
@@ -8,13 +10,25 @@ class Command(BaseCommand):
     args = "<model> <shapefile>"
     help = "Load spatial data into the database"
 
+    option_list = BaseCommand.option_list + (
+        make_option('--delete',
+            action='store_true',
+            dest='delete',
+            default=False,
+            help="Delete previously loaded models",
+        ),
+    )
+
     def handle(self, *args, **options):
         model_name = args[0]
         shapefile = args[1]
 
         model_cls = getattr(convictions_data.models, model_name)
 
-        lm = LayerMapping(model_cls, shapefile, model_cls.FIELD_MAPPING) 
+        if options['delete']:
+            model_cls.objects.all().delete()
+
+        lm = LayerMapping(model_cls, shapefile, model_cls.FIELD_MAPPING)
         lm.save(strict=True, verbose=True)
 
         post_load_spatial_data.send(sender=self, model=model_cls)
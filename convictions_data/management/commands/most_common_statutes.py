@@ -1,8 +1,7 @@
 import csv
 from optparse import make_option
 
-from django.core.management.base import BaseCommand
-
+from convictions_data.management.base import BaseCommand
 from convictions_data.models import Conviction
 
 class Command(BaseCommand):
@@ -1,9 +1,9 @@
 import csv
 from optparse import make_option
 
-from django.core.management.base import BaseCommand
-
+from convictions_data.management.base import BaseCommand
 import convictions_data.models
+from convictions_data.models import GeographyConvictionStats
 
 class Command(BaseCommand):
     help = ("Export CSV table showing most common conviction statute by geography")
@@ -44,12 +44,24 @@ class Command(BaseCommand):
         if options['model'] == 'CensusPlace':
             # For census places, we only want places in Cook County
             qs = qs.filter(in_cook_county=True).exclude(name="Chicago")
-        qs = qs.with_conviction_annotations()
+        geos = qs.with_conviction_annotations()
+
+        # Use the statutes stored by refresh_geography_stats if they're
+        # up to date.  Otherwise, get the statutes for all geographies in
+        # a single query.
+        stats_qs = GeographyConvictionStats.objects.for_geography_model(
+            model_cls)
+        top_statutes_by_geo = None
+        if stats_qs.is_fresh():
+            top_statutes_by_geo = stats_qs.top_statutes(options['count'])
+        if top_statutes_by_geo is None:
+            top_statutes_by_geo = dict(
+                qs.most_common_statutes_by_geography(options['count']))
 
-        for ca in qs:
+        for ca in geos:
             num_convictions = ca.num_convictions
             row = {fn: getattr(ca, fn) for fn in model_fieldnames}
-            top_statutes = ca.most_common_statutes(options['count'])
+            top_statutes = top_statutes_by_geo.get(ca.id, [])
             for i, statute in enumerate(top_statutes):
                 row['_statute_' + str(i+1)] = statute['statute']
                 row['_chrgdesc_' + str(i+1)] = statute['chrgdesc']
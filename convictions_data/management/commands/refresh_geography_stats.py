@@ -0,0 +1,40 @@
+from optparse import make_option
+
+from django.db import transaction
+
+from convictions_data.management.base import BaseCommand
+import convictions_data.models
+from convictions_data.models import GeographyConvictionStats
+
+class Command(BaseCommand):
+    help = ("Calculate and store conviction statistics for community areas "
+            "and census places")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--model',
+            action='append',
+            dest='models',
+            default=None,
+            help=("Refresh statistics for this model.  Can be specified "
+                  "more than once.  Default is CommunityArea and CensusPlace")),
+        make_option('--top-statutes',
+            action='store',
+            type='int',
+            dest='top_statutes',
+            default=10,
+            help="Store this many most common statutes for each geography"),
+    )
+
+    def handle(self, *args, **options):
+        model_names = options['models']
+        if model_names is None:
+            model_names = ['CommunityArea', 'CensusPlace']
+
+        for model_name in model_names:
+            model_cls = getattr(convictions_data.models, model_name)
+            with transaction.atomic():
+                num_created = GeographyConvictionStats.objects.refresh(
+                    model_cls, top_statutes_count=options['top_statutes'])
+
+            self.stdout.write("Stored statistics for {} {} records".format(
+                num_created, model_name))
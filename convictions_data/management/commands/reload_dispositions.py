@@ -1,8 +1,8 @@
 from optparse import make_option
 
-from django.core.management.base import BaseCommand
 from django.db import transaction
 
+from convictions_data.management.base import BaseCommand
 from convictions_data.models import Disposition
 
 class Command(BaseCommand):
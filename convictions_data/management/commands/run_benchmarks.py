@@ -0,0 +1,114 @@
+import datetime
+import json
+from optparse import make_option
+import os
+import platform
+
+from django.core.management.base import CommandError
+
+from convictions_data.benchmarks import BENCHMARKS, get_commit, run_benchmarks
+from convictions_data.management.base import BaseCommand
+
+class Command(BaseCommand):
+    help = ("Benchmark the cleaning and parsing code on synthetic records "
+            "and store the results")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--benchmark',
+            action='append',
+            dest='benchmarks',
+            default=None,
+            help=("Only run the benchmark with this name.  Can be specified "
+                  "more than once")),
+        make_option('--records',
+            action='store',
+            type='int',
+            default=1000,
+            help="Number of synthetic records to generate"),
+        make_option('--repeat',
+            action='store',
+            type='int',
+            default=5,
+            help="Number of times to run each benchmark"),
+        make_option('--seed',
+            action='store',
+            type='int',
+            default=0,
+            help="Seed for generating the records"),
+        make_option('--results-dir',
+            action='store',
+            dest='results_dir',
+            default='benchmarks',
+            help=("Store the results in a JSON file, named after the time "
+                  "and the git commit, in this directory.  Default is "
+                  "'benchmarks'")),
+        make_option('--compare',
+            action='store',
+            default=None,
+            help="Compare the results to those stored in this file"),
+    )
+
+    def handle(self, *args, **options):
+        for name in options['benchmarks'] or []:
+            if name not in BENCHMARKS:
+                raise CommandError("Unknown benchmark '{}'.  Choices are: "
+                    "{}".format(name, ", ".join(BENCHMARKS)))
+
+        results = run_benchmarks(options['benchmarks'],
+            num_records=options['records'], repeat=options['repeat'],
+            seed=options['seed'])
+
+        now = datetime.datetime.now()
+        commit = get_commit()
+        report = {
+            'created': now.isoformat(),
+            'commit': commit,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'records': options['records'],
+            'repeat': options['repeat'],
+            'seed': options['seed'],
+            'benchmarks': results,
+        }
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.write_comparison(json.load(f), report)
+        else:
+            for name, result in results.items():
+                self.stdout.write("{}: {} items, best {:.4f}s, median "
+                    "{:.4f}s, {:.0f} items/sec".format(name, result['items'],
+                        result['best'], result['median'],
+                        result['items_per_second'] or 0))
+
+        results_dir = options['results_dir']
+        if not os.path.exists(results_dir):
+            os.makedirs(results_dir)
+        path = os.path.join(results_dir, "{}_{}.json".format(
+            now.strftime("%Y%m%d%H%M%S"), commit or "unknown"))
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+        self.stdout.write("Wrote results to {}".format(path))
+
+    def write_comparison(self, before, after):
+        self.stdout.write("Comparing to {} ({})".format(
+            before.get('commit') or "unknown commit", before['created']))
+        if before['records'] != after['records']:
+            self.stderr.write("Warning: {} records were used before and {} "
+                "now".format(before['records'], after['records']))
+
+        for name, result in after['benchmarks'].items():
+            before_result = before['benchmarks'].get(name)
+            if before_result is None:
+                self.stdout.write("{}: {:.4f}s (new)".format(name,
+                    result['best']))
+                continue
+
+            change = ""
+            if before_result['best']:
+                change = " ({:+.1f}%)".format(
+                    100.0 * (result['best'] - before_result['best']) /
+                    before_result['best'])
+            self.stdout.write("{}: {:.4f}s -> {:.4f}s{}".format(name,
+                before_result['best'], result['best'], change))
@@ -0,0 +1,187 @@
+import datetime
+import json
+from optparse import make_option
+import os
+import platform
+import time
+
+from django.core.management.base import CommandError
+
+from convictions_data.benchmarks import get_commit
+from convictions_data.management.base import BaseCommand
+from convictions_data.pipeline import Pipeline, PipelineError, get_stages
+
+class Command(BaseCommand):
+    help = ("Run the commands that load and process the data on the real "
+            "or synthetic data, skipping stages whose inputs haven't changed")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--data-dir',
+            action='store',
+            dest='data_dir',
+            default=None,
+            help=("Directory of the input files.  Default is 'data', or "
+                  "'synthetic' with --synthetic")),
+        make_option('--output-dir',
+            action='store',
+            dest='output_dir',
+            default='pipeline',
+            help=("Directory for the exported files and the output of each "
+                  "stage.  Default is 'pipeline'")),
+        make_option('--stage',
+            action='append',
+            dest='stages',
+            default=None,
+            help=("Only run the stage with this name.  Can be specified "
+                  "more than once")),
+        make_option('--skip',
+            action='append',
+            dest='skip',
+            default=None,
+            help=("Don't run the stage with this name.  Can be specified "
+                  "more than once")),
+        make_option('--force',
+            action='store_true',
+            default=False,
+            help=("Run stages even if their inputs haven't changed since "
+                  "they last completed")),
+        make_option('--jobs',
+            action='store',
+            type='int',
+            default=1,
+            help=("Number of stages that don't depend on each other to run "
+                  "at the same time.  Default is 1")),
+        make_option('--synthetic',
+            action='store_true',
+            default=False,
+            help=("Generate synthetic records and boundaries in the data "
+                  "directory and run the pipeline on them")),
+        make_option('--records',
+            action='store',
+            type='int',
+            default=10000,
+            help="Number of synthetic records to generate"),
+        make_option('--seed',
+            action='store',
+            type='int',
+            default=0,
+            help="Seed for generating the synthetic records"),
+        make_option('--bench',
+            action='store_true',
+            default=False,
+            help=("Measure the rows per second, queries and peak memory of "
+                  "each stage and store the results.  Implies --force")),
+        make_option('--results-dir',
+            action='store',
+            dest='results_dir',
+            default='benchmarks',
+            help=("With --bench, store the results in a JSON file, named "
+                  "after the time and the git commit, in this directory.  "
+                  "Default is 'benchmarks'")),
+        make_option('--compare',
+            action='store',
+            default=None,
+            help="With --bench, compare the results to those in this file"),
+    )
+
+    def handle(self, *args, **options):
+        data_dir = options['data_dir']
+        if data_dir is None:
+            data_dir = 'synthetic' if options['synthetic'] else 'data'
+        output_dir = options['output_dir']
+
+        stages = get_stages(data_dir, output_dir,
+            synthetic=options['synthetic'], records=options['records'],
+            seed=options['seed'])
+        pipeline = Pipeline(stages, os.path.join(output_dir, 'logs'))
+
+        now = datetime.datetime.now()
+        start = time.time()
+        try:
+            results = pipeline.run(options['stages'], options['skip'],
+                bench=options['bench'],
+                force=options['force'] or options['bench'],
+                jobs=options['jobs'], callback=self.write_result)
+        except PipelineError as e:
+            raise CommandError(str(e))
+
+        num_skipped = len([r for r in results.values() if r.get('skipped')])
+        self.stdout.write("Ran {} stages in {:.3f}s, skipped {} unchanged "
+            "stages".format(len(results) - num_skipped, time.time() - start,
+                num_skipped))
+
+        if not options['bench']:
+            return
+
+        commit = get_commit()
+        report = {
+            'created': now.isoformat(),
+            'commit': commit,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'data_dir': data_dir,
+            'synthetic': options['synthetic'],
+            'records': options['records'] if options['synthetic'] else None,
+            'seed': options['seed'] if options['synthetic'] else None,
+            'stages': results,
+        }
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.write_comparison(json.load(f), report)
+
+        results_dir = options['results_dir']
+        if not os.path.exists(results_dir):
+            os.makedirs(results_dir)
+        path = os.path.join(results_dir, "pipeline_{}_{}.json".format(
+            now.strftime("%Y%m%d%H%M%S"), commit or "unknown"))
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+        self.stdout.write("Wrote results to {}".format(path))
+
+    def write_result(self, stage, result):
+        if result.get('skipped'):
+            self.stdout.write("{}: skipped, unchanged".format(stage.name))
+            return
+
+        if 'rows' not in result:
+            self.stdout.write("{}: {:.3f}s".format(stage.name,
+                result['seconds']))
+            return
+
+        rows = ""
+        if result['rows'] is not None:
+            rows = ", {} rows, {:.1f} rows/sec".format(result['rows'],
+                result['rows_per_second'] or 0)
+        self.stdout.write("{}: {:.3f}s{}, {} queries in {:.3f}s, {:.1f} MB "
+            "peak RSS".format(stage.name, result['seconds'], rows,
+                result['num_queries'], result['db_seconds'],
+                result['peak_rss_bytes'] / (1024.0 * 1024.0)))
+
+    def write_comparison(self, before, after):
+        self.stdout.write("Comparing to {} ({})".format(
+            before.get('commit') or "unknown commit", before['created']))
+        if (before['synthetic'], before['records']) != \
+                (after['synthetic'], after['records']):
+            self.stderr.write("Warning: the results are for different "
+                "datasets")
+
+        for name, result in after['stages'].items():
+            before_result = before['stages'].get(name)
+            if before_result is None:
+                self.stdout.write("{}: {:.3f}s (new)".format(name,
+                    result['seconds']))
+                continue
+
+            change = ""
+            if before_result['seconds']:
+                change = " ({:+.1f}%)".format(
+                    100.0 * (result['seconds'] - before_result['seconds']) /
+                    before_result['seconds'])
+            self.stdout.write("{}: {:.3f}s -> {:.3f}s{}, {} -> {} queries, "
+                "{:.1f} -> {:.1f} MB peak RSS".format(name,
+                    before_result['seconds'], result['seconds'], change,
+                    before_result['num_queries'], result['num_queries'],
+                    before_result['peak_rss_bytes'] / (1024.0 * 1024.0),
+                    result['peak_rss_bytes'] / (1024.0 * 1024.0)))
@@ -0,0 +1,29 @@
+from optparse import make_option
+
+from django.db import transaction
+
+from convictions_data.management.base import BaseCommand
+from convictions_data.models import Conviction, Disposition
+
+class Command(BaseCommand):
+    help = ("Calculate and store the age at disposition for dispositions "
+            "and convictions")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size',
+            action='store',
+            type='int',
+            dest='batch_size',
+            default=1000,
+            help="Number of records to update in each query",
+        ),
+    )
+
+    def handle(self, *args, **options):
+        for model in (Disposition, Conviction):
+            with transaction.atomic():
+                num_updated = model.objects.all().set_age_at_disposition(
+                    batch_size=options['batch_size'])
+
+            self.stdout.write("Updated {} {} records".format(num_updated,
+                model._meta.verbose_name))
@@ -1,19 +1,18 @@
-from django.core.management.base import BaseCommand
 from django.db import transaction
 
-from convictions_data.models import Conviction, Disposition
+from convictions_data.management.base import BaseCommand
+from convictions_data.models import Conviction, GeographyConvictionStats
 
 class Command(BaseCommand):
-    help = "Create convictions based on disposition records"
+    help = ("Set conviction community areas and places based on disposition "
+            "records")
 
     def handle(self, *args, **options):
         with transaction.atomic():
-            for c in Conviction.objects.all():
-                # All records in a case should have the same address and therefore
-                # the same place.  We can just grab the same one.
-                disp = Disposition.objects.filter(case_number=c.case_number)[0]
+            num_updated = Conviction.objects.all()\
+                .load_geographies_from_dispositions()
+            # The stored statistics count convictions by their old
+            # geographies
+            GeographyConvictionStats.objects.all().delete()
 
-                if disp.place is not None:
-                    c.place = disp.place
-                    c.save()
-               
+        self.stdout.write("Updated {} convictions".format(num_updated))
@@ -0,0 +1,22 @@
+from convictions_data.management.base import BaseCommand
+from convictions_data.models import Conviction, Disposition
+from convictions_data.snapshot import (CONVICTION_COLUMNS,
+    DISPOSITION_COLUMNS, write_categories, write_snapshot)
+
+class Command(BaseCommand):
+    args = "<output_dir>"
+    help = ("Export a columnar snapshot of convictions and dispositions "
+            "for in-process analysis")
+
+    def handle(self, output_dir, *args, **options):
+        manifest = write_snapshot(output_dir, [
+            ('conviction', CONVICTION_COLUMNS,
+                Conviction.objects.all().order_by('id')),
+            ('disposition', DISPOSITION_COLUMNS,
+                Disposition.objects.in_analysis().order_by('id')),
+        ])
+        write_categories(output_dir, 'conviction')
+
+        for table_name, metadata in manifest['tables'].items():
+            self.stdout.write("Wrote {} rows to table {}".format(
+                metadata['num_rows'], table_name))
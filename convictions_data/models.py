@@ -1,4 +1,5 @@
 from datetime import datetime
+import json
 import logging
 import math
 import re
@@ -17,7 +18,10 @@ from convictions_data.cleaner import CityStateCleaner, CityStateSplitter
 from convictions_data.manager import (CensusPlaceManager,
     CensusTractManager, CommunityAreaManager, DispositionManager)
 
-from convictions_data.query import ConvictionQuerySet
+from convictions_data.query import (AnonymizedAddressQuerySet,
+    ConvictionQuerySet, GeographyConvictionStatsQuerySet,
+    SimplifiedGeometryQuerySet)
+from convictions_data.query.age import calculate_age
 from convictions_data.statute import (get_iucr, parse_statute, format_statute,
     MultipleMatchingILCSError, ILCSLookupError, IUCRLookupError,
     StatuteFormatError)
@@ -143,6 +147,10 @@ class Disposition(models.Model):
     arrest_date = models.DateField(null=True)
     initial_date = models.DateField(null=True, db_index=True)
     chrgdispdate = models.DateField(null=True, db_index=True)
+    age_at_disposition = models.IntegerField(null=True, db_index=True,
+        help_text=("Age, in years, on chrgdispdate.  Stored so age ranges "
+                   "can be filtered with an index instead of calculating "
+                   "age from the dates for every row"))
 
     sex = models.CharField(max_length=10, choices=SEX_CHOICES)
 
@@ -202,6 +210,16 @@ class Disposition(models.Model):
     # Use a custom manager to add geocoding methods
     objects = DispositionManager()
 
+    class Meta:
+        # Composite indexes for the filters that the analysis combines.
+        # See ``convictions_data.explain`` for the queries that use them.
+        index_together = (
+            # Finding the first disposition date of each case, in
+            # ``from_initial_chrgdispdate()``
+            ('case_number', 'chrgdispdate'),
+            # Counting cases by how their charge class changed
+            ('chrgclass', 'final_chrgclass'),
+        )
 
     def __init__(self, *args, **kwargs):
         super(Disposition, self).__init__(*args, **kwargs)
@@ -209,6 +227,10 @@ class Disposition(models.Model):
             # New model, populate it's fields by parsing the values from
             self.load_from_raw()
 
+    @classmethod
+    def get_anonymized_address_model(cls):
+        return AnonymizedAddress
+
     def geocode(self, geocoder_cls=geopy.geocoders.OpenMapQuest):
         geocoder = geocoder_cls(
             api_key=settings.CONVICTIONS_GEOCODER_API_KEY,
@@ -244,6 +266,7 @@ class Disposition(models.Model):
             self.load_field_from_raw(field_name)
 
         self.load_final_fields()
+        self.load_age_at_disposition()
 
         return self
 
@@ -280,6 +303,10 @@ class Disposition(models.Model):
                               self.ammndchrgclass)
         return self
 
+    def load_age_at_disposition(self):
+        self.age_at_disposition = calculate_age(self.dob, self.chrgdispdate)
+        return self
+
     def load_final_field(self, fieldname, val1, val2):
         val = val2 if val2 else val1
         setattr(self, fieldname, val)
@@ -549,6 +576,10 @@ class Conviction(models.Model):
     sex = models.CharField(max_length=10, choices=SEX_CHOICES, db_index=True)
 
     chrgdispdate = models.DateField(null=True)
+    age_at_disposition = models.IntegerField(null=True, db_index=True,
+        help_text=("Age, in years, on chrgdispdate.  Stored so age ranges "
+                   "can be filtered with an index instead of calculating "
+                   "age from the dates for every row"))
     final_statute = models.CharField(max_length=50, default="",
         help_text=("Field to make querying easier.  Set to the value of "
                    "ammndchargstatute if present, otherwise set to the value "
@@ -572,12 +603,69 @@ class Conviction(models.Model):
     place = models.ForeignKey('CensusPlace', null=True,
         on_delete=models.SET_NULL)
 
+    # Flags for the categories of crimes used in our reports. These are
+    # set by ``ConvictionQuerySet.categorize()`` from the queries in
+    # ``convictions_data.query.categories`` so that reports can filter on
+    # an indexed column instead of matching regular expressions.
+    violent_index = models.BooleanField(default=False, db_index=True)
+    property_index = models.BooleanField(default=False, db_index=True)
+    drug = models.BooleanField(default=False, db_index=True)
+    drug_mfg_del = models.BooleanField(default=False, db_index=True)
+    drug_poss = models.BooleanField(default=False, db_index=True)
+    affecting_women = models.BooleanField(default=False, db_index=True)
+    homicide = models.BooleanField(default=False, db_index=True)
+    dui = models.BooleanField(default=False, db_index=True)
+    other = models.BooleanField(default=False, db_index=True)
+
+    drug_categories_set = models.BooleanField(default=False, db_index=True,
+        help_text=("Have the drug categories of this conviction been stored "
+                   "as ConvictionDrugCategory records?"))
 
     objects = PassThroughManager.for_queryset_class(ConvictionQuerySet)()
 
+    class Meta:
+        # Composite indexes for filtering convictions in a geography by
+        # category.  See ``convictions_data.explain``.
+        index_together = (
+            ('community_area', 'iucr_category'),
+            ('place', 'iucr_category'),
+        )
+
     def __str__(self):
         return "{} {} {}".format(self.case_number, self.chrgdispdate, self.final_statute)
 
+    @classmethod
+    def get_disposition_model(cls):
+        return Disposition
+
+    @classmethod
+    def get_drug_category_model(cls):
+        return ConvictionDrugCategory
+
+    @classmethod
+    def get_stats_model(cls):
+        return GeographyConvictionStats
+
+
+class ConvictionDrugCategory(models.Model):
+    """
+    Drug category of a conviction
+
+    The categories are the names of the drug queries in
+    ``convictions_data.query.drugs``, like ``poss_heroin``.  A conviction
+    can be in many overlapping categories, so they're stored as separate
+    records rather than flags on the conviction.  These are set by
+    ``ConvictionQuerySet.set_drug_categories()``.
+    """
+    conviction = models.ForeignKey(Conviction, related_name='drug_categories')
+    name = models.CharField(max_length=50, db_index=True)
+
+    class Meta:
+        unique_together = (('conviction', 'name'),)
+
+    def __str__(self):
+        return "{} {}".format(self.conviction_id, self.name)
+
 
 class Municipality(geo_models.Model):
     """
@@ -637,6 +725,14 @@ class ConvictionsAggregateMixin(object):
     def get_conviction_model(cls):
         return Conviction
 
+    @classmethod
+    def get_stats_model(cls):
+        return GeographyConvictionStats
+
+    @classmethod
+    def get_simplified_geometry_model(cls):
+        return SimplifiedGeometry
+
     def most_common_statutes(self, count=10):
         filter_kwargs = {}
         filter_kwargs[self.get_conviction_related_field_name()] = self
@@ -830,6 +926,135 @@ class CensusPlace(ConvictionsAggregateMixin, CensusFieldsMixin, geo_models.Model
 
 
 
+class GeographyConvictionStats(models.Model):
+    """
+    Stored conviction statistics for a Community Area or Census Place
+
+    These are calculated by the ``refresh_geography_stats`` management
+    command so exports don't have to aggregate convictions every time
+    they're run.  ``ConvictionGeoQuerySet`` reads these statistics when
+    they're fresh, that is, when no convictions have been created or
+    deleted since they were calculated.  The commands that change
+    conviction categories or geographies, or reload the geographies or
+    their population, delete them.
+    """
+    geography_type = models.CharField(max_length=20, db_index=True,
+        help_text="Model name of the geography, e.g. CommunityArea")
+    geography_id = models.IntegerField()
+
+    num_convictions = models.IntegerField(default=0)
+    num_violent_index = models.IntegerField(default=0)
+    num_property_index = models.IntegerField(default=0)
+    num_drug = models.IntegerField(default=0)
+    num_homicides = models.IntegerField(default=0)
+    num_affecting_women = models.IntegerField(default=0)
+    num_dui = models.IntegerField(default=0)
+
+    convictions_per_capita = models.FloatField(null=True)
+    affecting_women_per_capita = models.FloatField(null=True)
+    dui_per_capita = models.FloatField(null=True)
+    pct_dui = models.FloatField(null=True)
+
+    top_statutes = models.TextField(default="[]",
+        help_text=("JSON list of the most common statutes in the format "
+                   "returned by ConvictionQuerySet.most_common_statutes()"))
+    top_statutes_count = models.IntegerField(default=0,
+        help_text="Number of most common statutes that were calculated")
+
+    conviction_count = models.IntegerField(
+        help_text="Total number of convictions when these were calculated")
+    max_conviction_id = models.IntegerField(null=True,
+        help_text="Largest conviction id when these were calculated")
+    updated = models.DateTimeField(auto_now=True)
+
+    objects = PassThroughManager.for_queryset_class(
+        GeographyConvictionStatsQuerySet)()
+
+    class Meta:
+        unique_together = (('geography_type', 'geography_id'),)
+
+    def __str__(self):
+        return "{} {}".format(self.geography_type, self.geography_id)
+
+    @classmethod
+    def get_conviction_model(cls):
+        return Conviction
+
+    def get_top_statutes(self):
+        return json.loads(self.top_statutes)
+
+    def set_top_statutes(self, statutes):
+        self.top_statutes = json.dumps([dict(statute) for statute in statutes])
+
+
+class SimplifiedGeometry(geo_models.Model):
+    """
+    Cached simplified boundary of a Community Area or Census Place
+
+    Simplifying boundaries is the slowest part of exporting GeoJSON, and
+    the result only depends on the boundary and the tolerance, so we store
+    it.  The cache is cleared when spatial data is reloaded.
+    """
+    geography_type = geo_models.CharField(max_length=20, db_index=True,
+        help_text="Model name of the geography, e.g. CommunityArea")
+    geography_id = geo_models.IntegerField()
+    tolerance = geo_models.FloatField()
+
+    geometry = geo_models.GeometryField()
+
+    objects = PassThroughManager.for_queryset_class(
+        SimplifiedGeometryQuerySet)()
+
+    class Meta:
+        unique_together = (('geography_type', 'geography_id', 'tolerance'),)
+
+    def __str__(self):
+        return "{} {} {}".format(self.geography_type, self.geography_id,
+            self.tolerance)
+
+
+class AnonymizedAddress(models.Model):
+    """
+    Stored anonymized version of a disposition address
+
+    Parsing addresses with usaddress is the slowest part of exporting
+    public data, and each distinct address only needs to be anonymized
+    once, so the results are stored and shared between exports.  Fill
+    this in ahead of an export with the ``anonymize_addresses``
+    management command.
+    """
+    address = models.CharField(max_length=MAX_LENGTH, unique=True)
+    anonymized = models.CharField(max_length=MAX_LENGTH)
+
+    objects = PassThroughManager.for_queryset_class(
+        AnonymizedAddressQuerySet)()
+
+    def __str__(self):
+        return self.address
+
+
+class PipelineStage(models.Model):
+    """
+    Completion state of a stage of the pipeline
+
+    These are recorded by the ``run_pipeline`` management command so that
+    stages whose inputs haven't changed since they completed can be
+    skipped.  They're stored with the data that the stages create, so a
+    new database starts without any completed stages.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    fingerprint = models.CharField(max_length=40,
+        help_text=("Hash of the stage's command, options, input files and "
+                   "the completion of the stages it requires"))
+    started = models.DateTimeField()
+    completed = models.DateTimeField(null=True,
+        help_text="When the stage last completed, or null if it failed")
+    seconds = models.FloatField(null=True)
+
+    def __str__(self):
+        return self.name
+
+
 class County(geo_models.Model):
     statefp10 = geo_models.CharField(max_length=2)
     countyfp10 = geo_models.CharField(max_length=3)
@@ -879,4 +1104,11 @@ def handle_post_load_spatial_data(sender, **kwargs):
     if kwargs['model'] == CensusTract:
         CensusTract.objects.set_community_area_relations()
 
+    # Boundaries may have changed, so clear any cached simplified versions
+    SimplifiedGeometry.objects.for_geography_model(kwargs['model']).delete()
+    # Geographies may have been recreated with new ids, so statistics
+    # stored for the old ones no longer apply
+    GeographyConvictionStats.objects.for_geography_model(kwargs['model'])\
+        .delete()
+
 post_load_spatial_data.connect(handle_post_load_spatial_data)
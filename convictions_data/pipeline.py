@@ -0,0 +1,533 @@
+"""
+Run the commands that load and process the data as a pipeline
+
+The README walks through a long sequence of management commands.  Each
+stage of the pipeline runs one of those commands, on either the real data,
+with the file names used in the README, or on synthetic data from
+``convictions_data.synthetic``.  Use the
+``run_pipeline`` management command to run the stages and, optionally,
+measure each of them.
+
+The stages form a directed acyclic graph: each stage lists the stages that
+it requires, so stages that don't depend on each other, like loading the
+different boundaries, can run at the same time.  When a stage completes,
+its fingerprint, a hash of its command, options, input files and the
+completion of the stages it requires, is stored in a ``PipelineStage``
+model.  A stage whose fingerprint hasn't changed since it last completed
+is skipped, so a failed run can be resumed from the stage that failed.
+
+"""
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import glob
+import hashlib
+import json
+import os
+import time
+
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+
+import convictions_data.models
+from convictions_data.models import (CensusPlace, CommunityArea, Conviction,
+    Disposition, GeographyConvictionStats, PipelineStage, RawDisposition)
+from convictions_data.profiling import CommandProfiler, reset_peak_rss
+from convictions_data.synthetic import BOUNDARY_LAYERS, CHICAGO_MSA_FILENAME
+
+SPATIAL_LAYERS = [
+    # Stage name, model name, path of the real data in the data directory
+    ('load_community_areas', 'CommunityArea', 'Comm_20Areas/CommAreas.shp'),
+    ('load_municipalities', 'Municipality', 'Municipality/Municipality.shp'),
+    ('load_census_tracts', 'CensusTract',
+     'CensusTracts2010/CensusTractsTIGER2010.shp'),
+    ('load_census_places', 'CensusPlace',
+     'tl_2010_17_place10/tl_2010_17_place10.shp'),
+    ('load_counties', 'County', 'tl_2010_17_county10/tl_2010_17_county10.shp'),
+]
+"""Boundaries loaded by the pipeline"""
+
+CENSUS_DATA = [
+    # Stage name, model name, field, path in the data directory
+    ('load_tract_population', 'CensusTract', 'total_population',
+     'ACS_10_5YR_B01003_with_ann__totpop__tracts.csv'),
+    ('load_tract_income', 'CensusTract', 'per_capita_income',
+     'ACS_10_5YR_B19301_with_ann__per_capita_income__tracts.csv'),
+    ('load_place_population', 'CensusPlace', 'total_population',
+     'ACS_10_5YR_B01003_with_ann__totpop__places.csv'),
+    ('load_place_income', 'CensusPlace', 'per_capita_income',
+     'ACS_10_5YR_B19301_with_ann__per_capita_income__places.csv'),
+]
+"""American FactFinder tables loaded by the pipeline.  There's no synthetic
+version of these."""
+
+DISPOSITIONS_FILENAME = 'Criminal_Convictions_ALLCOOK_05-09.csv'
+
+CHICAGO_MSA_PLACES_FILENAME = 'tl_2010_17_place10_chicago_msa.csv'
+
+SYNTHETIC_DISPOSITIONS_FILENAME = 'dispositions.csv'
+
+
+class PipelineError(Exception):
+    pass
+
+
+class Stage(object):
+    """
+    A step of the pipeline, which runs a management command
+
+    Args:
+        name (str): Name of the stage.
+        command (str): Name of the management command.
+        args (list): Positional arguments to the command.
+        options (dict): Options for the command.
+        requires (list): Names of the stages that have to complete before
+            this one runs.
+        inputs (list): Paths of the files that the command reads.
+        outputs (list): Paths of files or directories that the command
+            creates.  The stage isn't skipped if any of them are missing.
+        output (str): Path of a file to write the command's output to.
+            Default is to write it to a log file.
+        count (callable): Function that returns the number of rows that
+            the stage has processed, once it has run.
+
+    """
+
+    def __init__(self, name, command, args=None, options=None, requires=None,
+            inputs=None, outputs=None, output=None, count=None):
+        self.name = name
+        self.command = command
+        self.args = list(args or [])
+        self.options = options or {}
+        self.requires = list(requires or [])
+        self.inputs = list(inputs or [])
+        self.outputs = list(outputs or [])
+        if output is not None:
+            self.outputs.append(output)
+        self.output = output
+        self.count = count
+
+    def __repr__(self):
+        return "<Stage: {}>".format(self.name)
+
+    def check_inputs(self):
+        missing = [path for path in self.inputs if not os.path.exists(path)]
+        if missing:
+            raise PipelineError("Missing input files for stage {}: "
+                "{}".format(self.name, ", ".join(missing)))
+
+    def has_outputs(self):
+        return all(os.path.exists(path) for path in self.outputs)
+
+    def fingerprint(self, required):
+        """
+        Return a hash of everything that the result of the stage depends on
+
+        Args:
+            required (list): ``PipelineStage`` models of the stages this
+                stage requires, or None for stages that have never
+                completed.
+
+        """
+        data = [
+            self.command,
+            self.args,
+            sorted(self.options.items()),
+            [file_fingerprint(path) for path in self.inputs],
+            [(s.name, s.fingerprint, s.completed.isoformat())
+             if s is not None and s.completed else None for s in required],
+        ]
+        return hashlib.sha1(json.dumps(data, default=str).encode('utf-8'))\
+            .hexdigest()
+
+    def run(self, log_dir):
+        self.check_inputs()
+
+        output = self.output or os.path.join(log_dir,
+            "{}.log".format(self.name))
+        output_dir = os.path.dirname(output)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+
+        with open(output, 'w') as f:
+            call_command(self.command, *self.args, stdout=f, **self.options)
+
+    def count_rows(self):
+        if self.count is None:
+            return None
+
+        return self.count()
+
+
+def file_fingerprint(path):
+    """
+    Return a hash of the contents of a file
+
+    For a shapefile, this includes the files with the same name and a
+    different extension, like the ``.dbf`` file with the attributes.
+    """
+    paths = [path]
+    root, ext = os.path.splitext(path)
+    if ext.lower() == '.shp':
+        paths = sorted(glob.glob(root + '.*'))
+
+    sha1 = hashlib.sha1()
+    for p in paths:
+        with open(p, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha1.update(chunk)
+
+    return sha1.hexdigest()
+
+
+def get_stages(data_dir, output_dir, synthetic=False, records=10000, seed=0):
+    """
+    Return the stages of the pipeline, in the order of the README
+
+    Args:
+        data_dir (str): Directory of the input files.  For synthetic data,
+            the files are generated in this directory by the first stage.
+        output_dir (str): Directory for the exported files.
+        synthetic (bool): Run the pipeline on synthetic data instead of
+            the real data.
+        records (int): Number of synthetic records to generate.
+        seed: Seed for generating the synthetic records.
+
+    Returns:
+        List of ``Stage`` objects.
+
+    """
+    stages = []
+    # Stages that read the synthetic data have to wait for it
+    generated = []
+
+    if synthetic:
+        dispositions_path = os.path.join(data_dir,
+            SYNTHETIC_DISPOSITIONS_FILENAME)
+        chicago_msa_path = os.path.join(data_dir, CHICAGO_MSA_FILENAME)
+        boundary_paths = [os.path.join(data_dir, filename)
+                          for filename, get_features in
+                          BOUNDARY_LAYERS.values()]
+        stages.append(Stage('generate_synthetic_data',
+            'generate_synthetic_data', [dispositions_path],
+            {'records': records, 'seed': seed, 'boundaries_dir': data_dir},
+            outputs=[dispositions_path, chicago_msa_path] + boundary_paths,
+            count=lambda: records))
+        generated = ['generate_synthetic_data']
+    else:
+        dispositions_path = os.path.join(data_dir, DISPOSITIONS_FILENAME)
+        chicago_msa_path = os.path.join(data_dir, CHICAGO_MSA_PLACES_FILENAME)
+
+    for name, model_name, path in SPATIAL_LAYERS:
+        if synthetic:
+            path = BOUNDARY_LAYERS[model_name][0]
+        path = os.path.join(data_dir, path)
+        model_cls = getattr(convictions_data.models, model_name)
+        requires = list(generated)
+        if model_name == 'CensusTract':
+            # Tracts are related to community areas when they're loaded
+            requires.append('load_community_areas')
+        stages.append(Stage(name, 'load_spatial_data', [model_name, path],
+            {'delete': True}, requires=requires, inputs=[path],
+            count=model_cls.objects.count))
+
+    # Statistics are calculated per capita
+    census_stages = []
+    if not synthetic:
+        for name, model_name, field, path in CENSUS_DATA:
+            path = os.path.join(data_dir, path)
+            model_cls = getattr(convictions_data.models, model_name)
+            requires = ['load_census_tracts' if model_name == 'CensusTract'
+                        else 'load_census_places']
+            stages.append(Stage(name, 'load_aff_data', [model_name, field,
+                'GEO.id2', 'HD01_VD01', 'HD02_VD01', path],
+                requires=requires, inputs=[path],
+                count=model_cls.objects.count))
+
+        stages.append(Stage('aggregate_census_fields',
+            'aggregate_census_fields',
+            requires=['load_tract_population', 'load_tract_income'],
+            count=CommunityArea.objects.count))
+        census_stages = ['aggregate_census_fields', 'load_place_population',
+                         'load_place_income']
+
+    stages.extend([
+        Stage('flag_chicago_msa_places', 'flag_chicago_msa_places',
+            [chicago_msa_path], requires=generated + ['load_census_places'],
+            inputs=[chicago_msa_path],
+            count=CensusPlace.objects.filter(in_chicago_msa=True).count),
+        Stage('flag_cook_county_places', 'flag_cook_county_places',
+            requires=['load_census_places', 'load_counties'],
+            count=CensusPlace.objects.count),
+        Stage('load_dispositions_csv', 'load_dispositions_csv',
+            [dispositions_path], {'delete': True}, requires=generated,
+            inputs=[dispositions_path], count=RawDisposition.objects.count),
+        # Loading the state of a disposition looks up municipalities
+        Stage('create_dispositions', 'create_dispositions',
+            options={'delete': True},
+            requires=['load_dispositions_csv', 'load_municipalities'],
+            count=Disposition.objects.count),
+        Stage('detect_cook', 'detect_cook',
+            requires=['create_dispositions', 'load_municipalities'],
+            count=Disposition.objects.count),
+        Stage('geocode_dispositions', 'geocode_dispositions',
+            options={'synthetic': synthetic}, requires=['detect_cook'],
+            count=lambda: Disposition.objects.geocoded().count()),
+        Stage('boundarize', 'boundarize',
+            requires=['geocode_dispositions', 'load_community_areas',
+                      'load_census_places'],
+            count=lambda: Disposition.objects.geocoded().count()),
+        Stage('create_convictions', 'create_convictions',
+            options={'delete': True, 'categorize': False},
+            requires=['boundarize'],
+            count=Conviction.objects.count),
+        Stage('categorize_convictions', 'categorize_convictions',
+            requires=['create_convictions'], count=Conviction.objects.count),
+        Stage('set_age_at_disposition', 'set_age_at_disposition',
+            requires=['create_convictions'], count=Disposition.objects.count),
+        Stage('refresh_geography_stats', 'refresh_geography_stats',
+            requires=['categorize_convictions', 'flag_cook_county_places'] +
+                census_stages,
+            count=GeographyConvictionStats.objects.count),
+        Stage('export_public_data', 'export_public_data',
+            options={'output_dir': os.path.join(output_dir, 'public')},
+            requires=['set_age_at_disposition'],
+            outputs=[os.path.join(output_dir, 'public')],
+            count=Disposition.objects.count),
+        Stage('export_community_areas_geojson', 'export_model_geojson',
+            ['CommunityArea'], requires=['refresh_geography_stats'],
+            output=os.path.join(output_dir, 'community_areas.geojson'),
+            count=CommunityArea.objects.count),
+        Stage('export_places_geojson', 'export_model_geojson',
+            ['CensusPlace'], requires=['refresh_geography_stats'],
+            output=os.path.join(output_dir, 'places.geojson'),
+            count=CensusPlace.objects.filter(in_cook_county=True).count),
+    ])
+
+    return stages
+
+
+class Pipeline(object):
+    """
+    Run the stages of the pipeline
+
+    Args:
+        stages (list): ``Stage`` objects.  Each stage has to come after the
+            stages that it requires.
+        log_dir (str): Directory for the output of the stages' commands.
+
+    """
+
+    def __init__(self, stages, log_dir):
+        self.stages = OrderedDict()
+        for stage in stages:
+            for name in stage.requires:
+                if name not in self.stages:
+                    raise PipelineError("Stage {} requires {}, which isn't "
+                        "an earlier stage".format(stage.name, name))
+            self.stages[stage.name] = stage
+        self.log_dir = log_dir
+
+    def select(self, names=None, skip=None):
+        """
+        Return stages, in order
+
+        Args:
+            names (list): Names of the stages to include.  Default is to
+                include all of them.
+            skip (list): Names of the stages to exclude.
+
+        """
+        for name in list(names or []) + list(skip or []):
+            if name not in self.stages:
+                raise PipelineError("Unknown stage '{}'.  Choices are: "
+                    "{}".format(name, ", ".join(self.stages)))
+
+        return [stage for name, stage in self.stages.items()
+                if (not names or name in names) and name not in (skip or [])]
+
+    def get_checkpoint(self, name):
+        """Return the ``PipelineStage`` model of a stage, or None"""
+        return PipelineStage.objects.filter(name=name).first()
+
+    def get_fingerprint(self, stage):
+        stage.check_inputs()
+        return stage.fingerprint([self.get_checkpoint(name)
+                                  for name in stage.requires])
+
+    def is_current(self, stage, fingerprint):
+        """
+        Return True if a stage has completed with the same fingerprint and
+        its outputs still exist
+        """
+        checkpoint = self.get_checkpoint(stage.name)
+        return (checkpoint is not None and checkpoint.completed is not None
+                and checkpoint.fingerprint == fingerprint and
+                stage.has_outputs())
+
+    def run(self, names=None, skip=None, bench=False, force=False, jobs=1,
+            callback=None):
+        """
+        Run stages
+
+        A stage is run once the stages it requires have completed or have
+        been skipped.  Required stages that aren't selected aren't run.
+
+        Args:
+            names (list): Names of the stages to run.  Default is to run
+                all of them.
+            skip (list): Names of stages not to run.
+            bench (bool): Measure each stage with ``run_stage()``.
+            force (bool): Run stages even if they have already completed
+                and their fingerprints haven't changed.
+            jobs (int): Number of stages to run at the same time.  Each
+                stage runs in its own thread, with its own database
+                connection.  Benchmarks can only run one stage at a time.
+            callback (callable): Function called with each stage and its
+                result once the stage has run or been skipped.
+
+        Returns:
+            Ordered dictionary of the results of ``run_stage()``, keyed by
+            stage name, in the order the stages finished.  The results of
+            skipped stages are ``{'skipped': True}``.
+
+        """
+        if bench and jobs > 1:
+            raise PipelineError("Benchmarks can only run one stage at a time")
+
+        stages = self.select(names, skip)
+        results = OrderedDict()
+
+        def finish(stage, result):
+            results[stage.name] = result
+            if callback is not None:
+                callback(stage, result)
+
+        if jobs <= 1:
+            for stage in stages:
+                fingerprint = self.get_fingerprint(stage)
+                if not force and self.is_current(stage, fingerprint):
+                    finish(stage, {'skipped': True})
+                    continue
+
+                self.start_checkpoint(stage, fingerprint)
+                result = self.run_stage(stage, bench)
+                self.complete_checkpoint(stage, result)
+                finish(stage, result)
+
+            return results
+
+        selected = set(stage.name for stage in stages)
+        pending = list(stages)
+        running = {}
+        error = None
+        with ThreadPoolExecutor(jobs) as executor:
+            while running or (pending and error is None):
+                for stage in list(pending):
+                    if error is not None or len(running) >= jobs:
+                        break
+                    if any(name in selected and name not in results
+                           for name in stage.requires):
+                        continue
+
+                    pending.remove(stage)
+                    fingerprint = self.get_fingerprint(stage)
+                    if not force and self.is_current(stage, fingerprint):
+                        finish(stage, {'skipped': True})
+                        continue
+
+                    self.start_checkpoint(stage, fingerprint)
+                    future = executor.submit(self._run_stage_in_thread,
+                        stage)
+                    running[future] = stage
+
+                if not running:
+                    break
+
+                done, not_done = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # Let the running stages finish, but don't start
+                        # any more
+                        error = error or e
+                        continue
+
+                    self.complete_checkpoint(stage, result)
+                    finish(stage, result)
+
+        if error is not None:
+            raise error
+
+        return results
+
+    def _run_stage_in_thread(self, stage):
+        try:
+            return self.run_stage(stage)
+        finally:
+            # Each thread has its own connection
+            connection.close()
+
+    def start_checkpoint(self, stage, fingerprint):
+        checkpoint = (self.get_checkpoint(stage.name) or
+                      PipelineStage(name=stage.name))
+        checkpoint.fingerprint = fingerprint
+        checkpoint.started = timezone.now()
+        checkpoint.completed = None
+        checkpoint.seconds = None
+        checkpoint.save()
+
+    def complete_checkpoint(self, stage, result):
+        PipelineStage.objects.filter(name=stage.name).update(
+            completed=timezone.now(), seconds=result['seconds'])
+
+    def run_stage(self, stage, bench=False):
+        """
+        Run a stage
+
+        Args:
+            stage (Stage): Stage to run.
+            bench (bool): Also measure the rows processed per second, the
+                database queries and the peak memory use of the stage.
+                The queries are recorded with Django's debug cursor, which
+                adds some overhead.
+
+        Returns:
+            Dictionary with the wall time of the stage in ``seconds``.
+            When benchmarking, it also includes ``rows``,
+            ``rows_per_second``, ``num_queries``, ``db_seconds``,
+            ``cpu_seconds``, ``peak_rss_bytes``, which is only the peak of
+            the stage if ``peak_rss_reset`` is true, and the
+            ``slowest_queries`` and ``repeated_queries`` of the stage.
+
+        """
+        if bench:
+            peak_rss_reset = reset_peak_rss()
+            profiler = CommandProfiler(stage.command, stage.args)
+            profiler.start()
+
+        start = time.time()
+        stage.run(self.log_dir)
+        seconds = time.time() - start
+        result = {'seconds': round(seconds, 6)}
+
+        if bench:
+            report = profiler.stop()
+            rows = stage.count_rows()
+            result.update({
+                'rows': rows,
+                'rows_per_second': (round(rows / seconds, 1)
+                    if rows is not None and seconds else None),
+                'num_queries': report['num_queries'],
+                'db_seconds': report['db_seconds'],
+                'cpu_seconds': round(report['cpu_user_seconds'] +
+                    report['cpu_system_seconds'], 6),
+                'peak_rss_bytes': report['peak_rss_bytes'],
+                'peak_rss_reset': peak_rss_reset,
+                'slowest_queries': report['slowest_queries'],
+                'repeated_queries': report['repeated_queries'],
+            })
+
+        return result
@@ -0,0 +1,164 @@
+"""
+Measure the database queries, time and memory used by a management command
+
+"""
+from collections import Counter
+import datetime
+import json
+import re
+import resource
+import sys
+import time
+
+from django.db import connections
+
+SLOWEST_COUNT = 10
+"""Number of the slowest statements to include in a report"""
+
+REPEATED_COUNT = 10
+"""Number of the most repeated statements to include in a report"""
+
+SQL_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def normalize_sql(sql):
+    """
+    Replace the literal values in a SQL statement with placeholders
+
+    Statements that only differ by their values, like those run in a loop
+    over records, normalize to the same string.
+    """
+    return SQL_LITERAL_RE.sub('?', sql)
+
+
+def peak_rss():
+    """Return the peak resident set size of this process, in bytes"""
+    try:
+        # Unlike the resource usage, this is affected by ``reset_peak_rss()``
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError):
+        pass
+
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return maxrss
+
+    # Linux reports kilobytes
+    return maxrss * 1024
+
+
+def reset_peak_rss():
+    """
+    Reset the peak resident set size of this process to the current size
+
+    This is only supported on Linux.
+
+    Returns:
+        True if the peak was reset, otherwise False.
+
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except (IOError, OSError):
+        return False
+
+    return True
+
+
+class CommandProfiler(object):
+    """
+    Record the SQL statements, time and memory used while running a command
+
+    Statements are recorded with Django's debug cursor, which keeps every
+    statement in ``connection.queries``, so profiling adds some overhead
+    and memory use of its own.  Statements run in worker processes aren't
+    recorded.
+
+    Args:
+        command (str): Name of the command.
+        args (list): Positional arguments to the command, for the report.
+
+    """
+
+    def __init__(self, command, args=None):
+        self.command = command
+        self.args = list(args or [])
+
+    def start(self):
+        self._debug_cursors = {}
+        self._query_offsets = {}
+        for connection in connections.all():
+            self._debug_cursors[connection.alias] = connection.use_debug_cursor
+            connection.use_debug_cursor = True
+            self._query_offsets[connection.alias] = len(connection.queries)
+
+        self._started = datetime.datetime.now()
+        self._start_time = time.time()
+        self._start_usage = resource.getrusage(resource.RUSAGE_SELF)
+
+    def stop(self):
+        """
+        Stop recording
+
+        Returns:
+            Dictionary of the report.
+
+        """
+        seconds = time.time() - self._start_time
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+
+        queries = []
+        for connection in connections.all():
+            offset = self._query_offsets.get(connection.alias, 0)
+            if offset > len(connection.queries):
+                # The log was reset while the command ran
+                offset = 0
+            queries.extend((connection.alias, q['sql'], float(q['time']))
+                           for q in connection.queries[offset:])
+            connection.use_debug_cursor = self._debug_cursors.get(
+                connection.alias)
+
+        slowest = sorted(queries, key=lambda q: q[2], reverse=True)
+        repeated = Counter(normalize_sql(sql) for alias, sql, t in queries)
+
+        self.report = {
+            'command': self.command,
+            'args': self.args,
+            'started': self._started.isoformat(),
+            'seconds': round(seconds, 6),
+            'cpu_user_seconds': round(usage.ru_utime -
+                self._start_usage.ru_utime, 6),
+            'cpu_system_seconds': round(usage.ru_stime -
+                self._start_usage.ru_stime, 6),
+            'peak_rss_bytes': peak_rss(),
+            'num_queries': len(queries),
+            'db_seconds': round(sum(t for alias, sql, t in queries), 6),
+            'slowest_queries': [
+                {'database': alias, 'sql': sql, 'seconds': t}
+                for alias, sql, t in slowest[:SLOWEST_COUNT]
+            ],
+            'repeated_queries': [
+                {'sql': sql, 'count': count}
+                for sql, count in repeated.most_common(REPEATED_COUNT)
+                if count > 1
+            ],
+        }
+
+        return self.report
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.report, f, indent=2)
+
+    def summary(self):
+        """Return a one line summary of the report"""
+        return ("{command}: {seconds:.3f}s, {num_queries} queries in "
+            "{db_seconds:.3f}s, {cpu:.3f}s CPU, {rss:.1f} MB peak RSS").format(
+                cpu=self.report['cpu_user_seconds'] +
+                    self.report['cpu_system_seconds'],
+                rss=self.report['peak_rss_bytes'] / (1024.0 * 1024.0),
+                **self.report)
@@ -1,30 +1,34 @@
+from collections import OrderedDict
 from datetime import date, datetime
+import itertools
+import json
 import logging
+from string import Formatter
+import uuid
 
 from django.conf import settings
 from django.contrib.gis.db.models.query import GeoQuerySet
 from django.core.paginator import Paginator
-from django.db.models import Count, Min, Q, Sum
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Count, Max, Min, Q, Sum
 from django.db.models.query import QuerySet
 
 from djgeojson.serializers import Serializer as GeoJSONSerializer
 
 from convictions_data.address import AddressAnonymizer
 from convictions_data.geocoders import BatchOpenMapQuest
+from convictions_data.geojson import feature, iter_feature_collection
+from convictions_data.topojson import DEFAULT_QUANTIZATION, topology
 from convictions_data.signals import (pre_geocode_page, post_geocode_page)
 
-from convictions_data.query.age import AgeQuerySetMixin
-from convictions_data.query.drugs import (DrugQuerySetMixin, mfg_del_query,
-    poss_query)
-from convictions_data.query.iucr import (
-    arson_nonindex_iucr_query,
-    crimes_affecting_women_iucr_codes, crimes_affecting_women_iucr_query,
-    homicide_iucr_query, homicide_nonindex_iucr_query,
-    property_iucr_query,
-    violent_iucr_query, violent_nonindex_iucr_query)
+from convictions_data.query.age import (AGE_RANGE_CATEGORIES, AGE_RANGES,
+    AgeQuerySetMixin)
+from convictions_data.query.categories import (AFFECTING_WOMEN_QUERY,
+    CATEGORY_FIELDS, CATEGORY_FLAG_QUERIES, DRUG_CATEGORY_FIELDS, DRUG_QUERY,
+    HOMICIDE_QUERY, OTHER_QUERY, PROPERTY_INDEX_QUERY, VIOLENT_INDEX_QUERY,
+    get_classifier, get_drug_classifier)
+from convictions_data.query.drugs import DrugQuerySetMixin
 from convictions_data.query.sex import SexQuerySetMixin
-from convictions_data.query.statute import (PROPERTY_INDEX_STATUTE_QUERY,
-    VIOLENT_INDEX_STATUTE_QUERY, AFFECTING_WOMEN_STATUTE_QUERY)
 
 logger = logging.getLogger(__name__)
 
@@ -76,15 +80,22 @@ class DispositionQuerySet(SexQuerySetMixin, AgeQuerySetMixin, DrugQuerySetMixin,
     ``ctlbkngno``, ``fgrprntno`` and ``dob``.
     """
 
-    def geocode(self, batch_size=100, timeout=1):
-        geocoder = BatchOpenMapQuest(
-            api_key=settings.CONVICTIONS_GEOCODER_API_KEY,
-            timeout=timeout)
-        p = Paginator(self, batch_size)
+    def geocode(self, batch_size=100, timeout=1, geocoder=None):
+        if geocoder is None:
+            geocoder = BatchOpenMapQuest(
+                api_key=settings.CONVICTIONS_GEOCODER_API_KEY,
+                timeout=timeout)
+        # Page through a fixed list of ids.  Saving the results can remove
+        # records from this queryset, for example from ``ungeocoded()``,
+        # which would shift the pages of the queryset itself.
+        pks = list(self.order_by('pk').values_list('pk', flat=True))
+        p = Paginator(pks, batch_size)
         for i in p.page_range:
             pre_geocode_page.send(sender=self.__class__,
                 page_num=i, num_pages=p.num_pages)
-            self._geocode_batch(p.page(i), geocoder)
+            objects = self.model.objects.filter(
+                pk__in=p.page(i).object_list).order_by('pk')
+            self._geocode_batch(objects, geocoder)
             post_geocode_page.send(sender=self.__class__,
                 page_num=i, num_pages=p.num_pages)
 
@@ -120,11 +131,12 @@ class DispositionQuerySet(SexQuerySetMixin, AgeQuerySetMixin, DrugQuerySetMixin,
         return self.filter(q)
 
     @classmethod
-    def _geocode_batch(cls, page, geocoder):
-        addresses = [obj.geocoder_address for obj in page]
+    def _geocode_batch(cls, objects, geocoder):
+        objects = list(objects)
+        addresses = [obj.geocoder_address for obj in objects]
         results = geocoder.batch_geocode(addresses)
-        for i in range(len(page.object_list)):
-            obj = page.object_list[i]
+        for i in range(len(objects)):
+            obj = objects[i]
             loc = results[i]
             obj.lat = loc.latitude
             obj.lon = loc.longitude
@@ -177,6 +189,7 @@ class DispositionQuerySet(SexQuerySetMixin, AgeQuerySetMixin, DrugQuerySetMixin,
         return self.extra(where=[extra_where])
 
     CONVICTION_IMPORT_FIELDS = [
+        'age_at_disposition',
         'case_number',
         'chrgdispdate',
         'city',
@@ -309,12 +322,115 @@ class DispositionQuerySet(SexQuerySetMixin, AgeQuerySetMixin, DrugQuerySetMixin,
 
         return convictions
 
-    def anonymized_values(self):
-        vals = self.values(*self.EXPORT_FIELDS)
+    def stream_values(self, fields, chunk_size=2000):
+        """
+        Generate dictionaries of field values, fetching rows in chunks
+
+        On PostgreSQL, this uses a server-side cursor so the database
+        doesn't send the entire result set at once, and it doesn't all
+        end up in memory, the way it would when iterating over a
+        ``ValuesQuerySet``.  The cursor is declared ``WITH HOLD``, so it
+        doesn't need a transaction that stays open while the rows are
+        consumed, and anything the consumer writes isn't part of one.
+        Other databases fetch rows in chunks from a regular cursor.
+
+        Args:
+            fields: List of names of the model's concrete fields.
+            chunk_size (int): Number of rows to fetch at a time.
+
+        Yields:
+            Dictionaries mapping field names to values, like
+            ``values()``.
+
+        """
+        sql, params = self.values(*fields).query.sql_with_params()
+        connection = connections[self.db]
+        if connection.vendor == 'postgresql':
+            connection.ensure_connection()
+            # Named cursors are server-side cursors in psycopg2
+            cursor = connection.connection.cursor(
+                name='stream_values_{}'.format(uuid.uuid4().hex),
+                withhold=True)
+            cursor.itersize = chunk_size
+        else:
+            cursor = connection.cursor()
+
+        try:
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+
+                for row in rows:
+                    yield dict(zip(fields, row))
+        finally:
+            cursor.close()
+
+    def anonymize_addresses(self, batch_size=1000):
+        """
+        Anonymize and store the distinct addresses of these dispositions
+        that haven't already been stored
+
+        Returns:
+            Number of addresses that were anonymized.
+
+        """
+        address_model = self.model.get_anonymized_address_model()
+        new_addresses = list(self.order_by()
+            .exclude(st_address__in=address_model.objects.values('address'))
+            .values_list('st_address', flat=True).distinct())
+
         anonymizer = AddressAnonymizer()
-        for d in vals:
-            d['st_address'] = anonymizer.anonymize(d['st_address'])
-            yield d
+        for i in range(0, len(new_addresses), batch_size):
+            address_model.objects.store(dict(
+                (address, anonymizer.anonymize(address))
+                for address in new_addresses[i:i + batch_size]))
+
+        return len(new_addresses)
+
+    def anonymized_values(self, chunk_size=2000):
+        """
+        Generate dictionaries of the ``EXPORT_FIELDS`` of these
+        dispositions with the addresses anonymized
+
+        New addresses are anonymized and stored by
+        ``anonymize_addresses()`` before any rows are generated.  Then the
+        anonymized addresses are looked up in the stored
+        ``AnonymizedAddress`` records, a chunk of rows at a time, so
+        nothing is written while the rows are streamed.
+
+        """
+        self.anonymize_addresses()
+
+        address_model = self.model.get_anonymized_address_model()
+        anonymizer = None
+        anonymized = {}
+        chunk = []
+        vals = self.stream_values(self.EXPORT_FIELDS, chunk_size=chunk_size)
+        for d in itertools.chain(vals, [None]):
+            if d is not None:
+                chunk.append(d)
+                if len(chunk) < chunk_size:
+                    continue
+
+            new_addresses = set(row['st_address'] for row in chunk
+                                if row['st_address'] not in anonymized)
+            if new_addresses:
+                anonymized.update(address_model.objects.lookup(new_addresses))
+
+            for row in chunk:
+                address = row['st_address']
+                if address not in anonymized:
+                    # The disposition was created after the addresses were
+                    # stored
+                    if anonymizer is None:
+                        anonymizer = AddressAnonymizer()
+                    anonymized[address] = anonymizer.anonymize(address)
+                row['st_address'] = anonymized[address]
+                yield row
+
+            chunk = []
 
     def felonies(self):
         return self.filter(final_chrgtype='F')
@@ -340,6 +456,95 @@ class DispositionQuerySet(SexQuerySetMixin, AgeQuerySetMixin, DrugQuerySetMixin,
     def num_cases(self):
         return self.values('case_number').distinct().count()
 
+    def distinct_counts(self, *dimensions, measure='case_number'):
+        """
+        Count distinct values of a field for each combination of values
+        of some dimensions, in a single grouped query
+
+        Args:
+            *dimensions: Names of fields to group by.  Date fields can be
+                grouped by year with a ``__year`` suffix, for example
+                ``initial_date__year``.
+            measure (str): Name of the field whose distinct values are
+                counted.  Default is ``case_number``, so the counts are
+                the same as ``num_cases()``.
+
+        Returns:
+            Dictionary mapping tuples of dimension values, in the order of
+            ``dimensions``, to counts.  Combinations without any records
+            aren't included.
+
+        """
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        fields = []
+        exprs = []
+        years = []
+        for dimension in dimensions:
+            field_name, _, transform = dimension.partition('__')
+            if transform not in ('', 'year'):
+                raise ValueError("Unsupported dimension '{}'".format(dimension))
+
+            column = "pivot_rows.{}".format(
+                qn(self.model._meta.get_field(field_name).column))
+            if transform == 'year':
+                column = connection.ops.date_extract_sql('year', column)
+            fields.append(field_name)
+            exprs.append(column)
+            years.append(transform == 'year')
+
+        measure_column = qn(self.model._meta.get_field(measure).column)
+        inner_fields = []
+        for field_name in fields + [measure]:
+            if field_name not in inner_fields:
+                inner_fields.append(field_name)
+
+        # Use this QuerySet, with any filters, as a subquery that selects
+        # only the columns that are grouped and counted
+        inner_sql, params = self.order_by().values(*inner_fields)\
+            .query.sql_with_params()
+        sql = ("SELECT {exprs}, COUNT(DISTINCT pivot_rows.{measure}) "
+            "FROM ({inner}) AS pivot_rows GROUP BY {exprs}").format(
+                exprs=", ".join(exprs), measure=measure_column,
+                inner=inner_sql)
+
+        cursor = connection.cursor()
+        cursor.execute(sql, params)
+        counts = {}
+        for row in cursor.fetchall():
+            # Some databases extract years as floats
+            key = tuple(int(v) if is_year and v is not None else v
+                        for v, is_year in zip(row[:-1], years))
+            counts[key] = row[-1]
+
+        return counts
+
+    def pivot(self, rows, columns, row_values, column_values,
+            measure='case_number'):
+        """
+        Count distinct values of a field for each combination of the
+        values of a row and a column dimension, in a single query
+
+        Args:
+            rows (str): Dimension for the rows of the table.  See
+                ``distinct_counts()``.
+            columns (str): Dimension for the columns of the table.
+            row_values: Values of the row dimension to include, in order.
+            column_values: Values of the column dimension to include, in
+                order.
+            measure (str): Name of the field whose distinct values are
+                counted.
+
+        Returns:
+            List of lists of counts, with a list for each of
+            ``row_values`` and a count for each of ``column_values``.
+
+        """
+        counts = self.distinct_counts(rows, columns, measure=measure)
+        return [[counts.get((row_value, column_value), 0)
+                 for column_value in column_values]
+                for row_value in row_values]
+
     def initial_date_in_year(self, year):
         return self.filter(initial_date__gte=date(year, 1, 1),
                            initial_date__lte=date(year, 12, 31))
@@ -355,6 +560,65 @@ class ConvictionQuerySet(SexQuerySetMixin, AgeQuerySetMixin, DrugQuerySetMixin,
     # TODO: Add queries for violent vs. nonviolent, not just index and
     # nonindex.
 
+    _drug_categories_stored = None
+    """
+    Cached result of ``drug_categories_stored()``, shared with QuerySets
+    cloned from this one
+    """
+
+    def _clone(self, klass=None, setup=False, **kwargs):
+        kwargs.setdefault('_drug_categories_stored',
+            self._drug_categories_stored)
+        return super(ConvictionQuerySet, self)._clone(klass, setup, **kwargs)
+
+    age_range_categories = AGE_RANGE_CATEGORIES
+
+    def age_range_record(self):
+        # Count using the indexed category flags set by ``categorize()``
+        # rather than the category queries, which match regular
+        # expressions against every row.
+        record = {'total_convictions': self.count()}
+        for key, flag in self.age_range_categories:
+            record[key] = self.filter(**{flag: True}).count()
+
+        return record
+
+    def counts_by_age_range_per_bucket(self):
+        """
+        Count convictions by category and age range with separate queries
+
+        Like the original implementation of ``counts_by_age_range()``,
+        this runs a count query for each category in each age range and
+        filters with the category queries rather than the flags.  It's
+        kept to check the results of the single query version, which also
+        checks that the flags are up to date.
+        """
+        convictions_by_age = []
+        for (start, end) in AGE_RANGES:
+            record = self.filter_by_age(start, end)._age_range_query_record()
+            record['age_min'] = start
+            record['age_max'] = end
+            record['invalid_ages'] = False
+            convictions_by_age.append(record)
+
+        record = self.invalid_age()._age_range_query_record()
+        record['invalid_ages'] = True
+        convictions_by_age.append(record)
+
+        return convictions_by_age
+
+    def _age_range_query_record(self):
+        return {
+            'total_convictions': self.count(),
+            # Each of our major crime categories for this age bucket
+            'violent_convictions': self.violent_index_crimes().count(),
+            'property_convictions': self.property_index_crimes().count(),
+            'drug_convictions': self.drug_crimes().count(),
+            'affecting_women_convictions': self.crimes_affecting_women().count(),
+            # Homicides for this age bucket
+            'homicide_convictions': self.homicides().count(),
+        }
+
     def violent_index_crimes(self):
         """
         Filter queryset to convictions for violent index crimes.
@@ -367,10 +631,7 @@ class ConvictionQuerySet(SexQuerySetMixin, AgeQuerySetMixin, DrugQuerySetMixin,
         * Agg Battery / Agg Assault (as a single category for UCR)
 
         """
-        qs = self.filter(violent_iucr_query | VIOLENT_INDEX_STATUTE_QUERY)
-        # Exclude non-index crimes
-        qs = qs.exclude(violent_nonindex_iucr_query)
-        return qs
+        return self.filter(VIOLENT_INDEX_QUERY)
 
     def property_index_crimes(self):
         """
@@ -383,20 +644,13 @@ class ConvictionQuerySet(SexQuerySetMixin, AgeQuerySetMixin, DrugQuerySetMixin,
         * Motor Vehicle Theft
         * Arson
         """
-        qs = self.filter(property_iucr_query | PROPERTY_INDEX_STATUTE_QUERY)
-        qs = qs.exclude(arson_nonindex_iucr_query)
-        return qs
+        return self.filter(PROPERTY_INDEX_QUERY)
 
     def drug_crimes(self):
         """
         Filter queryset to convictions for drug crimes.
         """
-        # The IUCR query misses a lot of values right now, probably because of
-        # annoying mangled statutes that combine the statute for the crime and
-        # the blanket statute for attempted crimes
-        #qs = self.filter(self.drug_iucr_query)
-        qs = self.filter(poss_query | mfg_del_query)
-        return qs
+        return self.filter(DRUG_QUERY)
 
     def crimes_affecting_women(self):
         """
@@ -408,131 +662,323 @@ class ConvictionQuerySet(SexQuerySetMixin, AgeQuerySetMixin, DrugQuerySetMixin,
         * Domestic Violence
         * Stalking / Violation of Order of Protection:
         """
-        return self.filter(crimes_affecting_women_iucr_query |
-                           AFFECTING_WOMEN_STATUTE_QUERY)
+        return self.filter(AFFECTING_WOMEN_QUERY)
 
     def homicides(self):
-        return self.filter(homicide_iucr_query | homicide_nonindex_iucr_query)
+        return self.filter(HOMICIDE_QUERY)
 
     def other_crimes(self):
-        return self.exclude(violent_iucr_query |
-            property_iucr_query |
-            crimes_affecting_women_iucr_query |
-            poss_query | mfg_del_query)
+        return self.filter(OTHER_QUERY)
+
+    def category_counts(self, classifier=None):
+        """
+        Count the convictions in every category with a single query
+
+        Rather than running a separate ``COUNT`` query with regular
+        expression matching for each category, this groups the convictions
+        by the fields the categories depend on and evaluates the category
+        queries in Python against each distinct group.
+
+        Args:
+            classifier (CategoryClassifier): Classifier to use.  Defaults
+                to one containing the major categories and all of the
+                drug categories.
+
+        Returns:
+            OrderedDict mapping category names, like ``violent_index`` or
+            ``poss_heroin``, to the number of convictions in that category.
+
+        """
+        if classifier is None:
+            classifier = get_classifier()
+
+        rows = self.values(*CATEGORY_FIELDS).annotate(count=Count('id'))\
+            .order_by()
+        return classifier.count(rows)
+
+    def categorize(self):
+        """
+        Set the category flag fields of the convictions in this QuerySet
+
+        The flags are first cleared, then each flag is set with a single
+        ``UPDATE`` that filters on the corresponding query in
+        ``CATEGORY_FLAG_QUERIES``.
+
+        Returns:
+            OrderedDict mapping flag field names to the number of
+            convictions with that flag set.
+
+        """
+        self.update(**{flag: False for flag in CATEGORY_FLAG_QUERIES})
+
+        counts = OrderedDict()
+        for flag, q in CATEGORY_FLAG_QUERIES.items():
+            counts[flag] = self.filter(q).update(**{flag: True})
+
+        return counts
+
+    def set_drug_categories(self, batch_size=1000):
+        """
+        Store the drug categories of the convictions in this QuerySet
+
+        Every drug query is evaluated in Python, once for each distinct
+        combination of ``DRUG_CATEGORY_FIELDS``, and the names of the
+        matching queries are stored as ``ConvictionDrugCategory`` records.
+        Once every conviction's categories are stored, the
+        ``DrugQuerySetMixin`` methods look up categories by name instead
+        of matching regular expressions against every row.
+
+        Args:
+            batch_size (int): Number of categories to create in each
+                query.
+
+        Returns:
+            Number of categories stored.
+
+        """
+        category_model = self.model.get_drug_category_model()
+        classifier = get_drug_classifier()
+        category_model.objects.filter(conviction__in=self.values('id'))\
+            .delete()
+
+        names_by_values = {}
+        categories = []
+        num_stored = 0
+        rows = self.order_by().values_list('id', *DRUG_CATEGORY_FIELDS)
+        for row in rows.iterator():
+            values = row[1:]
+            try:
+                names = names_by_values[values]
+            except KeyError:
+                names = classifier.matches(dict(zip(DRUG_CATEGORY_FIELDS,
+                    values)))
+                names_by_values[values] = names
+
+            categories.extend(category_model(conviction_id=row[0], name=name)
+                              for name in names)
+            if len(categories) >= batch_size:
+                category_model.objects.bulk_create(categories)
+                num_stored += len(categories)
+                categories = []
+
+        category_model.objects.bulk_create(categories)
+        num_stored += len(categories)
+
+        self.update(drug_categories_set=True)
+        self._drug_categories_stored = None
+
+        return num_stored
+
+    def drug_categories_stored(self):
+        """
+        Return whether the drug categories of every conviction have been
+        stored
+
+        The result is cached on this QuerySet and the QuerySets made from
+        it, so chaining drug filters only checks once.
+        """
+        if self._drug_categories_stored is None:
+            self._drug_categories_stored = not self.model._default_manager\
+                .using(self.db).filter(drug_categories_set=False).exists()
+
+        return self._drug_categories_stored
+
+    def filter_drug_category(self, name, q):
+        """
+        Filter by one of the drug queries
+
+        When the drug categories of every conviction have been stored by
+        ``set_drug_categories()``, this is an indexed lookup of the
+        category name.  Otherwise, the query is run.
+
+        """
+        if self.drug_categories_stored():
+            return self.filter(drug_categories__name=name)
+
+        return self.filter(q)
+
+    DRUG_TYPES = [
+        ('unkwn_drug', "Unknown Drug"),
+        ('heroin', "Heroin"),
+        ('cocaine', "Cocaine"),
+        ('morphine', "Morphine"),
+        ('barbituric', "Barbituric Acid"),
+        ('amphetamine', "Amphetamine"),
+        ('lsd', "LSD"),
+        ('ecstasy', "Ecstasy"),
+        ('pcp', "PCP"),
+        ('ketamine', "Ketamine"),
+        ('steroids', "Steroids"),
+        ('meth', "Methamphetamine"),
+        ('cannabis', "Cannabis"),
+        ('sched_1_2', "Schedule 1 & 2"),
+        ('other_drug', "Other or Unspecified Drug"),
+        # Tracy says that drug charges that don't specify a certain
+        # type of drug but are tacked on because the drug is dealt to
+        # a minor or near a school or public housing are called
+        # "enhancements"
+        ('no_drug', "Enhancement"),
+        #('lookalike', "Look-Alike Substance"),
+        #('script_form', "Script Form"),
+    ]
+    """Slugs and labels of the drug types in ``drug_by_drug_type()``"""
 
     def drug_by_class(self):
+        """
+        Count drug convictions by offense type and charge class
+
+        The counts for all the classes are calculated with a single
+        query, using ``category_counts()``.
+
+        Returns:
+            List of dictionaries with ``offense_type``, ``slug``,
+            ``value`` and ``label`` keys.
+
+        """
+        return self._drug_by_class_rows(self.category_counts())
+
+    def _drug_by_class_rows(self, counts):
         felony_classes = ['x', 1, 2, 3, 4]
         misdemeanor_classes = ['a', 'b', 'c']
 
         rows = []
 
-        rows.extend(self._add_charge_class_counts(
+        rows.extend(self._add_charge_class_counts(counts,
             "Manufacture or Delivery", felony_classes,
             'mfg_del_class_{}_felony', 'felony_{}', "Class {} Felony"))
-        rows.extend(self._add_charge_class_counts(
+        rows.extend(self._add_charge_class_counts(counts,
             "Manufacture or Deliver", misdemeanor_classes,
             'mfg_del_class_{}_misd', 'misd_{}', "Class {} Misdemeanor"))
 
         rows.append({
             'offense_type': "Manufacture or Delivery",
             'slug': 'unkwn_class',
-            'value': self.mfg_del_unkwn_class().count(),
+            'value': counts['mfg_del_unkwn_class'],
             'label': "Unknown Class",
         })
 
-        rows.extend(self._add_charge_class_counts(
+        rows.extend(self._add_charge_class_counts(counts,
             "Possession", felony_classes,
             'poss_class_{}_felony', 'felony_{}', "Class {} Felony"))
-        rows.extend(self._add_charge_class_counts(
+        rows.extend(self._add_charge_class_counts(counts,
             "Possession", misdemeanor_classes,
             'poss_class_{}_misd', 'misd_{}', "Class {} Misdemeanor"))
 
         rows.append({
             'offense_type': "Possession",
             'slug': 'unkwn_class',
-            'value': self.poss_unkwn_class().count(),
+            'value': counts['poss_unkwn_class'],
             'label': "Unknown Class",
         })
 
         rows.append({
             'offense_type': "Possession",
             'slug': 'no_class',
-            'value': self.poss_no_class().count(),
+            'value': counts['poss_no_class'],
             'label': "No Class",
         })
 
-        return rows 
+        return rows
 
-    def _add_charge_class_counts(self, offense_type, offense_classes, method_tpl, key_tpl,
-            label_tpl):
+    def _add_charge_class_counts(self, counts, offense_type, offense_classes,
+            method_tpl, key_tpl, label_tpl):
         results = []
         for charge_cls in offense_classes:
-            try:
-                method_name = method_tpl.format(charge_cls)
-                method = getattr(self, method_name)
-                key = key_tpl.format(charge_cls)
-                val = {}
-                val['offense_type'] = offense_type
-                val['slug'] = key
-                val['value'] = method().count()
-                val['label'] = label_tpl.format(str(charge_cls).upper())
-                results.append(val)
-            except AttributeError:
-                pass
+            method_name = method_tpl.format(charge_cls)
+            if method_name not in counts:
+                # Not every class has a query, for example there's no
+                # Class C misdemeanor manufacture or delivery
+                continue
+
+            val = {}
+            val['offense_type'] = offense_type
+            val['slug'] = key_tpl.format(charge_cls)
+            val['value'] = counts[method_name]
+            val['label'] = label_tpl.format(str(charge_cls).upper())
+            results.append(val)
 
         return results
 
     def drug_by_drug_type(self):
+        """
+        Count drug convictions by offense type and drug
+
+        The counts for all the drugs are calculated with a single query,
+        using ``category_counts()``.
+
+        Returns:
+            List of dictionaries with ``offense_type``, ``slug``,
+            ``label`` and ``value`` keys.
+
+        """
+        return self._drug_by_drug_type_rows(self.category_counts())
+
+    def _drug_by_drug_type_rows(self, counts):
         rows = []
-        drug_types = [
-            ('unkwn_drug', "Unknown Drug"),
-            ('heroin', "Heroin"),
-            ('cocaine', "Cocaine"),
-            ('morphine', "Morphine"),
-            ('barbituric', "Barbituric Acid"),
-            ('amphetamine', "Amphetamine"),
-            ('lsd', "LSD"),
-            ('ecstasy', "Ecstasy"),
-            ('pcp', "PCP"),
-            ('ketamine', "Ketamine"),
-            ('steroids', "Steroids"),
-            ('meth', "Methamphetamine"),
-            ('cannabis', "Cannabis"),
-            ('sched_1_2', "Schedule 1 & 2"),
-            ('other_drug', "Other or Unspecified Drug"),
-            # Tracy says that drug charges that don't specify a certain
-            # type of drug but are tacked on because the drug is dealt to
-            # a minor or near a school or public housing are called
-            # "enhancements"
-            ('no_drug', "Enhancement"),
-            #('lookalike', "Look-Alike Substance"),
-            #('script_form', "Script Form"),
-        ]
-
-        rows.extend("Manufacture or Delivery",
-            self._add_drug_type_counts(drug_types, 'mfg_del_{}'))
-
-        rows.extend("Possession",
-            self._add_drug_type_counts(drug_types, 'poss_{}'))
-
-        return rows 
-
-    def _add_drug_type_counts(self, offense_type, drug_types, method_tpl):
+
+        rows.extend(self._add_drug_type_counts(counts,
+            "Manufacture or Delivery", self.DRUG_TYPES, 'mfg_del_{}'))
+
+        rows.extend(self._add_drug_type_counts(counts,
+            "Possession", self.DRUG_TYPES, 'poss_{}'))
+
+        return rows
+
+    def _add_drug_type_counts(self, counts, offense_type, drug_types,
+            method_tpl):
         rows = []
         for slug, label in drug_types:
-            try:
-                method_name = method_tpl.format(slug)
-                method = getattr(self, method_name)
-                rows.append({
-                    'offense_type': offense_type,
-                    'slug': slug,
-                    'label': label,
-                    'value': method().count(),
-                })
-            except AttributeError:
-                pass
+            method_name = method_tpl.format(slug)
+            if method_name not in counts:
+                continue
 
-        return rows 
+            rows.append({
+                'offense_type': offense_type,
+                'slug': slug,
+                'label': label,
+                'value': counts[method_name],
+            })
+
+        return rows
+
+    def load_geographies_from_dispositions(self):
+        """
+        Copy the community area and place from each conviction's dispositions
+
+        This runs as a single UPDATE statement rather than one query per
+        conviction.  All of the dispositions rolled up into a conviction
+        come from the same case, and therefore the same address, so we can
+        take any non-null value.  Convictions whose dispositions have no
+        community area or place keep their existing value.
+
+        Only the convictions in this QuerySet are updated.
+
+        Returns:
+            The number of conviction rows updated.
+
+        """
+        conviction_table = self.model._meta.db_table
+        disposition_table = self.model.get_disposition_model()._meta.db_table
+        col_sql = ('{col} = COALESCE((SELECT MAX(d.{col}) '
+            'FROM {disposition_table} d '
+            'WHERE d.conviction_id = {conviction_table}.id), {col})')
+        set_sql = ", ".join([
+            col_sql.format(col=col, conviction_table=conviction_table,
+                disposition_table=disposition_table)
+            for col in ('community_area_id', 'place_id')
+        ])
+        # Use this QuerySet, with any filters, as a subquery that selects
+        # the ids of the convictions to update
+        ids_sql, params = self.order_by().values('id').query\
+            .sql_with_params()
+        sql = ("UPDATE {conviction_table} SET {set_sql} "
+            "WHERE id IN ({ids_sql})").format(
+                conviction_table=conviction_table, set_sql=set_sql,
+                ids_sql=ids_sql)
+
+        cursor = connections[self.db].cursor()
+        cursor.execute(sql, params)
+        return cursor.rowcount
 
     def most_common_statutes(self, count=10):
         """Get the most common statutes"""
@@ -556,124 +1002,322 @@ class ConvictionGeoQuerySet(GeoQuerySet):
     Fields included in GeoJSON export
     """
 
-    def with_conviction_annotations(self):
+    CONVICTION_STATS_FLAGS = [
+        ('num_violent_index', 'violent_index'),
+        ('num_property_index', 'property_index'),
+        ('num_drug', 'drug'),
+        ('num_homicides', 'homicide'),
+        ('num_affecting_women', 'affecting_women'),
+        ('num_dui', 'dui'),
+    ]
+    """
+    Names of the counts in ``conviction_stats()`` and the conviction
+    category flags that they count
+    """
+
+    CONVICTION_ANNOTATION_FIELDS = [
+        'num_convictions',
+        'convictions_per_capita',
+        'num_homicides',
+        'num_affecting_women',
+        'affecting_women_per_capita',
+    ]
+    """Fields added by ``with_conviction_annotations()``"""
+
+    def conviction_stats(self, use_stored=True):
         """
-        Annotate the QuerySet with counts based on related convictions stats
+        Count related convictions for all geographies in a single query
+
+        If the statistics stored by ``refresh_geography_stats`` are fresh,
+        they are read from the stats table.  Otherwise, the query groups
+        the conviction table by the column relating convictions to this
+        model, rather than running a subquery on the conviction table for
+        each geography.
+
+        Args:
+            use_stored (bool): Read stored statistics if they are fresh.
+                Default is True.
 
         Returns:
-            A QuerySet with the following annotated fields added to the models:
+            Dictionary keyed by geography id.  Values are dictionaries with
+            the keys ``num_convictions`` and the keys of
+            ``CONVICTION_STATS_FLAGS``.  Geographies without convictions
+            may not be included.
 
-            * num_convictions: Total number of convictions in the geography.
-            * convictions_per_capita: Population-adjusted count of all
-               convictions.
+        """
+        if use_stored:
+            stats_qs = self.model.get_stats_model().objects\
+                .for_geography_model(self.model)
+            if stats_qs.is_fresh():
+                return stats_qs.conviction_stats()
+
+        cursor = connections[self.db].cursor()
+        cursor.execute(self._conviction_stats_sql())
+
+        keys = self.conviction_stats_keys()
+        return {row[0]: dict(zip(keys, row[1:])) for row in cursor.fetchall()}
+
+    @classmethod
+    def conviction_stats_keys(cls):
+        return ['num_convictions'] + [key for key, flag
+                                      in cls.CONVICTION_STATS_FLAGS]
 
+    def _conviction_stats_sql(self):
+        """
+        Return SQL that groups convictions by geography
+
+        The columns are ``geography_id`` followed by the keys of
+        ``conviction_stats_keys()``.
         """
-        this_table = self.model._meta.db_table
         conviction_table = self.model.get_conviction_model()._meta.db_table
         conviction_related_col = self.model.get_conviction_related_column_name()
-        annotated_qs = self
-        # Use the ``extra()`` QuerySet method to annotate this QuerySet
-        # with aggregates based on a filtered, joined table.
-        # This method was suggested by
-        # http://timmyomahony.com/blog/filtering-annotations-django/
-
-        # First, define some SQL strings to make this stuff a little easier
-        # to read.
-        matches_this_id_where_sql = ('{conviction_table}.{related_col} = '
-            '{this_table}.id').format(conviction_table=conviction_table,
-                this_table=this_table, related_col=conviction_related_col)
-
-        # It seems like we could just do the following query with the Count()
-        # aggregator, but the ORM adds the extra value from the select in the
-        # GROUP BY clause which breaks all kinds of stuff.
-        #
-        # I think this is reflected as
-        # https://code.djangoproject.com/ticket/11916
-        num_convictions_sql = ('SELECT COUNT({conviction_table}.id) '
-            'FROM {conviction_table} '
-            'WHERE {matches_this_id} '
-        ).format(conviction_table=conviction_table, this_table=this_table,
-            matches_this_id=matches_this_id_where_sql)
-        convictions_per_capita_sql = ('SELECT CAST(COUNT("{conviction_table}"."id") AS FLOAT) / '
-            '"{this_table}"."total_population" '
-            'FROM {conviction_table} '
-            'WHERE {matches_this_id} '
-        ).format(conviction_table=conviction_table, this_table=this_table,
-            matches_this_id=matches_this_id_where_sql)
-        num_homicides_sql = ("SELECT COUNT({conviction_table}.id) "
+        flag_counts_sql = ", ".join(
+            "SUM(CASE WHEN {} THEN 1 ELSE 0 END) AS {}".format(flag, key)
+            for key, flag in self.CONVICTION_STATS_FLAGS)
+        return ("SELECT {related_col} AS geography_id, "
+            "COUNT(id) AS num_convictions, {flag_counts} "
             "FROM {conviction_table} "
-            "WHERE {matches_this_id} "
-            "AND {conviction_table}.iucr_category = 'Homicide'"
-        ).format(conviction_table=conviction_table,
-            matches_this_id=matches_this_id_where_sql)
-
-        codes = ["'{}'".format(c) for c in crimes_affecting_women_iucr_codes]
-        affecting_women_iucr_codes_str = ", ".join(codes)
-        num_affecting_women_sql = ('SELECT COUNT({conviction_table}.id) '
-            'FROM {conviction_table} '
-            'WHERE {matches_this_id} '
-            'AND {conviction_table}.iucr_code IN ({affecting_women_iucr_codes})'
-        ).format(conviction_table=conviction_table,
-            matches_this_id=matches_this_id_where_sql,
-            affecting_women_iucr_codes=affecting_women_iucr_codes_str)
-        affecting_women_per_capita_sql = ('SELECT CAST(COUNT({conviction_table}.id) AS FLOAT) / '
-            '"{this_table}"."total_population" '
-            'FROM {conviction_table} '
-            'WHERE {matches_this_id} '
-            'AND {conviction_table}.iucr_code IN ({affecting_women_iucr_codes})'
-        ).format(conviction_table=conviction_table,
-            this_table=this_table,
-            matches_this_id=matches_this_id_where_sql,
-            affecting_women_iucr_codes=affecting_women_iucr_codes_str)
-
-        annotated_qs = annotated_qs.extra(select={
-            'num_convictions': num_convictions_sql,
-            'convictions_per_capita': convictions_per_capita_sql,
-            'num_homicides': num_homicides_sql,
-            'num_affecting_women': num_affecting_women_sql,
-            'affecting_women_per_capita': affecting_women_per_capita_sql,
-        })
+            "WHERE {related_col} IS NOT NULL "
+            "GROUP BY {related_col}").format(related_col=conviction_related_col,
+                flag_counts=flag_counts_sql, conviction_table=conviction_table)
+
+    def most_common_statutes_by_geography(self, count=10):
+        """
+        Get the most common statutes for every geography in a single query
 
-        return annotated_qs
+        Statutes are counted by geography and ranked within each geography
+        with the ``ROW_NUMBER()`` window function, rather than running
+        ``ConvictionQuerySet.most_common_statutes()`` once per geography.
 
-    def with_dui_annotations(self):
-        this_table = self.model._meta.db_table
+        Args:
+            count (int): Number of statutes to get for each geography.
+
+        Returns:
+            A generator of ``(geography_id, statutes)`` tuples, in order of
+            geography id, where ``statutes`` is a list of dictionaries in the
+            format returned by ``ConvictionQuerySet.most_common_statutes()``.
+            Geographies without convictions are not included.
+
+        """
         conviction_table = self.model.get_conviction_model()._meta.db_table
         conviction_related_col = self.model.get_conviction_related_column_name()
-        matches_this_id_where_sql = ('{conviction_table}.{related_col} = '
-            '{this_table}.id').format(conviction_table=conviction_table,
-                this_table=this_table, related_col=conviction_related_col)
-        num_dui_sql = ('SELECT COUNT({conviction_table}.id) '
-            'FROM {conviction_table} '
-            'WHERE {matches_this_id} '
-            'AND {conviction_table}.final_statute_formatted ILIKE \'625-5/11-501%%\''
-        ).format(conviction_table=conviction_table,
-            matches_this_id=matches_this_id_where_sql)
-        pct_dui_sql = ('SELECT CAST((SELECT COUNT({conviction_table}.id) '
-            'FROM {conviction_table} '
-            'WHERE {matches_this_id} '
-            'AND {conviction_table}.final_statute_formatted ILIKE '
-            '\'625-5/11-501%%\') AS FLOAT) / '
-            '(SELECT COUNT({conviction_table}.id) '
-            'FROM {conviction_table} '
-            'WHERE {matches_this_id}) '
-        ).format(conviction_table=conviction_table,
-            matches_this_id=matches_this_id_where_sql)
-        dui_per_capita_sql = ('SELECT CAST(COUNT({conviction_table}.id) AS FLOAT) / '
-            '"{this_table}"."total_population" '
-            'FROM {conviction_table} '
-            'WHERE {matches_this_id} '
-            'AND {conviction_table}.final_statute_formatted ILIKE '
-            '\'625-5/11-501%%\''
-        ).format(conviction_table=conviction_table,
-            this_table=this_table,
-            matches_this_id=matches_this_id_where_sql)
-
-        return self.extra(select={
-            'num_dui': num_dui_sql,
-            'pct_dui': pct_dui_sql,
-            'dui_per_capita': dui_per_capita_sql,
-        })
+        geo_sql, geo_params = self.order_by().values('id').query\
+            .sql_with_params()
+        sql = ("SELECT geo_id, statute, chrgdesc, statute_count "
+            "FROM (SELECT {related_col} AS geo_id, "
+            "LOWER(final_statute_formatted) AS statute, "
+            "MIN(final_chrgdesc) AS chrgdesc, "
+            "COUNT(id) AS statute_count, "
+            "ROW_NUMBER() OVER (PARTITION BY {related_col} "
+            "ORDER BY COUNT(id) DESC) AS statute_rank "
+            "FROM {conviction_table} "
+            "WHERE {related_col} IN ({geo_sql}) "
+            "GROUP BY {related_col}, LOWER(final_statute_formatted)) "
+            "AS ranked_statutes "
+            "WHERE statute_rank <= %s "
+            "ORDER BY geo_id, statute_rank").format(
+                related_col=conviction_related_col,
+                conviction_table=conviction_table, geo_sql=geo_sql)
+
+        cursor = connections[self.db].cursor()
+        cursor.execute(sql, tuple(geo_params) + (count,))
+
+        geo_id = None
+        statutes = []
+        for row_geo_id, statute, chrgdesc, statute_count in cursor:
+            if row_geo_id != geo_id:
+                if statutes:
+                    yield geo_id, statutes
+
+                geo_id = row_geo_id
+                statutes = []
+
+            statutes.append({
+                'statute': statute,
+                'chrgdesc': chrgdesc,
+                'count': statute_count,
+            })
+
+        if statutes:
+            yield geo_id, statutes
+
+    @classmethod
+    def _get_geo_stats(cls, stats, geo_id):
+        try:
+            return stats[geo_id]
+        except KeyError:
+            return {key: 0 for key in cls.conviction_stats_keys()}
+
+    @classmethod
+    def _ratio(cls, numerator, denominator):
+        if not denominator:
+            return None
+
+        return float(numerator) / denominator
+
+    @classmethod
+    def _conviction_annotations(cls, stats, total_population):
+        return {
+            'num_convictions': stats['num_convictions'],
+            'convictions_per_capita': cls._ratio(stats['num_convictions'],
+                total_population),
+            'num_homicides': stats['num_homicides'],
+            'num_affecting_women': stats['num_affecting_women'],
+            'affecting_women_per_capita': cls._ratio(
+                stats['num_affecting_women'], total_population),
+        }
+
+    @classmethod
+    def _dui_annotations(cls, stats, total_population):
+        return {
+            'num_dui': stats['num_dui'],
+            'pct_dui': cls._ratio(stats['num_dui'], stats['num_convictions']),
+            'dui_per_capita': cls._ratio(stats['num_dui'], total_population),
+        }
+
+    def _stats_subselect_sql(self, key, stored):
+        """
+        Return SQL and parameters for a subselect of one of the
+        ``conviction_stats_keys()`` for the geography in the current row
+
+        Args:
+            key (str): Name of the statistic, such as ``num_dui``.
+            stored (bool): Select the statistic stored by
+                ``refresh_geography_stats``, with a lookup on the unique
+                index of the stats table, rather than counting convictions.
+
+        """
+        qn = connections[self.db].ops.quote_name
+        this_table = qn(self.model._meta.db_table)
+        if stored:
+            stats_table = qn(self.model.get_stats_model()._meta.db_table)
+            sql = ("(SELECT {stats_table}.{key} FROM {stats_table} "
+                "WHERE {stats_table}.geography_type = %s "
+                "AND {stats_table}.geography_id = {this_table}.id)").format(
+                    stats_table=stats_table, key=qn(key),
+                    this_table=this_table)
+            return sql, [self.model._meta.object_name]
+
+        conviction_table = qn(
+            self.model.get_conviction_model()._meta.db_table)
+        related_col = qn(self.model.get_conviction_related_column_name())
+        where_sql = "{conviction_table}.{related_col} = {this_table}.id"\
+            .format(conviction_table=conviction_table,
+                related_col=related_col, this_table=this_table)
+        flags = dict(self.CONVICTION_STATS_FLAGS)
+        if key in flags:
+            where_sql += " AND {}.{}".format(conviction_table,
+                qn(flags[key]))
+        sql = "(SELECT COUNT(*) FROM {conviction_table} WHERE {where})"\
+            .format(conviction_table=conviction_table, where=where_sql)
+        return sql, []
+
+    def _with_stats(self, annotations, use_stored=True):
+        """
+        Add columns calculated from conviction statistics to this QuerySet
+
+        Each statistic is a subselect.  If ``use_stored`` is True and the
+        statistics stored by ``refresh_geography_stats`` are fresh, the
+        subselects look up the stored statistics.  Otherwise, they count
+        the convictions related to each geography.
+
+        Args:
+            annotations (dict): Maps the names of the added columns to SQL
+                format strings.  Keys of ``conviction_stats_keys()`` in
+                braces are replaced by the statistic and ``{geo}`` by this
+                model's table.
+            use_stored (bool): Use the stored statistics if they are fresh.
+
+        Returns:
+            A QuerySet with the columns in ``annotations`` added to the
+            models.
+
+        """
+        stored = False
+        if use_stored:
+            stored = self.model.get_stats_model().objects\
+                .for_geography_model(self.model).is_fresh()
+
+        geo_sql = connections[self.db].ops.quote_name(
+            self.model._meta.db_table)
+        select = OrderedDict()
+        select_params = []
+        for name, template in annotations.items():
+            values = {'geo': geo_sql}
+            # Add the parameters of each subselect in the order that they
+            # appear in the column
+            for literal, field, spec, conversion in Formatter().parse(
+                    template):
+                if field and field != 'geo':
+                    values[field], params = self._stats_subselect_sql(field,
+                        stored)
+                    select_params.extend(params)
+            select[name] = template.format(**values)
+
+        return self.extra(select=select, select_params=select_params)
+
+    def with_conviction_annotations(self, use_stored=True):
+        """
+        Annotate the models with counts based on related convictions stats
+
+        The counts are subselects, so the annotated fields can be used to
+        filter and order the QuerySet.  They're looked up in the stored
+        statistics when those are fresh.
+
+        Args:
+            use_stored (bool): Use the statistics stored by
+                ``refresh_geography_stats`` if they are fresh.  Default is
+                True.
+
+        Returns:
+            A QuerySet with the following annotated fields added to the
+            models:
+
+            * num_convictions: Total number of convictions in the geography.
+            * convictions_per_capita: Population-adjusted count of all
+               convictions.
+            * num_homicides: Number of homicide convictions.
+            * num_affecting_women: Number of convictions for crimes
+              affecting women.
+            * affecting_women_per_capita: Population-adjusted count of
+              convictions for crimes affecting women.
+
+        """
+        return self._with_stats(OrderedDict([
+            ('num_convictions', "COALESCE({num_convictions}, 0)"),
+            ('convictions_per_capita',
+                "CAST(COALESCE({num_convictions}, 0) AS FLOAT) / "
+                "NULLIF({geo}.total_population, 0)"),
+            ('num_homicides', "COALESCE({num_homicides}, 0)"),
+            ('num_affecting_women', "COALESCE({num_affecting_women}, 0)"),
+            ('affecting_women_per_capita',
+                "CAST(COALESCE({num_affecting_women}, 0) AS FLOAT) / "
+                "NULLIF({geo}.total_population, 0)"),
+        ]), use_stored=use_stored)
+
+    def with_dui_annotations(self, use_stored=True):
+        """
+        Annotate the models with counts of DUI convictions
+
+        Args:
+            use_stored (bool): Use the statistics stored by
+                ``refresh_geography_stats`` if they are fresh.  Default is
+                True.
+
+        Returns:
+            A QuerySet with the annotated fields ``num_dui``, ``pct_dui``
+            (the fraction of all convictions in the geography that are for
+            DUI) and ``dui_per_capita`` added to the models.
+
+        """
+        return self._with_stats(OrderedDict([
+            ('num_dui', "COALESCE({num_dui}, 0)"),
+            ('pct_dui',
+                "CAST({num_dui} AS FLOAT) / NULLIF({num_convictions}, 0)"),
+            ('dui_per_capita',
+                "CAST(COALESCE({num_dui}, 0) AS FLOAT) / "
+                "NULLIF({geo}.total_population, 0)"),
+        ]), use_stored=use_stored)
 
     def geojson(self, simplify=0.0):
         """
@@ -688,14 +1332,129 @@ class ConvictionGeoQuerySet(GeoQuerySet):
             model as a feature.
 
         """
-        # Use a ValuesQuerySet so pk, model name and other cruft aren't
+        # Serialize dictionaries so pk, model name and other cruft aren't
         # included in the serialized output.
-        vqs = self.with_conviction_annotations().values(*self.model.GEOJSON_FIELDS)
-
-        return GeoJSONSerializer().serialize(vqs,
+        return GeoJSONSerializer().serialize(self.geojson_values(),
             simplify=simplify,
             geometry_field='boundary')
 
+    def geojson_values(self):
+        """
+        Return a list of dictionaries of the ``GEOJSON_FIELDS`` of each
+        model, including conviction annotations
+
+        The conviction annotations come first, followed by the model's
+        fields, the same order as the ``values()`` of an annotated QuerySet
+        that earlier versions serialized.
+        """
+        return [values for pk, values
+                in self._iter_geojson_values(self.model.GEOJSON_FIELDS)]
+
+    def _iter_geojson_values(self, fields):
+        stats = self.conviction_stats()
+        model_fields = [f for f in fields
+                        if f not in self.CONVICTION_ANNOTATION_FIELDS]
+        fields = [f for f in self.CONVICTION_ANNOTATION_FIELDS
+                  if f in fields] + model_fields
+        if 'total_population' not in model_fields:
+            model_fields.append('total_population')
+
+        for row in self.values('id', *model_fields).iterator():
+            annotations = self._conviction_annotations(
+                self._get_geo_stats(stats, row['id']), row['total_population'])
+            yield row['id'], OrderedDict(
+                (f, annotations[f] if f in annotations else row[f])
+                for f in fields)
+
+    def iter_geojson(self, simplify=0.0, geometry_field='boundary'):
+        """
+        Generate a GeoJSON FeatureCollection of the models in this QuerySet
+        in chunks
+
+        The output is the same as ``geojson()``, but features are
+        serialized one at a time.  Simplified geometries are read from the
+        ``SimplifiedGeometry`` cache, which is filled for any missing
+        geometries the first time a tolerance is used.
+
+        Args:
+            simplify (float): Tolerance value to use when simplifying the
+                geometry fields of the models.  Default is 0.  If None,
+                geometries aren't simplified.
+            geometry_field (str): Name of the geometry field.
+
+        Yields:
+            Strings that together are the serialized FeatureCollection.
+
+        """
+        return iter_feature_collection(self.iter_features(simplify,
+            geometry_field))
+
+    def iter_features(self, simplify=0.0, geometry_field='boundary'):
+        """
+        Generate GeoJSON Feature dictionaries for the models in this
+        QuerySet
+
+        Args:
+            simplify (float): Tolerance value to use when simplifying the
+                geometry fields of the models.  If ``None``, the geometries
+                aren't simplified.
+            geometry_field (str): Name of the geometry field.
+
+        Yields:
+            Dictionaries as returned by ``convictions_data.geojson.feature()``
+            with the ``GEOJSON_FIELDS`` of each model as properties and a
+            ``GEOSGeometry``.
+
+        """
+        if simplify is None:
+            geometries = dict(self.values_list('id', geometry_field))
+        else:
+            geometries = self.model.get_simplified_geometry_model().objects\
+                .geometries(self.model, simplify,
+                    geography_ids=self.values('id'))
+
+        properties = [f for f in self.model.GEOJSON_FIELDS
+                      if f != geometry_field]
+        for pk, values in self._iter_geojson_values(properties):
+            yield feature(values.items(), geometries.get(pk))
+
+    def topojson(self, simplify=0.0, quantization=DEFAULT_QUANTIZATION,
+            object_name=None, geometry_field='boundary'):
+        """
+        Convert the models in this QuerySet to a TopoJSON topology
+
+        Boundaries shared between adjacent geographies are only stored
+        once and coordinates are quantized, so the output is much smaller
+        than the equivalent GeoJSON.  The topology is built from the
+        unsimplified geometries and its arcs are simplified afterwards, so
+        shared boundaries still match.  Models without a geometry are
+        included with a null geometry.
+
+        Args:
+            simplify (float): Tolerance value to use when simplifying the
+                arcs of the topology.  Default is 0.
+            quantization (float): Number of distinct values for quantized
+                coordinates along each dimension.
+            object_name (str): Name of the GeometryCollection object in
+                the topology.  Defaults to the model's name.
+            geometry_field (str): Name of the geometry field.
+
+        Returns:
+            Dictionary that can be serialized as TopoJSON.
+
+        """
+        if object_name is None:
+            object_name = self.model._meta.object_name
+
+        features = []
+        for f in self.iter_features(None, geometry_field):
+            if f['geometry'] is not None:
+                f['geometry'] = json.loads(f['geometry'].geojson)
+            features.append(f)
+
+        return topology(OrderedDict([(object_name, features)]),
+            quantization=quantization, simplify=simplify)
+
     def convictions_per_capita(self):
         """Calculate the aggregate convictions per capita for the entire QuerySet"""
         total_convictions = self.aggregate(total_convictions=Count('conviction'))['total_convictions']
@@ -704,6 +1463,282 @@ class ConvictionGeoQuerySet(GeoQuerySet):
         return float(total_convictions / total_population)
 
 
+class GeographyConvictionStatsQuerySet(QuerySet):
+    """
+    QuerySet for stored conviction statistics for geographies
+
+    """
+
+    def for_geography_model(self, geography_model):
+        return self.filter(geography_type=geography_model._meta.object_name)
+
+    def conviction_state(self, conviction_model=None):
+        """
+        Return values that change when convictions are created or deleted
+
+        These are stored with the statistics to tell when the statistics
+        are out of date.
+        """
+        if conviction_model is None:
+            conviction_model = self.model.get_conviction_model()
+
+        return conviction_model.objects.aggregate(
+            conviction_count=Count('id'), max_conviction_id=Max('id'))
+
+    def is_fresh(self):
+        """
+        Were the statistics in this QuerySet calculated from the current
+        convictions?
+
+        Conviction ids come from a sequence and are never reused, so
+        creating a conviction always raises the largest id, even if
+        others were deleted, and deleting convictions without creating
+        any lowers the count.  Comparing the count and the largest id is
+        enough to detect convictions that were created or deleted.
+
+        It doesn't detect changes to existing convictions.  The commands
+        that change their categories or geographies, or the geographies
+        themselves, delete the stored statistics instead.
+        """
+        stored = self.values('conviction_count', 'max_conviction_id')[:1]
+        if not stored:
+            return False
+
+        return stored[0] == self.conviction_state()
+
+    def conviction_stats(self):
+        """
+        Return stored counts in the format of
+        ``ConvictionGeoQuerySet.conviction_stats()``
+        """
+        keys = ConvictionGeoQuerySet.conviction_stats_keys()
+        return {row['geography_id']: {key: row[key] for key in keys}
+                for row in self.values('geography_id', *keys)}
+
+    def top_statutes(self, count=10):
+        """
+        Return stored most common statutes for each geography
+
+        Returns:
+            Dictionary keyed by geography id with lists of statutes in the
+            format of ``ConvictionQuerySet.most_common_statutes()`` as
+            values, or None if fewer than ``count`` statutes were stored.
+
+        """
+        top_statutes = {}
+        for stats in self.only('geography_id', 'top_statutes_count',
+                'top_statutes'):
+            if stats.top_statutes_count < count:
+                return None
+
+            top_statutes[stats.geography_id] = stats.get_top_statutes()[:count]
+
+        return top_statutes
+
+    def refresh(self, geography_model, top_statutes_count=10):
+        """
+        Recalculate and store conviction statistics for all geographies of
+        a model
+
+        Args:
+            geography_model: Model class, such as ``CommunityArea`` or
+                ``CensusPlace``.
+            top_statutes_count (int): Number of most common statutes to
+                store for each geography.
+
+        Returns:
+            The number of statistics records created.
+
+        """
+        conviction_model = geography_model.get_conviction_model()
+        conviction_state = self.conviction_state(conviction_model)
+        geo_qs = geography_model.objects.all()
+        stats = geo_qs.conviction_stats(use_stored=False)
+        top_statutes = dict(geo_qs.most_common_statutes_by_geography(
+            top_statutes_count))
+
+        self.for_geography_model(geography_model).delete()
+
+        stats_models = []
+        for geo_id, total_population in geo_qs.values_list('id',
+                'total_population'):
+            geo_stats = geo_qs._get_geo_stats(stats, geo_id)
+            attrs = dict(geo_stats)
+            attrs.update(geo_qs._conviction_annotations(geo_stats,
+                total_population))
+            attrs.update(geo_qs._dui_annotations(geo_stats, total_population))
+            stats_model = self.model(
+                geography_type=geography_model._meta.object_name,
+                geography_id=geo_id,
+                top_statutes_count=top_statutes_count, **attrs)
+            stats_model.set_top_statutes(top_statutes.get(geo_id, []))
+            stats_model.conviction_count = conviction_state['conviction_count']
+            stats_model.max_conviction_id = conviction_state['max_conviction_id']
+            stats_models.append(stats_model)
+
+        self.model.objects.bulk_create(stats_models)
+
+        return len(stats_models)
+
+
+class SimplifiedGeometryQuerySet(GeoQuerySet):
+    """
+    QuerySet for cached simplified geometries of geographies
+    """
+
+    def for_geography_model(self, geography_model):
+        return self.filter(geography_type=geography_model._meta.object_name)
+
+    def simplify(self, geography_model, tolerance, geometry_field='boundary'):
+        """
+        Simplify and store the geometries of a model that aren't already
+        cached for a tolerance
+
+        Geometries are simplified in the database with a single
+        ``INSERT ... SELECT`` using ``ST_SimplifyPreserveTopology``, which
+        uses the same GEOS algorithm as ``GEOSGeometry.simplify()`` with
+        ``preserve_topology=True``.
+
+        Returns:
+            The number of geometries that were simplified.
+
+        """
+        connection = connections[self.db]
+        if connection.ops.spatialite:
+            simplify_fn = 'SimplifyPreserveTopology'
+        else:
+            simplify_fn = 'ST_SimplifyPreserveTopology'
+
+        geography_type = geography_model._meta.object_name
+        sql = ("INSERT INTO {cache_table} "
+            "(geography_type, geography_id, tolerance, geometry) "
+            "SELECT %s, id, %s, {simplify_fn}({geometry_field}, %s) "
+            "FROM {geo_table} "
+            "WHERE id NOT IN (SELECT geography_id FROM {cache_table} "
+            "WHERE geography_type = %s AND tolerance = %s)").format(
+                cache_table=self.model._meta.db_table,
+                simplify_fn=simplify_fn, geometry_field=geometry_field,
+                geo_table=geography_model._meta.db_table)
+
+        cursor = connection.cursor()
+        cursor.execute(sql, [geography_type, tolerance, tolerance,
+            geography_type, tolerance])
+        return cursor.rowcount
+
+    def geometries(self, geography_model, tolerance, geography_ids=None):
+        """
+        Get simplified geometries, simplifying any that aren't cached
+
+        Args:
+            geography_model: Model class, such as ``CommunityArea``.
+            tolerance (float): Simplification tolerance.
+            geography_ids: Optional list or QuerySet of ids of the
+                geographies to get.
+
+        Returns:
+            Dictionary mapping geography ids to simplified geometries.
+
+        """
+        self.simplify(geography_model, tolerance)
+        qs = self.for_geography_model(geography_model)\
+            .filter(tolerance=tolerance)
+        if geography_ids is not None:
+            qs = qs.filter(geography_id__in=geography_ids)
+
+        return dict(qs.values_list('geography_id', 'geometry'))
+
+
+class AnonymizedAddressQuerySet(QuerySet):
+    """
+    QuerySet for stored anonymized addresses
+
+    """
+    LOOKUP_BATCH_SIZE = 500
+    """
+    Maximum number of addresses to look up in a single query.  SQLite
+    limits the number of parameters in a query.
+    """
+
+    def lookup(self, addresses):
+        """
+        Return a dictionary mapping the addresses that have been stored to
+        their anonymized versions
+        """
+        addresses = list(addresses)
+        stored = {}
+        for i in range(0, len(addresses), self.LOOKUP_BATCH_SIZE):
+            stored.update(self.filter(
+                    address__in=addresses[i:i + self.LOOKUP_BATCH_SIZE])
+                .values_list('address', 'anonymized'))
+
+        return stored
+
+    def store(self, anonymized):
+        """
+        Store anonymized addresses
+
+        Args:
+            anonymized: Dictionary mapping addresses to their anonymized
+                versions.
+
+        """
+        # Other processes, for example other export workers, may have
+        # stored some of these addresses already
+        stored = self.lookup(anonymized.keys())
+        records = [self.model(address=address, anonymized=value)
+                   for address, value in anonymized.items()
+                   if address not in stored]
+        try:
+            with transaction.atomic(using=self.db):
+                self.bulk_create(records)
+            return
+        except IntegrityError:
+            # Another process stored some of them since we looked them up
+            logger.info("Some of {} anonymized addresses were stored by "
+                        "another process".format(len(records)))
+
+        # Store the rest one at a time, so that a conflict only skips the
+        # conflicting address
+        stored = self.lookup(r.address for r in records)
+        for record in records:
+            if record.address in stored:
+                continue
+
+            try:
+                with transaction.atomic(using=self.db):
+                    record.save(using=self.db)
+            except IntegrityError:
+                pass
+
+    def anonymize(self, addresses, anonymizer=None):
+        """
+        Anonymize addresses, using the stored anonymized versions
+
+        Addresses that haven't been stored are anonymized and stored.
+
+        Args:
+            addresses: Iterable of distinct addresses.
+            anonymizer (AddressAnonymizer): Anonymizer for addresses that
+                haven't been stored.
+
+        Returns:
+            Dictionary mapping each address to its anonymized version.
+
+        """
+        anonymized = self.lookup(addresses)
+        new_addresses = [a for a in addresses if a not in anonymized]
+        if new_addresses:
+            if anonymizer is None:
+                anonymizer = AddressAnonymizer()
+
+            new_anonymized = dict((a, anonymizer.anonymize(a))
+                                  for a in new_addresses)
+            self.store(new_anonymized)
+            anonymized.update(new_anonymized)
+
+        return anonymized
+
+
 class CensusPlaceQueryset(ConvictionGeoQuerySet):
     def chicago_suburbs(self):
         return self.filter(in_chicago_msa=True).exclude(name='Chicago')
@@ -1,3 +1,6 @@
+from django.db import connections
+from django.db.models import Q
+
 MIN_VALID_AGE = 18
 """
 Minimum age in our data that we should treat as valid.
@@ -21,44 +24,208 @@ AGE_RANGES = [
 ]
 
 AGE_EXPR = "date_part('year', age(chrgdispdate, dob))"
+"""
+PostgreSQL expression for calculating age at the time of disposition
+
+``calculate_age()`` calculates the same value in Python.
+"""
+
+AGE_FIELD = 'age_at_disposition'
+"""
+Field where the age calculated by ``calculate_age()`` is stored
+"""
+
+AGE_RANGE_CATEGORIES = [
+    ('violent_convictions', 'violent_index'),
+    ('property_convictions', 'property_index'),
+    ('drug_convictions', 'drug'),
+    ('affecting_women_convictions', 'affecting_women'),
+    ('homicide_convictions', 'homicide'),
+]
+"""
+Keys of the category counts in age range records and the category flag
+fields that they count
+"""
+
+INVALID_AGE_BUCKET = -1
+
+
+def calculate_age(dob, chrgdispdate):
+    """
+    Calculate someone's age, in whole years, on the date of a disposition
+
+    This matches the value of ``AGE_EXPR`` in PostgreSQL, including
+    negative ages when the birth date is after the disposition date.
+
+    Args:
+        dob (date): Date of birth.
+        chrgdispdate (date): Date of the disposition.
+
+    Returns:
+        Age in years, or None if either date is missing.
+
+    """
+    if dob is None or chrgdispdate is None:
+        return None
+
+    if chrgdispdate < dob:
+        return -calculate_age(chrgdispdate, dob)
+
+    age = chrgdispdate.year - dob.year
+    if (chrgdispdate.month, chrgdispdate.day) < (dob.month, dob.day):
+        age -= 1
+
+    return age
+
 
 class AgeQuerySetMixin(object):
-    def filter_by_age(self, start, end, age_expr=AGE_EXPR):
-        where = ["{} >= {}".format(age_expr, start)]
+    def filter_by_age(self, start, end, age_expr=None):
+        """
+        Filter to records with an age at disposition in a range
+
+        Args:
+            start (int): Minimum age.
+            end (int): Maximum age, or None for no maximum.
+            age_expr (str): SQL expression to calculate age.  By default,
+                filter on the stored ``age_at_disposition`` field.
 
+        """
+        if age_expr is not None:
+            where = ["{} >= {}".format(age_expr, start)]
+
+            if end is not None:
+                where.append("{} <= {}".format(age_expr, end))
+            return self.extra(where=where)
+
+        filter_kwargs = {AGE_FIELD + '__gte': start}
         if end is not None:
-            where.append("{} <= {}".format(age_expr, end))
-        return self.extra(where=where)
+            filter_kwargs[AGE_FIELD + '__lte'] = end
+
+        return self.filter(**filter_kwargs)
+
+    def invalid_age(self, age_expr=None):
+        if age_expr is not None:
+            where = [
+               '{} < {} OR {} IS NULL'.format(age_expr, MIN_VALID_AGE, age_expr)
+            ]
+            return self.extra(where=where)
+
+        return self.filter(Q(**{AGE_FIELD + '__lt': MIN_VALID_AGE}) |
+            Q(**{AGE_FIELD + '__isnull': True}))
+
+    def set_age_at_disposition(self, batch_size=1000):
+        """
+        Calculate and store the age at disposition of the records in this
+        QuerySet
+
+        Ages are calculated in Python and records with the same age are
+        updated together, in batches of ``batch_size`` ids.
+
+        Returns:
+            The number of records updated.
+
+        """
+        ids_by_age = {}
+        rows = self.values_list('id', 'dob', 'chrgdispdate').iterator()
+        for pk, dob, chrgdispdate in rows:
+            age = calculate_age(dob, chrgdispdate)
+            ids_by_age.setdefault(age, []).append(pk)
+
+        num_updated = 0
+        for age, ids in ids_by_age.items():
+            for i in range(0, len(ids), batch_size):
+                num_updated += self.model.objects.filter(
+                    id__in=ids[i:i + batch_size]).update(
+                    **{AGE_FIELD: age})
+
+        return num_updated
 
-    def invalid_age(self, age_expr=AGE_EXPR):
-        where = [
-           '{} < {} OR {} IS NULL'.format(age_expr, MIN_VALID_AGE, age_expr)
-        ]
-        return self.extra(where=where)
+    age_range_categories = []
+    """
+    Keys and flag fields of the category counts in age range records.
+    QuerySets of models with category flags override this.
+    """
+
+    def counts_by_age_range(self, age_expr=AGE_FIELD):
+        """
+        Count records in each category for each age range
+
+        All the counts are calculated in a single query that assigns each
+        record to an age bucket and groups by the bucket.
+
+        Args:
+            age_expr (str): SQL expression for age.  Defaults to the stored
+                ``age_at_disposition`` field.  Pass ``AGE_EXPR`` to
+                calculate ages from the dates in PostgreSQL instead.
+
+        Returns:
+            A list of dictionaries, one for each of ``AGE_RANGES``,
+            followed by one for records with invalid ages.  Each
+            dictionary has a ``total_convictions`` count and a count for
+            each of ``age_range_categories``.
+
+        """
+        bucket_counts = {}
+        for row in self._age_bucket_counts(age_expr):
+            bucket_counts[row[0]] = row[1:]
 
-    def counts_by_age_range(self):
         convictions_by_age = []
-        for (start, end) in AGE_RANGES:
-            record = self.filter_by_age(start, end).age_range_record()
+        for i, (start, end) in enumerate(AGE_RANGES):
+            record = self._age_bucket_record(bucket_counts.get(i))
             record['age_min'] = start
             record['age_max'] = end
             record['invalid_ages'] = False
             convictions_by_age.append(record)
 
-        record = self.invalid_age().age_range_record()
+        record = self._age_bucket_record(
+            bucket_counts.get(INVALID_AGE_BUCKET))
         record['invalid_ages'] = True
         convictions_by_age.append(record)
 
         return convictions_by_age
 
-    def age_range_record(self):
-        return {
-            'total_convictions': self.count(),
-            # Each of our major crime categories for this age bucket
-            'violent_convictions': self.violent_index_crimes().count(),
-            'property_convictions': self.property_index_crimes().count(),
-            'drug_convictions': self.drug_crimes().count(),
-            'affecting_women_convictions': self.crimes_affecting_women().count(),
-            # Homicides for this age bucket
-            'homicide_convictions': self.homicides().count(),
-        }
+    def _age_bucket_sql(self, age_expr):
+        whens = ["WHEN {age} IS NULL OR {age} < {min_age} THEN {bucket}".format(
+            age=age_expr, min_age=MIN_VALID_AGE, bucket=INVALID_AGE_BUCKET)]
+        for i, (start, end) in enumerate(AGE_RANGES):
+            condition = "{} >= {}".format(age_expr, start)
+            if end is not None:
+                condition += " AND {} <= {}".format(age_expr, end)
+            whens.append("WHEN {} THEN {}".format(condition, i))
+
+        return "CASE {} ELSE NULL END".format(" ".join(whens))
+
+    def _age_bucket_counts(self, age_expr):
+        """
+        Return rows of age bucket, total count and a count for each of
+        ``age_range_categories``
+        """
+        flags = [flag for key, flag in self.age_range_categories]
+        # Use this QuerySet, with any filters, as a subquery that selects
+        # only the columns needed to calculate age and count categories
+        inner_sql, params = self.order_by().values('dob', 'chrgdispdate',
+            AGE_FIELD, *flags).query.sql_with_params()
+        counts_sql = ", ".join(["COUNT(*)"] + [
+            "SUM(CASE WHEN {} THEN 1 ELSE 0 END)".format(flag)
+            for flag in flags])
+        sql = ("SELECT age_bucket, {counts} "
+            "FROM (SELECT {columns} "
+            "FROM ({inner}) AS age_bucket_records) AS age_buckets "
+            "GROUP BY age_bucket").format(counts=counts_sql,
+                columns=", ".join(["{} AS age_bucket".format(
+                    self._age_bucket_sql(age_expr))] + flags),
+                inner=inner_sql)
+
+        cursor = connections[self.db].cursor()
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+    def _age_bucket_record(self, counts):
+        if counts is None:
+            counts = [0] * (len(self.age_range_categories) + 1)
+
+        record = {'total_convictions': counts[0]}
+        for (key, flag), count in zip(self.age_range_categories, counts[1:]):
+            record[key] = count
+
+        return record
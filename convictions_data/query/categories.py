@@ -0,0 +1,295 @@
+"""
+Categories of convictions and a Python evaluator for their queries
+
+The categories used in our reports are defined as ``Q`` objects that
+combine ``iregex``, ``istartswith`` and ``in`` lookups on a handful of
+charge fields.  Filtering on each category separately means the database
+evaluates every pattern against every row, once per category.
+
+However, the categories only depend on the values of ``CATEGORY_FIELDS``,
+and there are only a few thousand distinct combinations of those values.
+``CategoryClassifier`` compiles the category queries once, evaluates them
+in Python against each distinct combination, and represents the result as
+a bitmask with one bit per category.  Counting convictions in every
+category then only requires a single grouped query.
+
+"""
+from collections import OrderedDict
+import re
+
+from django.db.models import Q
+
+from convictions_data.query.drugs import (get_drug_queries, mfg_del_query,
+    poss_query)
+from convictions_data.query.iucr import (arson_nonindex_iucr_query,
+    crimes_affecting_women_iucr_query, homicide_iucr_query,
+    homicide_nonindex_iucr_query, property_iucr_query, violent_iucr_query,
+    violent_nonindex_iucr_query)
+from convictions_data.query.statute import (AFFECTING_WOMEN_STATUTE_QUERY,
+    DUI_STATUTE_QUERY, PROPERTY_INDEX_STATUTE_QUERY,
+    VIOLENT_INDEX_STATUTE_QUERY)
+
+CATEGORY_FIELDS = (
+    'final_statute',
+    'final_statute_formatted',
+    'final_chrgdesc',
+    'iucr_code',
+)
+"""Fields that the category queries depend on"""
+
+DRUG_CATEGORY_FIELDS = (
+    'final_statute',
+    'final_chrgdesc',
+)
+"""Fields that the drug queries depend on"""
+
+VIOLENT_INDEX_QUERY = ((violent_iucr_query | VIOLENT_INDEX_STATUTE_QUERY) &
+    ~violent_nonindex_iucr_query)
+
+PROPERTY_INDEX_QUERY = ((property_iucr_query | PROPERTY_INDEX_STATUTE_QUERY) &
+    ~arson_nonindex_iucr_query)
+
+# The IUCR query misses a lot of values right now, probably because of
+# annoying mangled statutes that combine the statute for the crime and
+# the blanket statute for attempted crimes, so we use the drug queries based
+# on the statute and charge description instead.
+DRUG_QUERY = poss_query | mfg_del_query
+
+AFFECTING_WOMEN_QUERY = (crimes_affecting_women_iucr_query |
+    AFFECTING_WOMEN_STATUTE_QUERY)
+
+HOMICIDE_QUERY = homicide_iucr_query | homicide_nonindex_iucr_query
+
+DUI_QUERY = DUI_STATUTE_QUERY
+
+OTHER_QUERY = ~(violent_iucr_query | property_iucr_query |
+    crimes_affecting_women_iucr_query | poss_query | mfg_del_query)
+
+MAJOR_CATEGORY_QUERIES = OrderedDict([
+    ('violent_index', VIOLENT_INDEX_QUERY),
+    ('property_index', PROPERTY_INDEX_QUERY),
+    ('drug', DRUG_QUERY),
+    ('affecting_women', AFFECTING_WOMEN_QUERY),
+    ('homicide', HOMICIDE_QUERY),
+    ('dui', DUI_QUERY),
+    ('other', OTHER_QUERY),
+])
+"""The major categories of crimes used in our reports"""
+
+CATEGORY_FLAG_QUERIES = OrderedDict([
+    ('violent_index', VIOLENT_INDEX_QUERY),
+    ('property_index', PROPERTY_INDEX_QUERY),
+    ('drug', DRUG_QUERY),
+    ('drug_mfg_del', mfg_del_query),
+    ('drug_poss', poss_query),
+    ('affecting_women', AFFECTING_WOMEN_QUERY),
+    ('homicide', HOMICIDE_QUERY),
+    ('dui', DUI_QUERY),
+    ('other', OTHER_QUERY),
+])
+"""
+Categories that are stored as boolean fields on ``Conviction``
+
+The keys are the names of the fields.
+"""
+
+
+def get_category_queries():
+    """
+    Return an ordered dictionary of all category names to queries
+
+    This includes the major categories as well as all the drug categories
+    from ``convictions_data.query.drugs``, which are named after the
+    corresponding ``DrugQuerySetMixin`` methods.
+    """
+    queries = OrderedDict(MAJOR_CATEGORY_QUERIES)
+    drug_queries = get_drug_queries()
+    for name in sorted(drug_queries.keys()):
+        queries[name] = drug_queries[name]
+
+    return queries
+
+
+def _as_lookup_values(value):
+    # Mimic how the ORM builds an ``IN`` clause, which iterates over the
+    # value.  Note that this means a string value is treated as a sequence
+    # of characters.
+    return frozenset(value)
+
+
+def _compile_lookup(lookup_type, value):
+    """
+    Return a function that tests a field value like the ORM lookup would
+    """
+    if lookup_type == 'exact':
+        return lambda v: v == value
+    elif lookup_type == 'iexact':
+        value = value.upper()
+        return lambda v: v.upper() == value
+    elif lookup_type == 'in':
+        values = _as_lookup_values(value)
+        return lambda v: v in values
+    elif lookup_type == 'contains':
+        return lambda v: value in v
+    elif lookup_type == 'icontains':
+        value = value.upper()
+        return lambda v: value in v.upper()
+    elif lookup_type == 'startswith':
+        return lambda v: v.startswith(value)
+    elif lookup_type == 'istartswith':
+        value = value.upper()
+        return lambda v: v.upper().startswith(value)
+    elif lookup_type == 'regex':
+        regex = re.compile(value)
+        return lambda v: regex.search(v) is not None
+    elif lookup_type == 'iregex':
+        regex = re.compile(value, re.IGNORECASE)
+        return lambda v: regex.search(v) is not None
+
+    raise ValueError("Unsupported lookup type '{}'".format(lookup_type))
+
+
+class CategoryClassifier(object):
+    """
+    Evaluate category queries against records in Python
+
+    Each query is compiled once into a function.  Lookups that appear in
+    more than one query, such as the building blocks of ``poss_query``, are
+    only evaluated once per record.
+
+    """
+
+    def __init__(self, queries=None):
+        if queries is None:
+            queries = get_category_queries()
+
+        self.names = list(queries.keys())
+        self._bits = {name: 1 << i for i, name in enumerate(self.names)}
+        self._leaves = []
+        self._leaf_indexes = {}
+        self._tests = [self._compile(q) for q in queries.values()]
+
+    def _compile(self, q):
+        tests = []
+        for child in q.children:
+            if isinstance(child, Q):
+                tests.append(self._compile(child))
+            else:
+                tests.append(self._compile_leaf(*child))
+
+        if q.connector == Q.AND:
+            test = lambda leaves: all(t(leaves) for t in tests)
+        else:
+            test = lambda leaves: any(t(leaves) for t in tests)
+
+        if q.negated:
+            return lambda leaves: not test(leaves)
+
+        return test
+
+    def _compile_leaf(self, lookup, value):
+        field_name, sep, lookup_type = lookup.partition('__')
+        if not lookup_type:
+            lookup_type = 'exact'
+
+        if lookup_type == 'in':
+            key = (field_name, lookup_type, _as_lookup_values(value))
+        else:
+            key = (field_name, lookup_type, value)
+
+        try:
+            i = self._leaf_indexes[key]
+        except KeyError:
+            i = len(self._leaves)
+            self._leaves.append((field_name,
+                _compile_lookup(lookup_type, value)))
+            self._leaf_indexes[key] = i
+
+        return lambda leaves: leaves[i]
+
+    def bit(self, name):
+        """Return the bit that represents a category in a mask"""
+        return self._bits[name]
+
+    def mask(self, record):
+        """
+        Return the category bitmask for a record
+
+        Args:
+            record (dict): Dictionary with keys for each of
+                ``CATEGORY_FIELDS``.
+
+        Returns:
+            Integer with the bit for each matching category set.
+
+        """
+        leaves = [test(record[field_name])
+                  for field_name, test in self._leaves]
+        mask = 0
+        for i, test in enumerate(self._tests):
+            if test(leaves):
+                mask |= 1 << i
+
+        return mask
+
+    def matches(self, record):
+        """Return a list of the names of the categories matching a record"""
+        mask = self.mask(record)
+        return [name for name in self.names if mask & self._bits[name]]
+
+    def count(self, rows, count_key='count'):
+        """
+        Count records in each category
+
+        Args:
+            rows: Iterable of dictionaries with keys for each of
+                ``CATEGORY_FIELDS`` and a key with the number of records
+                having those values, for example from a grouped
+                ``values().annotate()`` query.
+            count_key (str): Key of the count in each row.
+
+        Returns:
+            OrderedDict mapping category names to counts.
+
+        """
+        mask_counts = {}
+        for row in rows:
+            mask = self.mask(row)
+            mask_counts[mask] = mask_counts.get(mask, 0) + row[count_key]
+
+        counts = OrderedDict((name, 0) for name in self.names)
+        for mask, count in mask_counts.items():
+            for name in self.names:
+                if mask & self._bits[name]:
+                    counts[name] += count
+
+        return counts
+
+
+_default_classifier = None
+
+def get_classifier():
+    """Return a shared CategoryClassifier for all the category queries"""
+    global _default_classifier
+    if _default_classifier is None:
+        _default_classifier = CategoryClassifier()
+
+    return _default_classifier
+
+
+_drug_classifier = None
+
+def get_drug_classifier():
+    """
+    Return a shared CategoryClassifier for the drug queries
+
+    The categories are named after the ``DrugQuerySetMixin`` methods, and
+    only depend on ``DRUG_CATEGORY_FIELDS``.
+    """
+    global _drug_classifier
+    if _drug_classifier is None:
+        drug_queries = get_drug_queries()
+        _drug_classifier = CategoryClassifier(OrderedDict(
+            (name, drug_queries[name]) for name in sorted(drug_queries)))
+
+    return _drug_classifier
@@ -491,8 +491,8 @@ mfg_del_unkwn_class_query = (
 
 # No drug could be idenitied from the statute or charge description
 mfg_del_uknwn_drug_query = (
-    mfg_del_unkwn_query,
-    mfg_del_att_unkwn_query,
+    mfg_del_unkwn_query |
+    mfg_del_att_unkwn_query |
     mfg_del_unkwn_class_x_query |
     mfg_del_att_class_2_query |
     mfg_del_conspiracy_class_2_query
@@ -1197,15 +1197,34 @@ poss_query = (
 # TODO: Check if felony/misdemenor classes in records line up with
 # charges
 
-def filter_method_from_query(q):
+def filter_method_from_query(name, q):
     """
-    Return a method that just runs QuerySet.filter() with the given parameter
+    Return a method that filters by the given drug query
+
+    The method calls ``filter_drug_category()`` with the name of the query
+    so QuerySets can look up stored categories instead of running the
+    query.
     """
     def filter_fn(self):
-        return self.filter(q)
+        return self.filter_drug_category(name, q)
 
     return filter_fn
 
+def get_drug_queries():
+    """
+    Return a dictionary of the drug queries defined in this module
+
+    The keys are the query names without the ``_query`` suffix, for example
+    ``mfg_del`` for ``mfg_del_query``.
+    """
+    queries = {}
+    for k, v in globals().items():
+        if ((k.startswith('mfg_del_') or k.startswith('poss_') or
+                k.startswith('casual_del')) and k.endswith('_query')):
+            queries[k.replace('_query', '')] = v
+
+    return queries
+
 class DrugQuerySetMixinMeta(type):
     def __init__(cls, name, bases, dct):
         super(DrugQuerySetMixinMeta, cls).__init__(name, bases, dct)
@@ -1214,11 +1233,8 @@ class DrugQuerySetMixinMeta(type):
         # create methods that filter based on all the queries
         # we've defined above.  For example,
         # cls.mfg_del() is equivalent to cls.filter(mfg_del_query)
-        for k, v in globals().items():
-            if ((k.startswith('mfg_del_') or k.startswith('poss_') or
-                    k.startswith('casual_del')) and k.endswith('_query')):
-                attr = k.replace('_query', '')
-                setattr(cls, attr, filter_method_from_query(v))
+        for attr, q in get_drug_queries().items():
+            setattr(cls, attr, filter_method_from_query(attr, q))
 
 
 class DrugQuerySetMixin(object, metaclass=DrugQuerySetMixinMeta):
@@ -1228,3 +1244,15 @@ class DrugQuerySetMixin(object, metaclass=DrugQuerySetMixinMeta):
     # Python 3 ignores this.  Keep it here for possible backward
     # compatibility
     __metaclass__ = DrugQuerySetMixinMeta
+
+    def filter_drug_category(self, name, q):
+        """
+        Filter by one of the drug queries
+
+        Args:
+            name (str): Name of the query, which is also the name of the
+                method, for example ``poss_heroin``.
+            q (Q): The query.
+
+        """
+        return self.filter(q)
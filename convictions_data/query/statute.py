@@ -35,6 +35,9 @@ PROPERTY_INDEX_STATUTE_QUERY = (
 
 NONVIOLENT_INDEX_STATUTE_QUERY = PROPERTY_INDEX_STATUTE_QUERY
 
+# DUI
+DUI_STATUTE_QUERY = Q(final_statute_formatted__istartswith='625-5/11-501')
+
 NONVIOLENT_STATUTE_QUERY = NONVIOLENT_INDEX_STATUTE_QUERY | (
     # Animal fighting
     Q(final_statute_formatted__istartswith='510-70/4.01(a)') |
@@ -48,8 +51,7 @@ NONVIOLENT_STATUTE_QUERY = NONVIOLENT_INDEX_STATUTE_QUERY | (
     # However, these are both nonindex offenses
     Q(final_statute_formatted__istartswith='720-5/26-5') |
 
-    # DUI
-    Q(final_statute_formatted__istartswith='625-5/11-501') |
+    DUI_STATUTE_QUERY |
 
     # Harassing phone calls
     Q(final_statute_formatted__istartswith='720-135/1') |
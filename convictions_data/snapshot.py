@@ -0,0 +1,438 @@
+"""
+Columnar snapshots of conviction data for in-process analysis
+
+A snapshot is a directory containing one NumPy ``.npy`` file per column
+and a ``manifest.json`` file describing the tables and columns.  String
+columns are dictionary-encoded as ``int32`` codes into a list of distinct
+values stored in the manifest, and dates are stored as ``int32`` days since
+the Unix epoch.  Because each column is a plain ``.npy`` file, it can be
+memory-mapped when the snapshot is loaded, so analysis code only pages in
+the columns it actually uses.
+
+Conviction categories are stored alongside the columns as an ``int32``
+``category_key`` column, which indexes the distinct combinations of
+``CATEGORY_FIELDS``, and a boolean matrix with one row per combination and
+one column per category.  This lets us count convictions in every category
+at once with ``numpy.bincount()``.
+
+"""
+from array import array
+from datetime import date, datetime
+import json
+import os
+
+import numpy as np
+
+from convictions_data.query.categories import CATEGORY_FIELDS, get_classifier
+
+MANIFEST_FILENAME = 'manifest.json'
+
+EPOCH = date(1970, 1, 1)
+
+NULL_INT = -1
+"""Value stored for a missing integer, such as an unset foreign key"""
+
+NULL_DATE = -2**31
+"""Value stored for a missing date"""
+
+CONVICTION_COLUMNS = [
+    ('id', 'int'),
+    ('case_number', 'str'),
+    ('chrgdispdate', 'date'),
+    ('dob', 'date'),
+    ('sex', 'str'),
+    ('final_statute', 'str'),
+    ('final_statute_formatted', 'str'),
+    ('final_chrgdesc', 'str'),
+    ('final_chrgtype', 'str'),
+    ('final_chrgclass', 'str'),
+    ('iucr_code', 'str'),
+    ('iucr_category', 'str'),
+    ('community_area', 'int'),
+    ('place', 'int'),
+]
+"""Columns included in the snapshot of Conviction models"""
+
+DISPOSITION_COLUMNS = [
+    ('id', 'int'),
+    ('case_number', 'str'),
+    ('initial_date', 'date'),
+    ('chrgdispdate', 'date'),
+    ('dob', 'date'),
+    ('sex', 'str'),
+    ('chrgtype', 'str'),
+    ('chrgclass', 'str'),
+    ('final_statute', 'str'),
+    ('final_statute_formatted', 'str'),
+    ('final_chrgdesc', 'str'),
+    ('final_chrgtype', 'str'),
+    ('final_chrgclass', 'str'),
+    ('iucr_code', 'str'),
+    ('iucr_category', 'str'),
+    ('community_area', 'int'),
+    ('place', 'int'),
+    ('conviction', 'int'),
+]
+"""Columns included in the snapshot of Disposition models"""
+
+
+class IntColumnEncoder(object):
+    """Accumulate nullable integer values as int32"""
+    kind = 'int'
+
+    def __init__(self):
+        self._values = array('i')
+
+    def append(self, val):
+        self._values.append(NULL_INT if val is None else val)
+
+    def to_array(self):
+        return np.frombuffer(self._values, dtype=np.intc).astype(np.int32)
+
+    def metadata(self):
+        return {'null': NULL_INT}
+
+
+class DateColumnEncoder(IntColumnEncoder):
+    """Accumulate nullable dates as int32 days since the epoch"""
+    kind = 'date'
+
+    def append(self, val):
+        if val is None:
+            self._values.append(NULL_DATE)
+        else:
+            self._values.append((val - EPOCH).days)
+
+    def metadata(self):
+        return {'null': NULL_DATE}
+
+
+class StringColumnEncoder(IntColumnEncoder):
+    """Dictionary-encode string values as int32 codes"""
+    kind = 'str'
+
+    def __init__(self):
+        super(StringColumnEncoder, self).__init__()
+        self._codes = {}
+        self._dictionary = []
+
+    def append(self, val):
+        if val is None:
+            val = ""
+
+        try:
+            code = self._codes[val]
+        except KeyError:
+            code = len(self._dictionary)
+            self._codes[val] = code
+            self._dictionary.append(val)
+
+        self._values.append(code)
+
+    def metadata(self):
+        return {'dictionary': self._dictionary}
+
+
+COLUMN_ENCODERS = {
+    'int': IntColumnEncoder,
+    'date': DateColumnEncoder,
+    'str': StringColumnEncoder,
+}
+
+
+def write_table(path, table_name, columns, rows):
+    """
+    Write the columns of a table to a snapshot directory
+
+    Args:
+        path (str): Path to the snapshot directory.
+        table_name (str): Name of the table, used to prefix column files.
+        columns (list): List of ``(column_name, kind)`` tuples, where kind
+            is one of ``'int'``, ``'date'`` or ``'str'``.
+        rows: Iterable of tuples with values in the same order as
+            ``columns``.
+
+    Returns:
+        Dictionary of table metadata to be stored in the manifest.
+
+    """
+    encoders = [COLUMN_ENCODERS[kind]() for name, kind in columns]
+    num_rows = 0
+    for row in rows:
+        for encoder, val in zip(encoders, row):
+            encoder.append(val)
+        num_rows += 1
+
+    column_metadata = {}
+    for (name, kind), encoder in zip(columns, encoders):
+        filename = "{}.{}.npy".format(table_name, name)
+        np.save(os.path.join(path, filename), encoder.to_array())
+        column_metadata[name] = dict(kind=kind, filename=filename,
+            **encoder.metadata())
+
+    return {
+        'num_rows': num_rows,
+        'columns': column_metadata,
+        'column_order': [name for name, kind in columns],
+    }
+
+
+def _write_manifest(path, manifest):
+    with open(os.path.join(path, MANIFEST_FILENAME), 'w') as f:
+        json.dump(manifest, f)
+
+
+def write_categories(path, table_name='conviction', classifier=None):
+    """
+    Classify the rows of a snapshot table into categories
+
+    The category queries are only evaluated once for each distinct
+    combination of the values of ``CATEGORY_FIELDS``.
+
+    Args:
+        path (str): Path to the snapshot directory.
+        table_name (str): Name of the table to classify.  It must include
+            all of ``CATEGORY_FIELDS``.
+        classifier (CategoryClassifier): Classifier to use.  Defaults to
+            one containing all of the category queries.
+
+    Returns:
+        Dictionary of category metadata that was added to the manifest.
+
+    """
+    if classifier is None:
+        classifier = get_classifier()
+
+    snapshot = load_snapshot(path)
+    table = snapshot[table_name]
+
+    if len(table):
+        codes = np.stack([np.asarray(table[f]) for f in CATEGORY_FIELDS],
+            axis=1)
+        distinct_codes, keys = np.unique(codes, axis=0, return_inverse=True)
+    else:
+        distinct_codes = np.zeros((0, len(CATEGORY_FIELDS)), dtype=np.int32)
+        keys = np.zeros(0, dtype=np.int32)
+
+    dictionaries = [table.dictionary(f) for f in CATEGORY_FIELDS]
+    matrix = np.zeros((len(distinct_codes), len(classifier.names)),
+        dtype=np.bool_)
+    for i, row_codes in enumerate(distinct_codes):
+        record = {f: dictionaries[j][code]
+                  for j, (f, code) in enumerate(zip(CATEGORY_FIELDS, row_codes))}
+        mask = classifier.mask(record)
+        for k, name in enumerate(classifier.names):
+            matrix[i, k] = bool(mask & classifier.bit(name))
+
+    keys_filename = "{}.category_key.npy".format(table_name)
+    matrix_filename = "{}.categories.npy".format(table_name)
+    np.save(os.path.join(path, keys_filename),
+        keys.reshape(-1).astype(np.int32))
+    np.save(os.path.join(path, matrix_filename), matrix)
+
+    metadata = {
+        'names': classifier.names,
+        'key_filename': keys_filename,
+        'matrix_filename': matrix_filename,
+    }
+    snapshot.manifest['tables'][table_name]['categories'] = metadata
+    _write_manifest(path, snapshot.manifest)
+
+    return metadata
+
+
+def write_snapshot(path, tables):
+    """
+    Write a snapshot of one or more QuerySets to a directory
+
+    Args:
+        path (str): Path to the snapshot directory.  It will be created if
+            it doesn't exist.
+        tables (list): List of ``(table_name, columns, queryset)`` tuples.
+
+    Returns:
+        The manifest dictionary that was written.
+
+    """
+    if not os.path.exists(path):
+        os.makedirs(path)
+
+    manifest = {
+        'created': datetime.now().isoformat(),
+        'tables': {},
+    }
+    for table_name, columns, qs in tables:
+        rows = qs.values_list(*[name for name, kind in columns]).iterator()
+        manifest['tables'][table_name] = write_table(path, table_name,
+            columns, rows)
+
+    # Write the manifest last, so a partially-written snapshot can't be
+    # loaded
+    _write_manifest(path, manifest)
+
+    return manifest
+
+
+class SnapshotTable(object):
+    """A table in a snapshot, with lazily memory-mapped columns"""
+
+    def __init__(self, path, name, metadata, mmap_mode='r'):
+        self.path = path
+        self.name = name
+        self.metadata = metadata
+        self.mmap_mode = mmap_mode
+        self._columns = {}
+
+    def __len__(self):
+        return self.metadata['num_rows']
+
+    def __getitem__(self, column):
+        """Return the raw (encoded) values of a column"""
+        try:
+            return self._columns[column]
+        except KeyError:
+            filename = self.metadata['columns'][column]['filename']
+            arr = np.load(os.path.join(self.path, filename),
+                mmap_mode=self.mmap_mode)
+            self._columns[column] = arr
+            return arr
+
+    @property
+    def column_names(self):
+        return self.metadata['column_order']
+
+    def dictionary(self, column):
+        """Return the list of distinct values of a string column"""
+        return self.metadata['columns'][column]['dictionary']
+
+    def code(self, column, value):
+        """
+        Return the code for a value in a string column
+
+        Returns -1 if the value doesn't appear in the column, so comparisons
+        against the codes will match no rows.
+        """
+        try:
+            return self.dictionary(column).index(value)
+        except ValueError:
+            return -1
+
+    def decode(self, column):
+        """Return the values of a string column as an array of strings"""
+        dictionary = np.array(self.dictionary(column), dtype=object)
+        return dictionary[self[column]]
+
+    def dates(self, column):
+        """Return the values of a date column as ``datetime64[D]``"""
+        days = np.asarray(self[column])
+        dates = days.astype('datetime64[D]')
+        dates[days == NULL_DATE] = np.datetime64('NaT')
+        return dates
+
+    def equals(self, column, value):
+        """Return a boolean mask of rows where a column equals a value"""
+        if self.metadata['columns'][column]['kind'] == 'str':
+            return self[column] == self.code(column, value)
+
+        if isinstance(value, date):
+            value = (value - EPOCH).days
+
+        return self[column] == value
+
+    def isin(self, column, values):
+        """Return a boolean mask of rows where a column is in values"""
+        if self.metadata['columns'][column]['kind'] == 'str':
+            values = [self.code(column, v) for v in values]
+
+        return np.isin(self[column], values)
+
+    def value_counts(self, column, mask=None):
+        """
+        Count the occurrences of each value of a string column
+
+        Args:
+            column (str): Name of a dictionary-encoded column.
+            mask: Optional boolean array used to select rows.
+
+        Returns:
+            Dictionary mapping values to counts, omitting values that don't
+            appear in the selected rows.
+
+        """
+        codes = self[column]
+        if mask is not None:
+            codes = codes[mask]
+
+        dictionary = self.dictionary(column)
+        counts = np.bincount(codes, minlength=len(dictionary))
+        return {dictionary[i]: int(c) for i, c in enumerate(counts) if c}
+
+
+    def _load_category_array(self, key):
+        filename = self.metadata['categories'][key]
+        return np.load(os.path.join(self.path, filename),
+            mmap_mode=self.mmap_mode)
+
+    @property
+    def category_names(self):
+        return self.metadata['categories']['names']
+
+    def category_mask(self, name):
+        """Return a boolean mask of rows in a category"""
+        k = self.category_names.index(name)
+        matrix = self._load_category_array('matrix_filename')
+        keys = self._load_category_array('key_filename')
+        return np.asarray(matrix[:, k])[keys]
+
+    def category_counts(self, mask=None):
+        """
+        Count the rows in every category
+
+        Args:
+            mask: Optional boolean array used to select rows.
+
+        Returns:
+            Dictionary mapping category names to counts.
+
+        """
+        matrix = self._load_category_array('matrix_filename')
+        keys = self._load_category_array('key_filename')
+        if mask is not None:
+            keys = keys[mask]
+
+        key_counts = np.bincount(keys, minlength=len(matrix))
+        counts = key_counts.dot(np.asarray(matrix, dtype=np.int64))
+        return {name: int(counts[k])
+                for k, name in enumerate(self.category_names)}
+
+
+class Snapshot(object):
+    """A snapshot directory written by ``write_snapshot()``"""
+
+    def __init__(self, path, mmap_mode='r'):
+        self.path = path
+        with open(os.path.join(path, MANIFEST_FILENAME)) as f:
+            self.manifest = json.load(f)
+
+        self.tables = {name: SnapshotTable(path, name, metadata, mmap_mode)
+                       for name, metadata
+                       in self.manifest['tables'].items()}
+
+    def __getitem__(self, table_name):
+        return self.tables[table_name]
+
+
+def load_snapshot(path, mmap_mode='r'):
+    """
+    Load a snapshot, memory-mapping its columns
+
+    Args:
+        path (str): Path to a snapshot directory.
+        mmap_mode (str): Mode passed to ``numpy.load()``.  Use ``None`` to
+            read columns fully into memory.
+
+    Returns:
+        A Snapshot object.
+
+    """
+    return Snapshot(path, mmap_mode=mmap_mode)
@@ -0,0 +1,596 @@
+"""
+Generate synthetic raw disposition records and boundaries
+
+The Clerk of Court extract can't be shared, so benchmarks and load tests
+use records generated here instead.  The values imitate the formats and
+the mess of the real data: ILCS and ILRS statutes, attempted and
+conspiracy charges that pack two statutes into one field, statutes that
+have to be fixed by ``fix_ambiguous_statute()``, abbreviated and
+misspelled cities, "%d-%b-%y" dates and the special sentence codes for
+life and death sentences.
+
+The boundaries are rectangles laid out roughly like Cook County: Chicago,
+divided into community areas and census tracts, surrounded by the suburbs
+that appear in the synthetic records.  Codes and names are made up, so
+they can't be confused with the real data.  ``SyntheticGeocoder`` places
+the synthetic addresses in these boundaries.
+
+"""
+import bisect
+from collections import OrderedDict, namedtuple
+from datetime import date, timedelta
+import json
+import math
+import os
+import random
+
+STATUTES = [
+    # Weight, statute, charge description, charge type, charge class
+    (12, '720-570/402(c)', 'POSS AMT CON SUB EXCEPT(A)/(D)', 'F', '4'),
+    (5, '720-570/402(a)(2)(A)', 'POSS AMT CON SUB EXCEPT(A)/(D)', 'F', '1'),
+    (4, '720-570/401(c)(2)', 'MFG/DEL 1<15 GR COCAINE/ANLG', 'F', '1'),
+    (5, '720-550/4(d)', 'POSS CANNABIS/30-500 GRAMS', 'F', '4'),
+    (6, '720-5/16A-3(a)', 'RETAIL THEFT/DISP MERCH/<$300', 'M', 'A'),
+    (6, '625-5/11-501(a)(2)', 'DUI/0.08', 'M', 'A'),
+    (4, '720-5/19-1', 'BURGLARY', 'F', '2'),
+    (3, '720-5/18-2(a)(4)', 'ARMED ROBBERY/DISCHARGE FIREARM', 'F', 'X'),
+    (2, '430-65/2(A)(1)4', 'NO FOID CARD/ELIGIBLE', 'M', 'A'),
+    (2, '730-150/3', 'SEX OFFENDER FAIL REPORT CHANGE', 'F', '3'),
+    # ILRS statutes, from before the ILCS
+    (2, '38-19-1-A', 'BURGLARY', 'F', '2'),
+    (2, '56.5-704-D', 'POSS CANNABIS 30-500 GRAMS', 'F', '4'),
+    (1, '56.5-1401-C-2', 'MFG/DEL 1<15 GR COCAINE/ANLG', 'F', '1'),
+    (1, '38 9-1E', 'MURDER/INTENT TO KILL/INJURE', 'F', 'M'),
+    # Attempted, conspiracy and solicitation charges
+    (1, '720 5/8-2 (18-2)', 'CONSPIRACY ARMED ROBBERY', 'F', '1'),
+    (1, '38-8-4(38-9-1)', 'ATTEMPT MURDER', 'F', 'X'),
+    (1, '720-8-4(720-5/18-2A)', 'ATTEMPT ARMED ROBBERY', 'F', '1'),
+    (1, '720-5\\8-4(18-3A)', 'ATTEMPT VEHICULAR HIJACKING', 'F', '2'),
+    (1, '720-5\\8-1(32-4A(A)2)', 'SOLICIT HARASS JUROR', 'F', '3'),
+    # Statutes that are fixed by ``fix_ambiguous_statute()``
+    (1, '625 5 11 501 A2', 'DUI/0.08', 'M', 'A'),
+    (1, '720/5.0/16A-3-A', 'RETAIL THEFT/DISP MERCH/<$300', 'M', 'A'),
+    # Statutes that can't be parsed
+    (1, '38-12-4-B(1)', 'AGG BATTERY/GREAT BODILY HARM', 'F', '3'),
+    (1, 'MC 8-4-010', 'DISORDERLY CONDUCT', 'M', 'C'),
+]
+"""Statutes and charges, weighted by how common they are"""
+
+CITY_STATES = [
+    # Weight, city and state, zip code
+    (40, "CHICAGO IL", "606{:02d}"),
+    (8, "CHGO ILL", "606{:02d}"),
+    (5, "CHICAGO,ILL.", "606{:02d}"),
+    (3, "CHICAGO", ""),
+    (1, "CHICAG0 IL", "606{:02d}"),
+    (1, "CHICAGO ILLINOIS", "606{:02d}"),
+    (3, "CICERO IL", "60804"),
+    (3, "EVANSTON ILL.", "60201"),
+    (2, "OAK PARK", "60302"),
+    (2, "CALUMET CITYIL", "60409"),
+    (1, "CNTRY CLB HL IL", "60478"),
+    (2, "CHGO HGTS IL", "60411"),
+    (2, "MELROSE PK", "60160"),
+    (1, "HARVEY", ""),
+    (1, "EAST CHICAGOIN", "46312"),
+    (1, "GARY IN", "46402"),
+    (1, "", ""),
+]
+"""Cities and states in the formats seen in the data, weighted"""
+
+DIRECTIONALS = ['N', 'S', 'E', 'W']
+
+STREET_NAMES = [
+    'MADISON', 'WESTERN', 'PULASKI', 'HALSTED', 'ASHLAND', 'CICERO', '63RD',
+    '79TH', '111TH', 'COTTAGE GROVE', 'LAKE SHORE', 'MARTIN LUTHER KING',
+    'CHICAGO', 'NORTH', 'DIVISION', 'ROOSEVELT', 'KEDZIE', 'CENTRAL PARK',
+]
+
+STREET_TYPES = ['ST', 'AVE', 'BLVD', 'DR', 'RD', '']
+
+OCCUPANCIES = ['APT 2', 'APT 3F', '#1', 'UNIT 4', 'REAR', 'BSMT', '1ST FL']
+
+CHARGE_DISPOSITIONS = [
+    'Plea Of Guilty', 'Finding Guilty', 'Verdict Guilty',
+    'Plea of Guilty - Amended Charge', 'Finding Guilty - Lesser Included',
+]
+
+LIFE_SENTENCE = "88888888"
+DEATH_SENTENCE = "99999999"
+
+FIRST_DATE = date(2005, 1, 1)
+LAST_DATE = date(2009, 12, 31)
+
+
+def format_date(d):
+    """Format a date like the raw data, for example "13-Jan-06" """
+    if d is None:
+        return ""
+
+    return "{}-{}".format(d.day, d.strftime("%b-%y"))
+
+
+def format_sentence(years=0, months=0, days=0):
+    """Format a sentence like the raw data, for example "200000" for 2 years"""
+    return str(int("{:03d}{:02d}{:03d}".format(years, months, days)))
+
+
+class RawDispositionGenerator(object):
+    """
+    Generate synthetic raw disposition records
+
+    Records are generated by case.  Each case has one or more charges, with
+    a disposition record for each one.
+
+    Args:
+        seed: Seed for the random number generator, so the same records
+            are generated each time.
+
+    """
+
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+        self._case_count = 0
+
+    def _weighted_choice(self, choices):
+        """Pick from a list of tuples whose first item is the weight"""
+        cumulative_weights = []
+        total = 0
+        for choice in choices:
+            total += choice[0]
+            cumulative_weights.append(total)
+
+        i = bisect.bisect_right(cumulative_weights,
+            self.random.random() * total)
+        return choices[i][1:]
+
+    def _digits(self, n):
+        return "".join(self.random.choice("0123456789") for i in range(n))
+
+    def _date_between(self, start, end):
+        return start + timedelta(days=self.random.randint(0,
+            max((end - start).days, 0)))
+
+    def address(self):
+        if self.random.random() < 0.02:
+            return ""
+
+        bits = [str(self.random.randint(1, 13000)),
+                self.random.choice(DIRECTIONALS),
+                self.random.choice(STREET_NAMES)]
+        street_type = self.random.choice(STREET_TYPES)
+        if street_type:
+            bits.append(street_type)
+        if self.random.random() < 0.1:
+            bits.append(self.random.choice(OCCUPANCIES))
+
+        return " ".join(bits)
+
+    def city_state_zipcode(self):
+        city_state, zipcode = self._weighted_choice(CITY_STATES)
+        if "{" in zipcode:
+            zipcode = zipcode.format(self.random.randint(1, 60))
+        if zipcode and self.random.random() < 0.02:
+            # Zip+4 and other bad values
+            zipcode += "-" + self._digits(4)
+
+        return city_state, zipcode
+
+    def sentence(self, chrgtype):
+        r = self.random.random()
+        if r < 0.002:
+            return LIFE_SENTENCE
+        if r < 0.0025:
+            return DEATH_SENTENCE
+        if chrgtype == 'M':
+            return format_sentence(months=self.random.choice([0, 0, 6, 12]),
+                days=self.random.choice([0, 0, 10, 30]))
+
+        return format_sentence(years=self.random.choice([0, 1, 2, 3, 4, 6, 10]),
+            months=self.random.choice([0, 0, 0, 6]))
+
+    def case_records(self):
+        """Generate the records for a single case"""
+        self._case_count += 1
+        initial_date = self._date_between(FIRST_DATE, LAST_DATE)
+        case_number = "{:02d}CR{:07d}".format(initial_date.year % 100,
+                                               self._case_count)
+        arrest_date = initial_date - timedelta(
+            days=self.random.randint(0, 60))
+        dob = None
+        if self.random.random() > 0.01:
+            dob = self._date_between(date(1940, 1, 1), date(1991, 12, 31))
+        city_state, zipcode = self.city_state_zipcode()
+        defendant = {
+            'st_address': self.address(),
+            'city_state': city_state,
+            'zipcode': zipcode,
+            'ctlbkngno': self._digits(8),
+            'fgrprntno': self._digits(7),
+            'statepoliceid': "IR" + self._digits(7),
+            'fbiidno': self._digits(9),
+            'dob': format_date(dob),
+            'arrest_date': format_date(arrest_date),
+            'initial_date': format_date(initial_date),
+            'sex': self.random.choice(["Male"] * 8 + ["Female"] * 2),
+        }
+
+        num_charges = self.random.choice([1, 1, 1, 2, 2, 3])
+        for i in range(num_charges):
+            statute, chrgdesc, chrgtype, chrgclass = \
+                self._weighted_choice(STATUTES)
+            chrgdispdate = self._date_between(initial_date,
+                min(initial_date + timedelta(days=400), LAST_DATE))
+            # The minimum and maximum sentences are almost always the same
+            sentence = self.sentence(chrgtype)
+            record = dict(defendant,
+                case_number=case_number,
+                sequence_number=str(i + 1),
+                statute=statute,
+                chrgdesc=chrgdesc,
+                chrgtype=chrgtype,
+                chrgtype2="Felony" if chrgtype == 'F' else "Misdemeanor",
+                chrgclass=chrgclass,
+                chrgdisp=self.random.choice(CHARGE_DISPOSITIONS),
+                chrgdispdate=format_date(chrgdispdate),
+                ammndchargstatute="",
+                ammndchrgdescr="",
+                ammndchrgtype="",
+                ammndchrgclass="",
+                minsent=sentence,
+                maxsent=sentence,
+                amtoffine=self.random.choice(["", "", "0", "100", "500"]),
+            )
+            if self.random.random() < 0.1:
+                # Amended to a different charge
+                statute, chrgdesc, chrgtype, chrgclass = \
+                    self._weighted_choice(STATUTES)
+                record.update(ammndchargstatute=statute,
+                    ammndchrgdescr=chrgdesc, ammndchrgtype=chrgtype,
+                    ammndchrgclass=chrgclass)
+
+            yield record
+
+    def records(self, count):
+        """
+        Generate raw disposition records
+
+        Args:
+            count (int): Number of records to generate.
+
+        Yields:
+            Dictionaries keyed by ``RawDisposition`` field names.
+
+        """
+        num_records = 0
+        while num_records < count:
+            for record in self.case_records():
+                if num_records >= count:
+                    return
+
+                yield record
+                num_records += 1
+
+
+COOK_COUNTY_EXTENT = (-88.27, 41.46, -87.52, 42.16)
+"""Extent of the synthetic Cook County, as (west, south, east, north)"""
+
+DUPAGE_COUNTY_EXTENT = (-88.60, 41.68, -88.27, 42.00)
+
+CHICAGO_EXTENT = (-87.94, 41.64, -87.52, 42.02)
+
+COMMUNITY_AREA_GRID = (7, 11)
+"""Columns and rows of community areas.  Chicago has 77 of them."""
+
+TRACT_GRID = (2, 2)
+"""Columns and rows of census tracts in each community area"""
+
+SUBURBS = [
+    # Name, legal/statistical area description, extent
+    ("Evanston", "city", (-87.74, 42.02, -87.66, 42.07)),
+    ("Oak Park", "village", (-88.00, 41.86, -87.95, 41.91)),
+    ("Cicero", "town", (-88.00, 41.80, -87.95, 41.85)),
+    ("Melrose Park", "village", (-88.06, 41.88, -88.01, 41.93)),
+    ("Harvey", "city", (-87.69, 41.58, -87.63, 41.63)),
+    ("Calumet City", "city", (-87.60, 41.58, -87.53, 41.63)),
+    ("Country Club Hills", "city", (-87.76, 41.54, -87.70, 41.59)),
+    ("Chicago Heights", "city", (-87.68, 41.48, -87.60, 41.54)),
+]
+"""Suburbs that appear in ``CITY_STATES``"""
+
+ZIP_CODE_PLACES = [
+    # Zip code prefix, place name
+    ("606", "Chicago"),
+    ("60201", "Evanston"),
+    ("60302", "Oak Park"),
+    ("60804", "Cicero"),
+    ("60160", "Melrose Park"),
+    ("60409", "Calumet City"),
+    ("60478", "Country Club Hills"),
+    ("60411", "Chicago Heights"),
+]
+"""Places of the zip codes in ``CITY_STATES``"""
+
+OUTSIDE_EXTENT = (-87.52, 41.55, -87.30, 41.65)
+"""Where addresses outside the synthetic places are geocoded, in Indiana"""
+
+LSAD_CODES = {
+    'city': '25',
+    'town': '43',
+    'village': '47',
+}
+
+FEET_PER_DEGREE = 364000.0
+"""Approximate length of a degree of latitude, in feet"""
+
+
+def split_extent(extent, columns, rows):
+    """
+    Divide an extent into a grid
+
+    Yields:
+        Extents of the cells, row by row, starting in the north-west.
+
+    """
+    west, south, east, north = extent
+    width = (east - west) / columns
+    height = (north - south) / rows
+    for row in range(rows):
+        for column in range(columns):
+            yield (west + column * width, north - (row + 1) * height,
+                   west + (column + 1) * width, north - row * height)
+
+
+def extent_area_length(extent):
+    """Return the approximate area and perimeter of an extent, in feet"""
+    west, south, east, north = extent
+    feet_per_degree_lon = FEET_PER_DEGREE * math.cos(
+        math.radians((south + north) / 2))
+    width = (east - west) * feet_per_degree_lon
+    height = (north - south) * FEET_PER_DEGREE
+    return width * height, 2 * (width + height)
+
+
+def extent_feature(extent, properties):
+    """Return a GeoJSON feature with a rectangular multipolygon"""
+    west, south, east, north = extent
+    ring = [[west, south], [east, south], [east, north], [west, north],
+            [west, south]]
+    return {
+        'type': 'Feature',
+        'properties': properties,
+        'geometry': {
+            'type': 'MultiPolygon',
+            'coordinates': [[ring]],
+        },
+    }
+
+
+def census_properties(extent):
+    """Return the land area and internal point properties of a census layer"""
+    west, south, east, north = extent
+    area, length = extent_area_length(extent)
+    return {
+        # Square meters
+        'ALAND10': round(area * 0.3048 * 0.3048),
+        'AWATER10': 0,
+        'INTPTLAT10': "{:+.7f}".format((south + north) / 2),
+        'INTPTLON10': "{:+012.7f}".format((west + east) / 2),
+    }
+
+
+def place_extents():
+    """
+    Return the names, descriptions and extents of the places
+
+    Returns:
+        List of ``(name, description, extent)`` tuples, starting with
+        Chicago.
+
+    """
+    return [("Chicago", "city", CHICAGO_EXTENT)] + SUBURBS
+
+
+def community_area_features():
+    features = []
+    extents = split_extent(CHICAGO_EXTENT, *COMMUNITY_AREA_GRID)
+    for number, extent in enumerate(extents, start=1):
+        area, length = extent_area_length(extent)
+        features.append(extent_feature(extent, {
+            'AREA_NUMBE': number,
+            'COMMUNITY': "COMMUNITY AREA {}".format(number),
+            'SHAPE_AREA': area,
+            'SHAPE_LEN': length,
+        }))
+
+    return features
+
+
+def census_tract_features():
+    features = []
+    extents = split_extent(CHICAGO_EXTENT, *COMMUNITY_AREA_GRID)
+    for number, area_extent in enumerate(extents, start=1):
+        tract_extents = split_extent(area_extent, *TRACT_GRID)
+        for i, extent in enumerate(tract_extents, start=1):
+            tractce = "{:02d}{:02d}00".format(number, i)
+            features.append(extent_feature(extent, {
+                'STATEFP10': "17",
+                'COUNTYFP10': "031",
+                'TRACTCE10': tractce,
+                'GEOID10': "17031" + tractce,
+                'NAME10': str(int(tractce) // 100),
+                'COMMAREA_N': number,
+                'NOTES': "",
+            }))
+
+    return features
+
+
+def census_place_features():
+    features = []
+    for i, (name, description, extent) in enumerate(place_extents()):
+        placefp = "{:05d}".format(90000 + i)
+        properties = {
+            'STATEFP10': "17",
+            'PLACEFP10': placefp,
+            'PLACENS10': "{:08d}".format(99000000 + i),
+            'GEOID10': "17" + placefp,
+            'NAME10': name,
+            'NAMELSAD10': "{} {}".format(name, description),
+            'LSAD10': LSAD_CODES[description],
+            'CLASSFP10': "C1",
+            'PCICBSA10': "Y" if name == "Chicago" else "N",
+            'PCINECTA10': "N",
+            'MTFCC10': "G4110",
+            'FUNCSTAT10': "A",
+        }
+        properties.update(census_properties(extent))
+        features.append(extent_feature(extent, properties))
+
+    return features
+
+
+def municipality_features():
+    features = []
+    for i, (name, description, extent) in enumerate(place_extents(),
+            start=1):
+        area, length = extent_area_length(extent)
+        features.append(extent_feature(extent, {
+            'AGENCY': i,
+            'AGENCY_DES': "{} OF {}".format(description, name).upper(),
+            'MUNICIPALI': name,
+            'ST_AREA_SH': area,
+            'SDELENGTH_': length,
+            'SHAPE_area': area,
+            'SHAPE_len': length,
+        }))
+
+    return features
+
+
+def county_features():
+    features = []
+    counties = [
+        ("031", "Cook", COOK_COUNTY_EXTENT),
+        ("043", "DuPage", DUPAGE_COUNTY_EXTENT),
+    ]
+    for i, (countyfp, name, extent) in enumerate(counties):
+        properties = {
+            'STATEFP10': "17",
+            'COUNTYFP10': countyfp,
+            'COUNTYNS10': "{:08d}".format(99900000 + i),
+            'GEOID10': "17" + countyfp,
+            'NAME10': name,
+            'NAMELSAD10': "{} County".format(name),
+            'LSAD10': "06",
+            'CLASSFP10': "H1",
+            'MTFCC10': "G4020",
+            'CSAFP10': "176",
+            'CBSAFP10': "16980",
+            'METDIVFP10': "16974",
+            'FUNCSTAT10': "A",
+        }
+        properties.update(census_properties(extent))
+        features.append(extent_feature(extent, properties))
+
+    return features
+
+
+BOUNDARY_LAYERS = OrderedDict([
+    # Model name, file name, function returning the features
+    ('CommunityArea', ('community_areas.geojson', community_area_features)),
+    ('Municipality', ('municipalities.geojson', municipality_features)),
+    ('CensusTract', ('census_tracts.geojson', census_tract_features)),
+    ('CensusPlace', ('census_places.geojson', census_place_features)),
+    ('County', ('counties.geojson', county_features)),
+])
+"""Boundary layers, in the order they should be loaded"""
+
+CHICAGO_MSA_FILENAME = 'chicago_msa_places.csv'
+
+
+def write_boundaries(directory):
+    """
+    Write the synthetic boundaries to files that can be loaded with the
+    ``load_spatial_data`` and ``flag_chicago_msa_places`` commands
+
+    Args:
+        directory (str): Directory for the files.  It's created if it
+            doesn't exist.
+
+    Returns:
+        Ordered dictionary of the GeoJSON file paths, keyed by model name.
+        The path of the CSV file of places in the Chicago MSA is keyed by
+        ``CHICAGO_MSA_FILENAME``.
+
+    """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    paths = OrderedDict()
+    for model_name, (filename, get_features) in BOUNDARY_LAYERS.items():
+        path = os.path.join(directory, filename)
+        with open(path, 'w') as f:
+            json.dump({
+                'type': 'FeatureCollection',
+                'features': get_features(),
+            }, f)
+        paths[model_name] = path
+
+    # All the synthetic places are in the Chicago MSA
+    path = os.path.join(directory, CHICAGO_MSA_FILENAME)
+    with open(path, 'w') as f:
+        f.write("GEOID10,NAME10\n")
+        for feature in census_place_features():
+            f.write("{GEOID10},{NAME10}\n".format(**feature['properties']))
+    paths[CHICAGO_MSA_FILENAME] = path
+
+    return paths
+
+
+SyntheticLocation = namedtuple('SyntheticLocation',
+    ['address', 'latitude', 'longitude'])
+
+
+class SyntheticGeocoder(object):
+    """
+    Geocode synthetic addresses to points in the synthetic boundaries
+
+    This has the same ``batch_geocode()`` method as
+    ``convictions_data.geocoders.BatchOpenMapQuest``, so the whole pipeline
+    can run on synthetic records without using the geocoding service.
+    Addresses are placed at a random point in the place of their zip code,
+    or their city, chosen with the address as the seed so that an address
+    is always geocoded to the same point.
+
+    """
+
+    def batch_geocode(self, queries, exactly_one=True, timeout=None):
+        return [self.geocode(q) for q in queries]
+
+    def geocode(self, query):
+        west, south, east, north = self.get_extent(query)
+        rand = random.Random(query)
+        return SyntheticLocation(query, rand.uniform(south, north),
+            rand.uniform(west, east))
+
+    def get_extent(self, query):
+        """Return the extent of the place of an address"""
+        # Addresses are formatted by ``Disposition.geocoder_address`` as
+        # "street,zipcode" or "street,city,state"
+        bits = query.upper().split(",")
+        place_name = None
+        if len(bits) == 2:
+            zipcode = bits[1].strip()
+            for prefix, name in ZIP_CODE_PLACES:
+                if zipcode.startswith(prefix):
+                    place_name = name
+                    break
+        elif len(bits) > 2:
+            place_name = bits[-2].strip()
+
+        for name, description, extent in place_extents():
+            if place_name and name.upper() == place_name.upper():
+                return extent
+
+        return OUTSIDE_EXTENT
@@ -1,15 +1,44 @@
+from collections import OrderedDict
+import csv
 import datetime
+import gzip
+from io import StringIO
+import json
 from mock import patch
+import os
+import shutil
+import sqlite3
+import tempfile
 import unittest
 
 from django.conf import settings
+from django.contrib.gis.geos import MultiPolygon, Polygon
+from django.core.management import call_command
 from django.test import SimpleTestCase, TestCase, TransactionTestCase
 
 from convictions_data import statute
 from convictions_data.address import AddressAnonymizer
+from convictions_data.benchmarks import BENCHMARKS, run_benchmarks
 from convictions_data.cleaner import CityStateCleaner, CityStateSplitter
+from convictions_data.explain import check_workload, get_workload, plan_indexes
 from convictions_data.geocoders import BatchOpenMapQuest
-from convictions_data.models import Disposition, RawDisposition
+from convictions_data.models import (AnonymizedAddress, CommunityArea,
+    Conviction, Disposition, GeographyConvictionStats, PipelineStage,
+    RawDisposition, SimplifiedGeometry)
+from convictions_data.pipeline import Pipeline, PipelineError, Stage
+from convictions_data.profiling import normalize_sql
+from convictions_data.query import AnonymizedAddressQuerySet
+from convictions_data.query.age import calculate_age
+from convictions_data.query.categories import (CATEGORY_FLAG_QUERIES,
+    CategoryClassifier)
+from convictions_data.query.drugs import get_drug_queries
+from convictions_data.snapshot import load_snapshot, write_snapshot
+from convictions_data.synthetic import (BOUNDARY_LAYERS, CHICAGO_EXTENT,
+    CITY_STATES, COOK_COUNTY_EXTENT, OUTSIDE_EXTENT, RawDispositionGenerator,
+    SyntheticGeocoder, format_date, format_sentence, write_boundaries)
+from convictions_data.topojson import decode_arc, topology
+from convictions_data.vectortile import (MBTilesWriter, TileRenderer,
+    encode_polygon_geometry, tile_bounds, tiles_for_extent)
 
 try:
     from django.test.runner import DiscoverRunner as BaseRunner
@@ -223,6 +252,255 @@ class DispositionGeocodingTestCase(TestCase):
         self.assertAlmostEqual(disposition.lat, 41.931631, places=1)
         self.assertAlmostEqual(disposition.lon, -87.726857, places=1)
 
+    def test_geocode_ungeocoded_pages(self):
+        RawDisposition.objects.bulk_create([RawDisposition(**r) for r in
+            RawDispositionGenerator().records(50)])
+        Disposition.objects.bulk_create([Disposition(raw_disposition=raw)
+            for raw in RawDisposition.objects.all()])
+        qs = Disposition.objects.has_geocodable_address().ungeocoded()
+        num_geocodable = qs.count()
+        self.assertTrue(num_geocodable > 10)
+
+        # Geocoded records drop out of the queryset as each page is saved,
+        # but none are skipped
+        qs.geocode(batch_size=5, geocoder=SyntheticGeocoder())
+        self.assertEqual(qs.count(), 0)
+        self.assertEqual(Disposition.objects.geocoded().count(),
+            num_geocodable)
+
+class ExportPublicDataTestCase(TestCase):
+    def setUp(self):
+        initial_dates = [
+            datetime.date(2004, 12, 1),
+            datetime.date(2005, 3, 1),
+            datetime.date(2006, 7, 4),
+            datetime.date(2007, 1, 2),
+            None,
+        ]
+        for i, initial_date in enumerate(initial_dates):
+            for sequence_number in ("1", "2"):
+                raw = RawDisposition.objects.create(
+                    case_number="0{}CR00000{}".format(i, i),
+                    sequence_number=sequence_number,
+                    st_address="707 W WAVELAND",
+                    city_state="CHGO ILL",
+                    zipcode="60622",
+                )
+                disposition = Disposition(raw_disposition=raw)
+                disposition.initial_date = initial_date
+                disposition.save()
+
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _read_partitions(self):
+        with open(os.path.join(self.tmpdir, 'manifest.json')) as f:
+            manifest = json.load(f)
+
+        rows = []
+        for file_info in manifest['files']:
+            with gzip.open(os.path.join(self.tmpdir, file_info['filename']),
+                    'rt') as f:
+                file_rows = list(csv.DictReader(f))
+            self.assertEqual(len(file_rows), file_info['rows'])
+            rows.extend(file_rows)
+
+        return manifest, rows
+
+    def test_stream_values(self):
+        qs = Disposition.objects.order_by('case_number', 'sequence_number')
+        fields = ['case_number', 'sequence_number', 'initial_date']
+        self.assertEqual(list(qs.stream_values(fields, chunk_size=3)),
+            list(qs.values(*fields)))
+
+    def test_anonymize_addresses(self):
+        self.assertEqual(Disposition.objects.all().anonymize_addresses(), 1)
+        self.assertEqual(AnonymizedAddress.objects.get().anonymized,
+            "700 W WAVELAND")
+        # Only new addresses are anonymized
+        self.assertEqual(Disposition.objects.all().anonymize_addresses(), 0)
+
+        # Exports use the stored anonymized addresses
+        AnonymizedAddress.objects.update(anonymized="STORED")
+        with patch.object(AddressAnonymizer, 'anonymize') as anonymize:
+            rows = list(Disposition.objects.all().anonymized_values())
+        self.assertFalse(anonymize.called)
+        self.assertEqual(set(d['st_address'] for d in rows), set(["STORED"]))
+
+    def test_anonymized_values_closed_early(self):
+        """
+        Test that addresses stored for an export are kept when the export
+        stops before reading every row
+        """
+        rows = Disposition.objects.all().anonymized_values()
+        self.assertEqual(next(rows)['st_address'], "700 W WAVELAND")
+        rows.close()
+        self.assertEqual(AnonymizedAddress.objects.get().anonymized,
+            "700 W WAVELAND")
+
+    def test_store_anonymized_addresses(self):
+        AnonymizedAddress.objects.create(address="707 W WAVELAND",
+            anonymized="STORED")
+        AnonymizedAddress.objects.store({
+            "707 W WAVELAND": "700 W WAVELAND",
+            "1060 W ADDISON": "1000 W ADDISON",
+        })
+        self.assertEqual(dict(AnonymizedAddress.objects.values_list(
+            'address', 'anonymized')), {
+            "707 W WAVELAND": "STORED",
+            "1060 W ADDISON": "1000 W ADDISON",
+        })
+
+        # Addresses stored by another process between the lookup and the
+        # insert don't keep the others from being stored
+        lookup = AnonymizedAddress.objects.lookup
+        with patch.object(AnonymizedAddressQuerySet, 'lookup',
+                side_effect=[{}, lookup(["1060 W ADDISON"])]):
+            AnonymizedAddress.objects.store({
+                "1060 W ADDISON": "1000 W ADDISON",
+                "3600 N CLARK": "3600 N CLARK",
+            })
+        self.assertEqual(AnonymizedAddress.objects.count(), 3)
+
+    def test_year_partitions(self):
+        call_command('export_public_data', output_dir=self.tmpdir,
+            processes=1)
+        manifest, rows = self._read_partitions()
+        self.assertEqual([f['partition'] for f in manifest['files']],
+            ['2005', '2006', '2007', 'unknown_year'])
+        self.assertEqual([f['rows'] for f in manifest['files']],
+            [4, 2, 2, 2])
+        self.assertEqual(manifest['rows'], 10)
+        self.assertEqual(rows[0]['st_address'], "700 W WAVELAND")
+
+    def test_case_partitions(self):
+        """
+        Test that case number partitions, in order, match the single file
+        export
+        """
+        call_command('export_public_data', output_dir=self.tmpdir,
+            partition='case', shards=3, processes=1)
+        manifest, rows = self._read_partitions()
+        self.assertEqual(len(manifest['files']), 3)
+
+        expected = [dict((k, "" if v is None else str(v))
+                         for k, v in d.items())
+                    for d in Disposition.objects.order_by('case_number',
+                        'sequence_number').anonymized_values()]
+        self.assertEqual(rows, expected)
+
+
+class ProfilingTestCase(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_normalize_sql(self):
+        self.assertEqual(normalize_sql(
+            "SELECT * FROM t WHERE id = 12 AND name = 'O''BRIEN' AND x = 1.5"),
+            "SELECT * FROM t WHERE id = ? AND name = ? AND x = ?")
+
+    def test_profile_option(self):
+        for i in range(3):
+            Conviction.objects.create(case_number="0{}CR0000{}".format(i, i))
+
+        path = os.path.join(self.tmpdir, 'profile.json')
+        stderr = StringIO()
+        call_command('categorize_convictions', profile=True,
+            profile_output=path, stdout=StringIO(), stderr=stderr)
+        with open(path) as f:
+            report = json.load(f)
+
+        self.assertEqual(report['command'], 'categorize_convictions')
+        self.assertTrue(report['num_queries'] > 0)
+        self.assertEqual(len(report['slowest_queries']),
+            min(report['num_queries'], 10))
+        self.assertTrue(report['peak_rss_bytes'] > 0)
+        self.assertIn("Wrote profile to", stderr.getvalue())
+
+
+class DispositionPivotTestCase(TestCase):
+    def setUp(self):
+        # Tuples of case number, initial date, initial class and final class
+        dispositions = [
+            ("05CR1", datetime.date(2005, 2, 1), '4', '4'),
+            ("05CR1", datetime.date(2005, 2, 1), '4', '3'),
+            ("05CR2", datetime.date(2005, 12, 31), 'A', '4'),
+            ("06CR1", datetime.date(2006, 1, 1), '2', '2'),
+            ("06CR1", datetime.date(2006, 1, 1), '2', '2'),
+            ("07CR1", datetime.date(2007, 6, 1), 'X', 'M'),
+            ("07CR2", None, 'X', 'X'),
+        ]
+        for i, (case_number, initial_date, chrgclass, final_chrgclass) in \
+                enumerate(dispositions):
+            raw = RawDisposition.objects.create(case_number=case_number,
+                sequence_number=str(i))
+            disposition = Disposition(raw_disposition=raw)
+            disposition.initial_date = initial_date
+            disposition.chrgclass = chrgclass
+            disposition.final_chrgclass = final_chrgclass
+            disposition.save()
+
+    def test_pivot(self):
+        """
+        Test that the pivot table matches counting cases for each cell
+        separately
+        """
+        years = [2005, 2006, 2007]
+        classes = ['4', '3', '2', 'X', 'M']
+        with self.assertNumQueries(1):
+            counts = Disposition.objects.all().pivot('initial_date__year',
+                'final_chrgclass', years, classes)
+
+        expected = [[Disposition.objects.all().initial_date_in_year(yr)
+                     .filter(final_chrgclass=cc).num_cases()
+                     for cc in classes]
+                    for yr in years]
+        self.assertEqual(counts, expected)
+        self.assertEqual(counts[0], [2, 1, 0, 0, 0])
+
+    def test_distinct_counts(self):
+        counts = Disposition.objects.all().distinct_counts('chrgclass')
+        self.assertEqual(counts, {('4',): 1, ('A',): 1, ('2',): 1, ('X',): 2})
+        counts = Disposition.objects.all().distinct_counts('chrgclass',
+            'final_chrgclass', measure='id')
+        self.assertEqual(counts[('2', '2')], 2)
+
+
+class ExplainTestCase(TestCase):
+    def test_plan_indexes(self):
+        plan = [
+            "Nested Loop  (cost=0.56..16.61 rows=1 width=4)",
+            "  ->  Index Scan using convictions_data_disposition_in_analysis on convictions_data_disposition",
+            "  ->  Bitmap Index Scan on \"convictions_data_disposition_5ac3b4b2\"",
+            "  ->  Index Only Scan using convictions_data_disposition_in_analysis on convictions_data_disposition d2",
+        ]
+        self.assertEqual(plan_indexes(plan), [
+            'convictions_data_disposition_in_analysis',
+            'convictions_data_disposition_5ac3b4b2',
+        ])
+        plan = ["SEARCH TABLE convictions_data_conviction USING INDEX "
+                "convictions_data_conviction_8a2b6c1d (community_area_id=? "
+                "AND iucr_category=?)"]
+        self.assertEqual(plan_indexes(plan),
+            ['convictions_data_conviction_8a2b6c1d'])
+
+    def test_check_workload(self):
+        """Test that every query in the workload can be explained"""
+        results = check_workload()
+        self.assertEqual(list(results.keys()),
+            [query.name for query in get_workload()])
+        for result in results.values():
+            self.assertTrue(result['plan'])
+
+        results = check_workload(['class_change'])
+        self.assertEqual(list(results.keys()), ['class_change'])
+
+
 class CityStateSplitterTestCase(SimpleTestCase):
     def test_split_city_state(self):
         test_values = [
@@ -260,6 +538,214 @@ class CityStateCleanerTestCase(SimpleTestCase):
             self.assertEqual(clean_state, expected_state)
 
 
+class SyntheticDataTestCase(SimpleTestCase):
+    def test_records(self):
+        records = list(RawDispositionGenerator(seed=1).records(200))
+        self.assertEqual(len(records), 200)
+        self.assertEqual(records,
+            list(RawDispositionGenerator(seed=1).records(200)))
+
+        for record in records:
+            for field in ('dob', 'arrest_date', 'initial_date',
+                    'chrgdispdate'):
+                # Dates are in the same format as the raw data
+                Disposition._parse_date(record[field])
+            Disposition._parse_sentence(record['minsent'])
+
+        case_numbers = [r['case_number'] for r in records]
+        self.assertTrue(len(set(case_numbers)) < len(case_numbers))
+
+    def test_format(self):
+        self.assertEqual(format_date(datetime.date(2006, 1, 4)), "4-Jan-06")
+        self.assertEqual(format_sentence(years=2), "200000")
+        self.assertEqual(format_sentence(months=6, days=10), "6010")
+        self.assertEqual(Disposition._parse_sentence(format_sentence(57)),
+            (57, 0, 0, False, False))
+
+    def test_write_boundaries(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            paths = write_boundaries(tmpdir)
+            self.assertEqual(list(paths.keys())[:-1],
+                list(BOUNDARY_LAYERS.keys()))
+
+            layers = {}
+            for model_name in BOUNDARY_LAYERS:
+                with open(paths[model_name]) as f:
+                    layers[model_name] = json.load(f)['features']
+        finally:
+            shutil.rmtree(tmpdir)
+
+        self.assertEqual(len(layers['CommunityArea']), 77)
+        self.assertEqual(len(layers['CensusTract']), 77 * 4)
+        cook = Polygon.from_bbox(COOK_COUNTY_EXTENT)
+        for feature in layers['CensusPlace']:
+            boundary = MultiPolygon(*[Polygon(*rings) for rings in
+                feature['geometry']['coordinates']])
+            self.assertTrue(boundary.within(cook))
+
+        # The places match the cities in the records
+        place_names = set(f['properties']['NAME10'].upper()
+                          for f in layers['CensusPlace'])
+        cities = set()
+        for weight, city_state, zipcode in CITY_STATES:
+            if not city_state:
+                continue
+            city, state = CityStateCleaner.clean_city_state(
+                *CityStateSplitter.split_city_state(city_state))
+            if state in ("IL", ""):
+                cities.add(city)
+        # Except for misspellings that the cleaner doesn't fix
+        self.assertEqual(cities - place_names, set(["CHICAG0"]))
+
+
+class GenerateSyntheticDataTestCase(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_generate_synthetic_data(self):
+        csv_filename = os.path.join(self.tmpdir, 'dispositions.csv')
+        call_command('generate_synthetic_data', csv_filename, records=50,
+            boundaries_dir=self.tmpdir, stdout=StringIO())
+
+        call_command('load_dispositions_csv', csv_filename)
+        self.assertEqual(RawDisposition.objects.count(), 50)
+        self.assertTrue(os.path.exists(os.path.join(self.tmpdir,
+            'community_areas.geojson')))
+
+
+class BenchmarksTestCase(TestCase):
+    def test_run_benchmarks(self):
+        results = run_benchmarks(num_records=20, repeat=2)
+        self.assertEqual(list(results.keys()), list(BENCHMARKS.keys()))
+        for result in results.values():
+            self.assertTrue(result['items'] > 0)
+            self.assertTrue(result['best'] <= result['median'])
+
+        results = run_benchmarks(['parse_sentence'], num_records=20,
+            repeat=1)
+        self.assertEqual(results['parse_sentence']['items'], 40)
+
+
+class SyntheticGeocoderTestCase(SimpleTestCase):
+    def assertInExtent(self, location, extent):
+        west, south, east, north = extent
+        self.assertTrue(west <= location.longitude <= east)
+        self.assertTrue(south <= location.latitude <= north)
+
+    def test_batch_geocode(self):
+        geocoder = SyntheticGeocoder()
+        queries = ["1600 W MADISON ST,60612", "10 E 63RD,60612-1234",
+                   "12 N MAIN,HARVEY,IL", "1 W 5TH AVE,46402"]
+        locations = geocoder.batch_geocode(queries)
+        self.assertInExtent(locations[0], CHICAGO_EXTENT)
+        self.assertInExtent(locations[1], CHICAGO_EXTENT)
+        self.assertInExtent(locations[2], COOK_COUNTY_EXTENT)
+        self.assertInExtent(locations[3], OUTSIDE_EXTENT)
+        self.assertEqual(locations, geocoder.batch_geocode(queries))
+
+
+class PipelineTestCase(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.pipeline = Pipeline([
+            Stage('create_dispositions', 'create_dispositions',
+                options={'delete': True}, count=Disposition.objects.count),
+            Stage('create_convictions', 'create_convictions',
+                options={'delete': True}),
+        ], self.tmpdir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_select(self):
+        self.assertEqual([s.name for s in self.pipeline.select()],
+            ['create_dispositions', 'create_convictions'])
+        self.assertEqual([s.name for s in
+            self.pipeline.select(skip=['create_dispositions'])],
+            ['create_convictions'])
+        self.assertRaises(PipelineError, self.pipeline.select, ['geocode'])
+
+    def test_run_bench(self):
+        RawDisposition.objects.bulk_create([RawDisposition(**r) for r in
+            RawDispositionGenerator().records(10)])
+        results = self.pipeline.run(bench=True)
+        self.assertEqual(list(results.keys()),
+            ['create_dispositions', 'create_convictions'])
+        result = results['create_dispositions']
+        self.assertEqual(result['rows'], 10)
+        self.assertTrue(result['num_queries'] > 0)
+        self.assertTrue(result['peak_rss_bytes'] > 0)
+        self.assertIsNone(results['create_convictions']['rows'])
+        self.assertTrue(os.path.exists(os.path.join(self.tmpdir,
+            'create_dispositions.log')))
+
+    def test_create_convictions_categorizes(self):
+        RawDisposition.objects.bulk_create([RawDisposition(**r) for r in
+            RawDispositionGenerator().records(100)])
+        call_command('create_dispositions', delete=True)
+
+        call_command('create_convictions', delete=True, categorize=False)
+        qs = Conviction.objects.all()
+        self.assertTrue(qs.exists())
+        self.assertFalse(qs.drug_categories_stored())
+
+        call_command('create_convictions', delete=True)
+        self.assertTrue(qs.drug_categories_stored())
+        for flag, q in CATEGORY_FLAG_QUERIES.items():
+            self.assertEqual(qs.filter(**{flag: True}).count(),
+                qs.filter(q).count())
+
+    def test_missing_input(self):
+        stage = Stage('load_dispositions_csv', 'load_dispositions_csv',
+            inputs=[os.path.join(self.tmpdir, 'missing.csv')])
+        self.assertRaises(PipelineError, Pipeline([stage], self.tmpdir).run)
+
+    def test_requires(self):
+        stages = [Stage('create_convictions', 'create_convictions',
+            requires=['create_dispositions'])]
+        self.assertRaises(PipelineError, Pipeline, stages, self.tmpdir)
+
+    def test_skip_unchanged(self):
+        csv_filename = os.path.join(self.tmpdir, 'dispositions.csv')
+        call_command('generate_synthetic_data', csv_filename, records=10,
+            stdout=StringIO())
+        pipeline = Pipeline([
+            Stage('load_dispositions_csv', 'load_dispositions_csv',
+                [csv_filename], {'delete': True}, inputs=[csv_filename]),
+            Stage('create_dispositions', 'create_dispositions',
+                options={'delete': True},
+                requires=['load_dispositions_csv']),
+        ], self.tmpdir)
+
+        results = pipeline.run()
+        self.assertFalse(any(r.get('skipped') for r in results.values()))
+        self.assertEqual(Disposition.objects.count(), 10)
+        checkpoint = PipelineStage.objects.get(name='create_dispositions')
+        self.assertIsNotNone(checkpoint.completed)
+
+        results = pipeline.run()
+        self.assertTrue(all(r.get('skipped') for r in results.values()))
+
+        # Only the stage that is forced to run is run again, but the
+        # stages that require it aren't current anymore
+        results = pipeline.run(['load_dispositions_csv'], force=True)
+        self.assertFalse(results['load_dispositions_csv'].get('skipped'))
+        results = pipeline.run()
+        self.assertTrue(results['load_dispositions_csv']['skipped'])
+        self.assertFalse(results['create_dispositions'].get('skipped'))
+
+        # Changing an input file runs the stage and those that require it
+        call_command('generate_synthetic_data', csv_filename, records=20,
+            stdout=StringIO())
+        results = pipeline.run()
+        self.assertFalse(any(r.get('skipped') for r in results.values()))
+        self.assertEqual(Disposition.objects.count(), 20)
+
+
 class StatuteTestCase(unittest.TestCase):
     def test_parse_ilcs_statute(self):
         st = '720-570/401(c)(2)'
@@ -494,4 +980,667 @@ class AddressAnonymizerTestCase(SimpleTestCase):
             anonymized = self.anonymizer.anonymize(address)
             self.assertEqual(anonymized, expected)
 
+    def test_fast_path(self):
+        """
+        Test that common address formats are anonymized without usaddress
+        and that the results match parsing with usaddress
+        """
+        common = [
+            '1234 W MADISON ST',
+            '707 W WAVELAND',
+            '5 N STATE',
+            '10 S LA SALLE ST',
+            '1234 W 63RD ST',
+            '3401 S ST LOUIS AVE',
+            '6400 S COTTAGE GROVE AVE',
+            '12000 S EMERALD',
+            '4800 N KEDZIE PKWY',
+        ]
+        other = [
+            '1234 W MADISON ST APT 2',
+            '1234 W MADISON 2ND FL',
+            '1234 W MADISON 2ND',
+            '1505 S KERNEY 1ST FL',
+            '5920 N HILL #220',
+            '7719 1/2 N LINDA',
+            '12A S PULASKI RD',
+            '1234 MADISON',
+            '1234 N AVE A',
+            '400 E MARTIN LUTHER KING DR',
+            '1234 E SOUTH',
+            'PO BOX 123',
+        ]
+        usaddress_anonymizer = AddressAnonymizer(fast_path=False)
+        for address in common + other:
+            self.assertEqual(self.anonymizer.anonymize(address),
+                usaddress_anonymizer.anonymize(address))
+
+        for address in common:
+            self.assertIsNotNone(self.anonymizer._anonymize_common(address))
+
+        for address in other:
+            self.assertIsNone(self.anonymizer._anonymize_common(address))
+
+
+class SnapshotTestCase(SimpleTestCase):
+    columns = [
+        ('id', 'int'),
+        ('sex', 'str'),
+        ('chrgdispdate', 'date'),
+        ('community_area', 'int'),
+    ]
+
+    rows = [
+        (1, 'male', datetime.date(2006, 1, 13), None),
+        (2, 'female', None, 3),
+        (3, 'male', datetime.date(2007, 1, 4), 4),
+    ]
+
+    class MockQuerySet(object):
+        def __init__(self, rows):
+            self.rows = rows
+
+        def values_list(self, *fields):
+            return self
+
+        def iterator(self):
+            return iter(self.rows)
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_round_trip(self):
+        write_snapshot(self.path, [
+            ('conviction', self.columns, self.MockQuerySet(self.rows)),
+        ])
+        table = load_snapshot(self.path)['conviction']
+
+        self.assertEqual(len(table), 3)
+        self.assertEqual(list(table['id']), [1, 2, 3])
+        self.assertEqual(list(table.decode('sex')), ['male', 'female', 'male'])
+        self.assertEqual(list(table['community_area']), [-1, 3, 4])
+        self.assertEqual(table.value_counts('sex'), {'male': 2, 'female': 1})
+        self.assertEqual(list(table.equals('chrgdispdate',
+            datetime.date(2007, 1, 4))), [False, False, True])
+        self.assertEqual(table.value_counts('sex',
+            mask=table.isin('community_area', [3, 4])),
+            {'male': 1, 'female': 1})
+
+
+CATEGORY_TEST_CONVICTIONS = [
+    ('720-570/401(a)(1)(A)', '720-570/401(a)(1)(A)', 'MFG/DEL HEROIN', '2020'),
+    ('720-570/402(c)', '720-570/402(c)', 'POSS CONTROLLED SUBSTANCE', '2020'),
+    ('720-550/4(a)', '720-550/4(a)', 'POSS CANNABIS/<2.5 GRAMS', '1811'),
+    ('38 9-1E', '720-5/9-1', 'MURDER', '0110'),
+    ('720-5/12-14(a)(1)', '720-5/12-14(a)(1)', 'AGG CRIM SEX ASSAULT', '0261'),
+    ('720-5/19-1(a)', '720-5/19-1(a)', 'BURGLARY', '0610'),
+    ('625-5/11-501(a)(2)', '625-5/11-501(a)(2)', 'DUI', ''),
+    ('625-5/6-303(a)', '625-5/6-303(a)', 'DRIVING REVOKED', ''),
+]
+
+
+class CategoryClassifierTestCase(TestCase):
+    category_methods = {
+        'violent_index': 'violent_index_crimes',
+        'property_index': 'property_index_crimes',
+        'drug': 'drug_crimes',
+        'affecting_women': 'crimes_affecting_women',
+        'homicide': 'homicides',
+        'other': 'other_crimes',
+    }
+
+    def setUp(self):
+        for i, (st, st_fmt, chrgdesc, iucr) in enumerate(CATEGORY_TEST_CONVICTIONS):
+            for j in range(i + 1):
+                Conviction.objects.create(case_number="XXXXXXX{}".format(i),
+                    final_statute=st, final_statute_formatted=st_fmt,
+                    final_chrgdesc=chrgdesc, iucr_code=iucr)
+
+    def test_category_counts(self):
+        """
+        Test that counts by evaluating queries in Python match the counts
+        from filtering in the database
+        """
+        classifier = CategoryClassifier()
+        qs = Conviction.objects.all()
+        counts = qs.category_counts(classifier)
+        for name in classifier.names:
+            method_name = self.category_methods.get(name, name)
+            if name == 'dui':
+                expected = qs.filter(
+                    final_statute_formatted__istartswith='625-5/11-501').count()
+            else:
+                expected = getattr(qs, method_name)().count()
+
+            self.assertEqual(counts[name], expected,
+                "Count mismatch for category {}".format(name))
+
+    def test_drug_reports(self):
+        """
+        Test that the single query drug reports match counting each
+        drug query separately
+        """
+        qs = Conviction.objects.all()
+        counts = dict((name, getattr(qs, name)().count())
+                      for name in get_drug_queries())
+
+        with self.assertNumQueries(1):
+            by_class = qs.drug_by_class()
+        self.assertEqual(by_class, qs._drug_by_class_rows(counts))
+
+        with self.assertNumQueries(1):
+            by_drug_type = qs.drug_by_drug_type()
+        self.assertEqual(by_drug_type, qs._drug_by_drug_type_rows(counts))
+
+        values = dict(((r['offense_type'], r['slug']), r['value'])
+                      for r in by_drug_type)
+        self.assertEqual(values[("Manufacture or Delivery", 'heroin')], 1)
+        self.assertEqual(values[("Possession", 'cannabis')], 3)
+
+    def test_categorize(self):
+        """
+        Test that the category flags match filtering with the category
+        queries
+        """
+        qs = Conviction.objects.all()
+        counts = qs.categorize()
+        for flag, q in CATEGORY_FLAG_QUERIES.items():
+            expected = qs.filter(q).count()
+            self.assertEqual(counts[flag], expected)
+            self.assertEqual(qs.filter(**{flag: True}).count(), expected)
+
+    def test_set_drug_categories(self):
+        """
+        Test that the stored drug categories match filtering with the drug
+        queries
+        """
+        qs = Conviction.objects.all()
+        expected = dict((name, qs.filter(q).count())
+                        for name, q in get_drug_queries().items())
+        self.assertFalse(qs.drug_categories_stored())
+
+        num_stored = qs.set_drug_categories(batch_size=2)
+        self.assertEqual(num_stored, sum(expected.values()))
+        self.assertTrue(qs.drug_categories_stored())
+
+        for name, count in expected.items():
+            drug_qs = getattr(qs, name)()
+            self.assertIn('drug_categories', str(drug_qs.query))
+            self.assertEqual(drug_qs.count(), count)
+
+        # Whether the categories are stored is only checked once for a
+        # QuerySet and the QuerySets made from it
+        qs = Conviction.objects.all()
+        with self.assertNumQueries(1):
+            drug_qs = qs.exclude(final_statute=None)
+            for name in get_drug_queries():
+                getattr(drug_qs, name)()
+            drug_qs.mfg_del_unkwn().mfg_del_att_unkwn()
+
+        # Storing the categories again replaces them
+        self.assertEqual(qs.set_drug_categories(), num_stored)
+
+
+class CountsByAgeRangeTestCase(TestCase):
+    def setUp(self):
+        chrgdispdate = datetime.date(2010, 6, 1)
+        ages = [None, 16, 18, 24, 25, 33, 40, 47, 47, 59, 64, 65, 80]
+        for i, age in enumerate(ages):
+            if age is None:
+                dob = None
+            else:
+                dob = datetime.date(chrgdispdate.year - age, 1, 1)
+
+            st, st_fmt, chrgdesc, iucr = CATEGORY_TEST_CONVICTIONS[
+                i % len(CATEGORY_TEST_CONVICTIONS)]
+            Conviction.objects.create(case_number="XXXXXXX{}".format(i),
+                dob=dob, chrgdispdate=chrgdispdate, final_statute=st,
+                final_statute_formatted=st_fmt, final_chrgdesc=chrgdesc,
+                iucr_code=iucr)
+
+        Conviction.objects.all().set_age_at_disposition()
+        Conviction.objects.all().categorize()
+
+    def test_calculate_age(self):
+        self.assertEqual(calculate_age(datetime.date(1980, 6, 2),
+            datetime.date(2010, 6, 1)), 29)
+        self.assertEqual(calculate_age(datetime.date(1980, 6, 1),
+            datetime.date(2010, 6, 1)), 30)
+        self.assertEqual(calculate_age(datetime.date(2008, 2, 29),
+            datetime.date(2011, 2, 28)), 2)
+        self.assertEqual(calculate_age(datetime.date(2010, 6, 1),
+            datetime.date(2000, 1, 1)), -10)
+        self.assertEqual(calculate_age(None, datetime.date(2000, 1, 1)), None)
+
+    def test_set_age_at_disposition(self):
+        self.assertEqual(Conviction.objects.invalid_age().count(), 2)
+        self.assertEqual(Conviction.objects.filter_by_age(45, 49).count(), 2)
+        self.assertEqual(Conviction.objects.filter_by_age(65, None).count(), 2)
+
+    def test_counts_by_age_range(self):
+        """
+        Test that the single query version of counts_by_age_range()
+        matches counting each age range and category separately
+        """
+        with self.assertNumQueries(1):
+            counts = Conviction.objects.counts_by_age_range()
+
+        expected = Conviction.objects.counts_by_age_range_per_bucket()
+        self.assertEqual(counts, expected)
+        self.assertEqual(counts[-1]['total_convictions'], 2)
+        self.assertEqual(sum(r['total_convictions'] for r in counts), 13)
+
+    def test_disposition_counts_by_age_range(self):
+        """
+        Test that records without category flags are counted by age range
+        """
+        Disposition.objects.create(case_number="XXXXXXX1",
+            dob=datetime.date(1980, 6, 1), chrgdispdate=datetime.date(2010, 6, 1),
+            age_at_disposition=30)
+        counts = Disposition.objects.counts_by_age_range()
+        self.assertEqual([r['total_convictions'] for r in counts],
+            [0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0])
+        self.assertNotIn('violent_convictions', counts[0])
+
+
+class ConvictionGeoQuerySetTestCase(TestCase):
+    def setUp(self):
+        boundary = MultiPolygon(Polygon(((0, 0), (0, 1), (1, 1), (1, 0),
+            (0, 0))))
+        self.community_areas = []
+        for number, population in ((1, 1000), (2, 500), (3, None)):
+            self.community_areas.append(CommunityArea.objects.create(
+                number=number, name="Area {}".format(number), shape_area=1.0,
+                shape_len=4.0, boundary=boundary,
+                total_population=population))
+
+        # Murder, DUI, DUI and a burglary in the first community area and a
+        # sexual assault in the second.  None in the third.
+        for i, community_area in ((3, 0), (6, 0), (6, 0), (5, 0), (4, 1)):
+            st, st_fmt, chrgdesc, iucr = CATEGORY_TEST_CONVICTIONS[i]
+            Conviction.objects.create(case_number="XXXXXXX{}".format(i),
+                final_statute=st, final_statute_formatted=st_fmt,
+                final_chrgdesc=chrgdesc, iucr_code=iucr,
+                community_area=self.community_areas[community_area])
+
+        Conviction.objects.all().categorize()
+
+    def test_with_conviction_annotations(self):
+        with self.assertNumQueries(2):
+            areas = list(CommunityArea.objects.order_by('number')\
+                .with_conviction_annotations())
+
+        self.assertEqual([a.num_convictions for a in areas], [4, 1, 0])
+        self.assertEqual([a.num_homicides for a in areas], [1, 0, 0])
+        self.assertEqual([a.num_affecting_women for a in areas], [0, 1, 0])
+        self.assertEqual([a.convictions_per_capita for a in areas],
+            [0.004, 0.002, None])
+        self.assertEqual([a.affecting_women_per_capita for a in areas],
+            [0.0, 0.002, None])
+
+    def test_order_by_conviction_annotations(self):
+        areas = CommunityArea.objects.filter(total_population__isnull=False)\
+            .with_conviction_annotations()
+        self.assertEqual([a.number for a
+                          in areas.order_by('affecting_women_per_capita')],
+            [1, 2])
+        self.assertEqual(areas.order_by('convictions_per_capita').last()\
+            .number, 1)
+        self.assertEqual(areas.filter(number=2).get().num_convictions, 1)
+
+        areas = CommunityArea.objects.with_conviction_annotations()\
+            .with_dui_annotations().order_by('-num_dui', 'number')
+        self.assertEqual([(a.number, a.num_convictions, a.num_dui)
+                          for a in areas], [(1, 4, 2), (2, 1, 0), (3, 0, 0)])
+
+    def test_with_dui_annotations(self):
+        areas = CommunityArea.objects.order_by('number').with_dui_annotations()
+        self.assertEqual([a.num_dui for a in areas], [2, 0, 0])
+        self.assertEqual([a.pct_dui for a in areas], [0.5, 0.0, None])
+        self.assertEqual([a.dui_per_capita for a in areas], [0.002, 0.0, None])
+
+    def test_load_geographies_from_dispositions(self):
+        """
+        Test that only the convictions in the QuerySet get the geographies
+        of their dispositions
+        """
+        convictions = list(Conviction.objects.order_by('case_number')[:2])
+        for conviction in convictions:
+            Disposition.objects.create(case_number=conviction.case_number,
+                conviction=conviction, community_area=self.community_areas[2])
+
+        num_updated = Conviction.objects.filter(pk=convictions[0].pk)\
+            .load_geographies_from_dispositions()
+        self.assertEqual(num_updated, 1)
+        self.assertEqual(Conviction.objects.get(pk=convictions[0].pk)\
+            .community_area, self.community_areas[2])
+        self.assertEqual(Conviction.objects.get(pk=convictions[1].pk)\
+            .community_area, convictions[1].community_area)
+
+        # Convictions whose dispositions have no geography keep theirs
+        Disposition.objects.update(community_area=None)
+        Conviction.objects.all().load_geographies_from_dispositions()
+        self.assertEqual(Conviction.objects.get(pk=convictions[0].pk)\
+            .community_area, self.community_areas[2])
+
+    def test_most_common_statutes_by_geography(self):
+        """
+        Test that the batched most common statutes match those from the
+        query for each geography
+        """
+        with self.assertNumQueries(1):
+            top_statutes = dict(CommunityArea.objects.all()\
+                .most_common_statutes_by_geography(10))
+
+        self.assertEqual(set(top_statutes.keys()),
+            set([self.community_areas[0].id, self.community_areas[1].id]))
+        for ca in self.community_areas[:2]:
+            expected = ca.most_common_statutes(10)
+            self.assertEqual(
+                sorted((s['statute'], s['chrgdesc'], s['count'])
+                       for s in top_statutes[ca.id]),
+                sorted((s['statute'], s['chrgdesc'], s['count'])
+                       for s in expected))
+
+        top_statutes = dict(CommunityArea.objects.all()\
+            .most_common_statutes_by_geography(1))
+        self.assertEqual(top_statutes[self.community_areas[0].id],
+            [{'statute': '625-5/11-501(a)(2)', 'chrgdesc': 'DUI', 'count': 2}])
+
+    def test_refresh_stats(self):
+        stats_qs = GeographyConvictionStats.objects.for_geography_model(
+            CommunityArea)
+        self.assertFalse(stats_qs.is_fresh())
+
+        num_created = GeographyConvictionStats.objects.refresh(CommunityArea,
+            top_statutes_count=2)
+        self.assertEqual(num_created, 3)
+        self.assertTrue(stats_qs.is_fresh())
+
+        # The annotations look up the stored statistics
+        areas = CommunityArea.objects.order_by('number').with_dui_annotations()
+        self.assertIn(GeographyConvictionStats._meta.db_table,
+            str(areas.query))
+        self.assertEqual([a.pct_dui for a in areas], [0.5, 0.0, None])
+        self.assertEqual([a.number for a in areas.order_by('-num_dui',
+            'number')], [1, 2, 3])
+
+        computed = CommunityArea.objects.all().conviction_stats(
+            use_stored=False)
+        stored = CommunityArea.objects.all().conviction_stats()
+        for ca in self.community_areas:
+            self.assertEqual(stored[ca.id],
+                CommunityArea.objects.all()._get_geo_stats(computed, ca.id))
+
+        top_statutes = stats_qs.top_statutes(2)
+        self.assertEqual(top_statutes[self.community_areas[0].id][0]['count'],
+            2)
+        self.assertEqual(stats_qs.top_statutes(3), None)
+
+        # Categorizing a few convictions doesn't touch the stored
+        # statistics, but the commands that change category flags or
+        # geographies delete them
+        Conviction.objects.filter(community_area=self.community_areas[1])\
+            .categorize()
+        self.assertTrue(stats_qs.exists())
+        call_command('categorize_convictions', stdout=StringIO())
+        self.assertFalse(stats_qs.exists())
+        GeographyConvictionStats.objects.refresh(CommunityArea)
+        call_command('set_conviction_place', stdout=StringIO())
+        self.assertFalse(stats_qs.exists())
+        GeographyConvictionStats.objects.refresh(CommunityArea)
+
+        # Creating a conviction makes the stored statistics stale
+        Conviction.objects.create(case_number="XXXXXXX9",
+            community_area=self.community_areas[2])
+        self.assertFalse(stats_qs.is_fresh())
+        areas = CommunityArea.objects.order_by('number')\
+            .with_conviction_annotations()
+        self.assertEqual(areas[2].num_convictions, 1)
+
+    def test_geojson_values(self):
+        values = CommunityArea.objects.order_by('number').geojson_values()
+        self.assertEqual(list(values[0].keys()), [
+            'num_convictions', 'convictions_per_capita', 'num_homicides',
+            'num_affecting_women', 'affecting_women_per_capita', 'name',
+            'total_population', 'boundary', 'number'])
+        self.assertEqual(values[0]['num_convictions'], 4)
+        self.assertEqual(values[1]['name'], "Area 2")
+
+    def test_geojson_properties(self):
+        """
+        Test the serialized properties against the output of the GeoJSON
+        export before it was streamed: the conviction annotations, then
+        the model fields, without the geometry field
+        """
+        features = json.loads(CommunityArea.objects.order_by('number')\
+            .geojson(simplify=None), object_pairs_hook=OrderedDict)['features']
+        self.assertEqual([list(f['properties'].items()) for f in features], [
+            [('num_convictions', 4), ('convictions_per_capita', 0.004),
+             ('num_homicides', 1), ('num_affecting_women', 0),
+             ('affecting_women_per_capita', 0.0), ('name', "Area 1"),
+             ('total_population', 1000), ('number', 1)],
+            [('num_convictions', 1), ('convictions_per_capita', 0.002),
+             ('num_homicides', 0), ('num_affecting_women', 1),
+             ('affecting_women_per_capita', 0.002), ('name', "Area 2"),
+             ('total_population', 500), ('number', 2)],
+            [('num_convictions', 0), ('convictions_per_capita', None),
+             ('num_homicides', 0), ('num_affecting_women', 0),
+             ('affecting_women_per_capita', None), ('name', "Area 3"),
+             ('total_population', None), ('number', 3)],
+        ])
+        self.assertEqual(features[0]['geometry']['type'], "MultiPolygon")
+
+    def test_iter_geojson(self):
+        """
+        Test that streaming GeoJSON matches the output of djgeojson
+        """
+        qs = CommunityArea.objects.order_by('number')
+        for simplify in (0.0, 0.002, None):
+            expected = qs.geojson(simplify=simplify)
+            self.assertEqual("".join(qs.iter_geojson(simplify=simplify)),
+                expected)
+
+        cached = SimplifiedGeometry.objects.for_geography_model(CommunityArea)
+        self.assertEqual(cached.filter(tolerance=0.002).count(), 3)
+
+        # Geometries that are already cached aren't simplified again
+        self.assertEqual(SimplifiedGeometry.objects.simplify(CommunityArea,
+            0.002), 0)
+
+
+class TopoJSONTestCase(SimpleTestCase):
+    def _square(self, x0):
+        return [[x0, 0], [x0 + 1, 0], [x0 + 1, 1], [x0, 1], [x0, 0]]
+
+    def _ring_coords(self, topo, ring_arcs):
+        coords = []
+        for arc in ring_arcs:
+            points = decode_arc(topo, arc)
+            if coords:
+                points = points[1:]
+            coords.extend(points)
+
+        return coords
+
+    def test_shared_border(self):
+        """Test that a border between adjacent polygons is stored once"""
+        features = [
+            {
+                'type': "Feature",
+                'properties': {'name': "West"},
+                'geometry': {
+                    'type': "Polygon",
+                    'coordinates': [self._square(0)],
+                },
+            },
+            {
+                'type': "Feature",
+                'properties': {'name': "East"},
+                'geometry': {
+                    'type': "MultiPolygon",
+                    'coordinates': [[self._square(1)]],
+                },
+            },
+        ]
+        topo = topology(OrderedDict([('areas', features)]), quantization=3)
+
+        # The shared edge, and the rest of each square
+        self.assertEqual(len(topo['arcs']), 3)
+
+        west, east = topo['objects']['areas']['geometries']
+        self.assertEqual(west['properties'], {'name': "West"})
+        self.assertEqual(east['type'], "MultiPolygon")
+        shared_arcs = set(west['arcs'][0]) & set(~a for a in east['arcs'][0][0])
+        self.assertEqual(len(shared_arcs), 1)
+
+        self.assertEqual(self._ring_coords(topo, west['arcs'][0]),
+            [[1, 0], [1, 1], [0, 1], [0, 0], [1, 0]])
+        self.assertEqual(self._ring_coords(topo, east['arcs'][0][0]),
+            [[1, 0], [2, 0], [2, 1], [1, 1], [1, 0]])
+
+    def test_lines(self):
+        features = [
+            {
+                'properties': {},
+                'geometry': {
+                    'type': "Polygon",
+                    'coordinates': [self._square(0)],
+                },
+            },
+            {
+                'properties': {},
+                'geometry': {
+                    'type': "LineString",
+                    'coordinates': [[0, 0], [1, 0], [2, 0]],
+                },
+            },
+        ]
+        topo = topology(OrderedDict([('lines', features)]))
+        polygon, line = topo['objects']['lines']['geometries']
+        # The line shares its first segment with the square
+        self.assertEqual(line['arcs'][0], polygon['arcs'][0][0])
+        self.assertEqual(decode_arc(topo, line['arcs'][1])[-1], [2.0, 0.0])
+
+    def test_simplify(self):
+        """
+        Test that arcs are simplified after the topology is built, so
+        shared borders still match
+        """
+        # Two areas with a shared border that wiggles slightly
+        border = [[1, 0], [1.01, 0.25], [0.99, 0.5], [1.01, 0.75], [1, 1]]
+        west = [[0, 0]] + border + [[0, 1], [0, 0]]
+        east = border[::-1] + [[2, 1], [2, 0], [1, 0]]
+        features = [
+            {'properties': {'name': "West"},
+             'geometry': {'type': "Polygon", 'coordinates': [west]}},
+            {'properties': {'name': "East"},
+             'geometry': {'type': "Polygon", 'coordinates': [east]}},
+        ]
+        topo = topology(OrderedDict([('areas', features)]), simplify=0.05)
+        west, east = topo['objects']['areas']['geometries']
+        shared_arcs = set(west['arcs'][0]) & set(~a for a in east['arcs'][0])
+        self.assertEqual(len(shared_arcs), 1)
+        shared_arc = shared_arcs.pop()
+        self.assertEqual(len(decode_arc(topo, shared_arc)), 2)
+
+        # Rings that would collapse aren't simplified
+        for arc in range(len(topo['arcs'])):
+            points = decode_arc(topo, arc)
+            if points[0] == points[-1]:
+                self.assertTrue(len(points) >= 4)
+
+    def test_simplify_small_rings(self):
+        """
+        Test that rings made of several arcs don't collapse when they're
+        simplified
+        """
+        features = [
+            {'properties': {'name': "West"},
+             'geometry': {'type': "Polygon",
+                          'coordinates': [self._square(0)]}},
+            {'properties': {'name': "East"},
+             'geometry': {'type': "Polygon",
+                          'coordinates': [self._square(1)]}},
+        ]
+        topo = topology(OrderedDict([('areas', features)]), quantization=3,
+            simplify=10)
+        west, east = topo['objects']['areas']['geometries']
+        self.assertEqual(self._ring_coords(topo, west['arcs'][0]),
+            [[1, 0], [1, 1], [0, 1], [0, 0], [1, 0]])
+        self.assertEqual(self._ring_coords(topo, east['arcs'][0]),
+            [[1, 0], [2, 0], [2, 1], [1, 1], [1, 0]])
+
+    def test_null_geometry(self):
+        features = [
+            {'properties': {'name': "Square"},
+             'geometry': {'type': "Polygon",
+                          'coordinates': [self._square(0)]}},
+            {'properties': {'name': "Nowhere"}, 'geometry': None},
+        ]
+        topo = topology(OrderedDict([('areas', features)]))
+        square, nowhere = topo['objects']['areas']['geometries']
+        self.assertEqual(nowhere, {'type': None,
+            'properties': {'name': "Nowhere"}})
+        self.assertEqual(topo['bbox'], [0, 0, 1, 1])
+
+
+class VectorTileTestCase(SimpleTestCase):
+    def test_encode_polygon_geometry(self):
+        square = [(0, 0), (10, 0), (10, 10), (0, 10), (0, 0)]
+        expected = [9, 0, 0, 26, 20, 0, 0, 20, 19, 0, 15]
+        self.assertEqual(encode_polygon_geometry([[square]]), expected)
+        # Exterior rings are rewound to have a positive area
+        self.assertEqual(encode_polygon_geometry([[square[::-1]]]),
+            [9, 20, 0, 26, 0, 20, 19, 0, 0, 19, 15])
+        # Rings that collapse are dropped
+        self.assertEqual(encode_polygon_geometry([[[(0, 0), (1, 0), (0, 0)]]]),
+            [])
+
+    def test_tiles_for_extent(self):
+        self.assertEqual(list(tiles_for_extent((-1, -1, 1, 1), 0)),
+            [(0, 0, 0)])
+        self.assertEqual(list(tiles_for_extent((-1, -1, 1, 1), 1)),
+            [(1, 0, 0), (1, 0, 1), (1, 1, 0), (1, 1, 1)])
+        # Chicago
+        self.assertEqual(list(tiles_for_extent((-87.63, 41.88, -87.63, 41.88),
+            10)), [(10, 262, 380)])
+        west, south, east, north = tile_bounds(10, 262, 380)
+        self.assertTrue(west <= -87.63 <= east)
+        self.assertTrue(south <= 41.88 <= north)
+
+    def test_render(self):
+        square = Polygon(((0, 0), (1, 0), (1, 1), (0, 1), (0, 0)))
+        renderer = TileRenderer([
+            ('squares', [(square, {'name': "Square", 'num_convictions': 5})]),
+        ])
+        tile = renderer.render(1, 1, 0)
+        self.assertTrue(tile.startswith(b'\x1a'))
+        self.assertIn(b'squares', tile)
+        self.assertIn(b'num_convictions', tile)
+        self.assertIsNone(renderer.render(1, 0, 1))
+
+    def test_mbtiles_writer(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'test.mbtiles')
+            writer = MBTilesWriter(path)
+            writer.write_metadata({'name': "Test", 'json': {'a': 1}})
+            writer.write_tiles([(1, 1, 0, b'tile')])
+            writer.close()
 
+            db = sqlite3.connect(path)
+            self.assertEqual(dict(db.execute("SELECT name, value FROM metadata")),
+                {'name': "Test", 'json': '{"a": 1}'})
+            rows = list(db.execute("SELECT zoom_level, tile_column, tile_row, "
+                "tile_data FROM tiles"))
+            db.close()
+            self.assertEqual(len(rows), 1)
+            # Rows are stored in the TMS scheme
+            self.assertEqual(rows[0][:3], (1, 1, 1))
+            self.assertEqual(gzip.decompress(bytes(rows[0][3])), b'tile')
+        finally:
+            shutil.rmtree(tmpdir)
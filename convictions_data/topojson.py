@@ -0,0 +1,477 @@
+"""
+Convert GeoJSON features to TopoJSON
+
+TopoJSON stores each line that's shared between geometries, like the
+border between two adjacent community areas, once as an "arc" that
+geometries reference by index.  Coordinates are quantized to integers on
+a grid and delta-encoded, which makes the output much smaller than the
+equivalent GeoJSON.
+
+This implements the parts of the TopoJSON format that we need, for
+LineString, MultiLineString, Polygon and MultiPolygon geometries.  See
+https://github.com/mbostock/topojson-specification
+
+Geometries are simplified after they're converted to arcs, so a shared
+border is simplified once and stays shared, rather than each side being
+simplified differently and leaving gaps or overlaps between geometries.
+
+"""
+from collections import OrderedDict
+
+DEFAULT_QUANTIZATION = 1e5
+"""
+Default number of distinct values for quantized coordinates along each
+dimension
+"""
+
+
+class Quantizer(object):
+    """Convert coordinates to and from integers on a grid"""
+
+    def __init__(self, bbox, quantization=DEFAULT_QUANTIZATION):
+        x0, y0, x1, y1 = bbox
+        self.translate = [x0, y0]
+        self.scale = [
+            (x1 - x0) / (quantization - 1) if x1 > x0 else 1,
+            (y1 - y0) / (quantization - 1) if y1 > y0 else 1,
+        ]
+
+    def quantize(self, point):
+        return (int(round((point[0] - self.translate[0]) / self.scale[0])),
+                int(round((point[1] - self.translate[1]) / self.scale[1])))
+
+    def dequantize(self, point):
+        return [point[0] * self.scale[0] + self.translate[0],
+                point[1] * self.scale[1] + self.translate[1]]
+
+    def transform(self):
+        return {"scale": self.scale, "translate": self.translate}
+
+
+def _geometry_lines(geometry):
+    """
+    Return the lines of a GeoJSON geometry and the structure to rebuild it
+
+    Returns:
+        Tuple of a list of ``(coordinates, is_ring)`` tuples and a nested
+        list of the same shape as the geometry's coordinates, with indexes
+        into the list of lines in place of the lines.
+
+    """
+    lines = []
+
+    def add(coords, is_ring):
+        lines.append((coords, is_ring))
+        return len(lines) - 1
+
+    geom_type = geometry['type']
+    coords = geometry['coordinates']
+    if geom_type == 'LineString':
+        structure = add(coords, False)
+    elif geom_type == 'MultiLineString':
+        structure = [add(line, False) for line in coords]
+    elif geom_type == 'Polygon':
+        structure = [add(ring, True) for ring in coords]
+    elif geom_type == 'MultiPolygon':
+        structure = [[add(ring, True) for ring in polygon]
+                     for polygon in coords]
+    else:
+        raise ValueError("Unsupported geometry type '{}'".format(geom_type))
+
+    return lines, structure
+
+
+def _bbox(features):
+    xs = []
+    ys = []
+    for f in features:
+        if f['geometry'] is None:
+            continue
+
+        lines, structure = _geometry_lines(f['geometry'])
+        for coords, is_ring in lines:
+            for point in coords:
+                xs.append(point[0])
+                ys.append(point[1])
+
+    if not xs:
+        return [0, 0, 0, 0]
+
+    return [min(xs), min(ys), max(xs), max(ys)]
+
+
+def _dedupe_points(points):
+    deduped = []
+    for point in points:
+        if not deduped or deduped[-1] != point:
+            deduped.append(point)
+
+    return deduped
+
+
+def _neighbor_pairs(points, is_ring):
+    """Generate each point of a line and its sorted pair of neighbors"""
+    n = len(points)
+    for i, point in enumerate(points):
+        if is_ring:
+            prev_point = points[i - 1]
+            next_point = points[(i + 1) % n]
+        else:
+            prev_point = points[i - 1] if i > 0 else None
+            next_point = points[i + 1] if i < n - 1 else None
+
+        pair = (prev_point, next_point)
+        if next_point is not None and (prev_point is None or
+                next_point < prev_point):
+            pair = (next_point, prev_point)
+
+        yield point, pair
+
+
+def _rotate_to_min(points):
+    i = points.index(min(points))
+    return points[i:] + points[:i]
+
+
+def _segment_distance(point, start, end, scale):
+    """
+    Return the distance from a quantized point to a quantized line segment,
+    in the units of the original coordinates
+    """
+    px, py = point[0] * scale[0], point[1] * scale[1]
+    x0, y0 = start[0] * scale[0], start[1] * scale[1]
+    x1, y1 = end[0] * scale[0], end[1] * scale[1]
+    dx = x1 - x0
+    dy = y1 - y0
+    length_squared = dx * dx + dy * dy
+    if length_squared:
+        t = max(0, min(1, ((px - x0) * dx + (py - y0) * dy) / length_squared))
+        x0 += t * dx
+        y0 += t * dy
+
+    return ((px - x0) ** 2 + (py - y0) ** 2) ** 0.5
+
+
+def _simplify_arc(arc, tolerance, scale):
+    """
+    Simplify an arc with the Douglas-Peucker algorithm
+
+    The first and last points, which are where the arc meets other arcs,
+    are always kept.  Rings that would collapse are handled by
+    ``Topology._simplify_arcs()``.
+
+    Args:
+        arc: List of quantized points.
+        tolerance (float): Maximum distance, in the units of the original
+            coordinates, between a removed point and the simplified arc.
+        scale: Scale of the quantized coordinates, as in
+            ``Quantizer.scale``.
+
+    Returns:
+        List of the points that are kept.
+
+    """
+    keep = [False] * len(arc)
+    keep[0] = keep[-1] = True
+    # Use a stack rather than recursion because arcs can have many points
+    stack = [(0, len(arc) - 1)]
+    while stack:
+        first, last = stack.pop()
+        max_distance = 0
+        max_i = None
+        for i in range(first + 1, last):
+            distance = _segment_distance(arc[i], arc[first], arc[last], scale)
+            if distance > max_distance:
+                max_distance = distance
+                max_i = i
+
+        if max_i is not None and max_distance > tolerance:
+            keep[max_i] = True
+            stack.append((first, max_i))
+            stack.append((max_i, last))
+
+    return [point for point, kept in zip(arc, keep) if kept]
+
+
+def _ring_size(ring_arcs, arcs):
+    """Return the number of points in a ring, including the closing point"""
+    return sum(len(arcs[~i if i < 0 else i]) - 1 for i in ring_arcs) + 1
+
+
+class Topology(object):
+    """
+    Build a TopoJSON topology from GeoJSON features
+
+    """
+
+    def __init__(self, quantization=DEFAULT_QUANTIZATION, simplify=0.0):
+        self.quantization = quantization
+        self.simplify = simplify
+
+    def _quantized_lines(self, lines):
+        quantized = []
+        for coords, is_ring in lines:
+            points = _dedupe_points([self._quantizer.quantize(p)
+                                     for p in coords])
+            if is_ring:
+                # Drop the point that closes the ring.  We'll add it back
+                # when cutting the ring into arcs.
+                if len(points) > 1 and points[0] == points[-1]:
+                    points = points[:-1]
+                if len(points) < 3:
+                    # The ring collapsed when it was quantized
+                    points = None
+            elif len(points) < 2:
+                points = None
+
+            quantized.append((points, is_ring))
+
+        return quantized
+
+    def _find_junctions(self, all_lines):
+        pairs = {}
+        junctions = set()
+        for points, is_ring in all_lines:
+            if points is None:
+                continue
+
+            if not is_ring:
+                junctions.add(points[0])
+                junctions.add(points[-1])
+
+            for point, pair in _neighbor_pairs(points, is_ring):
+                seen_pair = pairs.setdefault(point, pair)
+                if seen_pair != pair:
+                    junctions.add(point)
+
+        return junctions
+
+    def _cut(self, points, is_ring, junctions):
+        """Cut a line into arcs at the junctions"""
+        if is_ring:
+            junction_indexes = [i for i, p in enumerate(points)
+                                if p in junctions]
+            if not junction_indexes:
+                # A ring that doesn't share any points is a single arc
+                return [points + [points[0]]]
+
+            start = junction_indexes[0]
+            points = points[start:] + points[:start]
+            points.append(points[0])
+
+        arcs = []
+        arc = [points[0]]
+        for point in points[1:-1]:
+            arc.append(point)
+            if point in junctions:
+                arcs.append(arc)
+                arc = [point]
+        arc.append(points[-1])
+        arcs.append(arc)
+
+        return arcs
+
+    def _arc_index(self, arc, is_closed_ring):
+        if is_closed_ring:
+            # Rings that are a single arc can start at any point, so use
+            # a canonical starting point for matching
+            ring = arc[:-1]
+            key = tuple(_rotate_to_min(ring))
+            reversed_key = tuple(_rotate_to_min(ring[::-1]))
+            key = key + key[:1]
+            reversed_key = reversed_key + reversed_key[:1]
+        else:
+            key = tuple(arc)
+            reversed_key = tuple(arc[::-1])
+
+        if key in self._arc_indexes:
+            return self._arc_indexes[key]
+
+        if reversed_key in self._arc_indexes:
+            return ~self._arc_indexes[reversed_key]
+
+        i = len(self._arcs)
+        self._arcs.append(list(key))
+        self._arc_indexes[key] = i
+        return i
+
+    def _line_arcs(self, points, is_ring, junctions):
+        arcs = self._cut(points, is_ring, junctions)
+        is_closed_ring = is_ring and len(arcs) == 1 and arcs[0][0] == arcs[0][-1]
+        return [self._arc_index(arc, is_closed_ring) for arc in arcs]
+
+    def _geometry(self, geom_type, structure, line_arcs):
+        if geom_type == 'LineString':
+            arcs = line_arcs[structure]
+        elif geom_type == 'MultiLineString':
+            arcs = [line_arcs[i] for i in structure if line_arcs[i]]
+        elif geom_type == 'Polygon':
+            arcs = self._polygon_arcs(structure, line_arcs)
+        else:
+            arcs = [a for a in (self._polygon_arcs(polygon, line_arcs)
+                                for polygon in structure) if a]
+
+        if not arcs:
+            return {"type": None}
+
+        return {"type": geom_type, "arcs": arcs}
+
+    def _polygon_arcs(self, rings, line_arcs):
+        if not line_arcs[rings[0]]:
+            # The exterior ring collapsed, so drop the whole polygon
+            return []
+
+        return [line_arcs[i] for i in rings if line_arcs[i]]
+
+    def _simplify_arcs(self, rings):
+        """
+        Simplify the arcs of the topology
+
+        A ring made of several arcs, like one whose sides are all shared
+        with neighbors, can collapse even though each of its arcs still
+        has its endpoints.  The arcs of rings that would have fewer than
+        four points are left unsimplified.  The arcs are shared, so this
+        also leaves the matching borders of the neighbors unsimplified.
+
+        Args:
+            rings: List of the lists of arc indexes of each ring.
+
+        Returns:
+            List of the simplified arcs.
+
+        """
+        arcs = [_simplify_arc(arc, self.simplify, self._quantizer.scale)
+                for arc in self._arcs]
+        # Restoring arcs only adds points, so one pass is enough
+        for ring_arcs in rings:
+            if _ring_size(ring_arcs, arcs) < 4:
+                for i in ring_arcs:
+                    i = ~i if i < 0 else i
+                    arcs[i] = self._arcs[i]
+
+        return arcs
+
+    def _encode_arc(self, arc):
+        encoded = [list(arc[0])]
+        for prev_point, point in zip(arc, arc[1:]):
+            encoded.append([point[0] - prev_point[0], point[1] - prev_point[1]])
+
+        return encoded
+
+    def build(self, objects):
+        """
+        Build a topology
+
+        Args:
+            objects: Ordered dictionary mapping object names to lists of
+                GeoJSON Feature dictionaries.
+
+        Returns:
+            Dictionary that can be serialized as a TopoJSON Topology.
+            Each object is a GeometryCollection of the features'
+            geometries, with their properties.  Features without a
+            geometry are included with a null geometry type.
+
+        """
+        features = [f for object_features in objects.values()
+                    for f in object_features]
+        bbox = _bbox(features)
+        self._quantizer = Quantizer(bbox, self.quantization)
+        self._arcs = []
+        self._arc_indexes = {}
+
+        feature_lines = []
+        all_lines = []
+        for f in features:
+            if f['geometry'] is None:
+                feature_lines.append(None)
+                continue
+
+            lines, structure = _geometry_lines(f['geometry'])
+            lines = self._quantized_lines(lines)
+            feature_lines.append((lines, structure))
+            all_lines.extend(lines)
+
+        junctions = self._find_junctions(all_lines)
+
+        geometries = []
+        rings = []
+        for f, lines_structure in zip(features, feature_lines):
+            if lines_structure is None:
+                geometry = {"type": None}
+            else:
+                lines, structure = lines_structure
+                line_arcs = [self._line_arcs(points, is_ring, junctions)
+                             if points is not None else []
+                             for points, is_ring in lines]
+                rings.extend(arcs for arcs, (points, is_ring)
+                             in zip(line_arcs, lines) if is_ring and arcs)
+                geometry = self._geometry(f['geometry']['type'], structure,
+                    line_arcs)
+            geometry['properties'] = f.get('properties', {})
+            geometries.append(geometry)
+
+        arcs = self._arcs
+        if self.simplify:
+            arcs = self._simplify_arcs(rings)
+
+        topology_objects = OrderedDict()
+        i = 0
+        for name, object_features in objects.items():
+            topology_objects[name] = {
+                "type": "GeometryCollection",
+                "geometries": geometries[i:i + len(object_features)],
+            }
+            i += len(object_features)
+
+        return OrderedDict([
+            ("type", "Topology"),
+            ("bbox", bbox),
+            ("transform", self._quantizer.transform()),
+            ("objects", topology_objects),
+            ("arcs", [self._encode_arc(arc) for arc in arcs]),
+        ])
+
+
+def topology(objects, quantization=DEFAULT_QUANTIZATION, simplify=0.0):
+    """
+    Convert GeoJSON features to a TopoJSON topology
+
+    Args:
+        objects: Ordered dictionary mapping object names to lists of
+            GeoJSON Feature dictionaries.
+        quantization (float): Number of distinct values for quantized
+            coordinates along each dimension.
+        simplify (float): Tolerance, in the units of the coordinates, for
+            simplifying the arcs.  Default is 0, which doesn't simplify
+            them.
+
+    Returns:
+        Dictionary that can be serialized as TopoJSON.
+
+    """
+    return Topology(quantization, simplify).build(objects)
+
+
+def decode_arc(topology_dict, arc):
+    """
+    Return the coordinates of an arc, for an arc index as referenced by
+    a geometry, including negative (reversed) indexes
+    """
+    reverse = arc < 0
+    if reverse:
+        arc = ~arc
+
+    transform = topology_dict['transform']
+    x = y = 0
+    points = []
+    for dx, dy in topology_dict['arcs'][arc]:
+        x += dx
+        y += dy
+        points.append([x * transform['scale'][0] + transform['translate'][0],
+                       y * transform['scale'][1] + transform['translate'][1]])
+
+    if reverse:
+        points.reverse()
+
+    return points
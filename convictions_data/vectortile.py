@@ -0,0 +1,493 @@
+"""
+Render geographies as Mapbox Vector Tiles and store them in MBTiles files
+
+Tiles are encoded following version 2 of the Mapbox Vector Tile
+specification, https://github.com/mapbox/vector-tile-spec, and stored
+gzipped in an MBTiles SQLite database,
+https://github.com/mapbox/mbtiles-spec.  The protocol buffer encoding is
+simple enough that we write it ourselves instead of depending on a
+protobuf library.
+
+Geometries are expected to be in WGS84 (SRID 4326).  Because a Web
+Mercator tile's bounds are a rectangle in longitude and latitude, we clip
+geometries to tiles in WGS84 and only project the coordinates that are
+left.
+
+"""
+import gzip
+import io
+import json
+import math
+import sqlite3
+import struct
+
+from django.contrib.gis.geos import GEOSGeometry, Polygon
+
+DEFAULT_EXTENT = 4096
+"""Number of units along each side of a tile's coordinate grid"""
+
+DEFAULT_BUFFER = 64
+"""
+Number of tile units that geometries extend past the edges of each tile,
+so rendered strokes aren't cut off at tile edges
+"""
+
+MAX_LATITUDE = 85.0511287798066
+"""Latitude of the top edge of the Web Mercator world"""
+
+# Geometry types
+POLYGON = 3
+
+# Geometry commands
+MOVE_TO = 1
+LINE_TO = 2
+CLOSE_PATH = 7
+
+# Protocol buffer wire types
+VARINT = 0
+FIXED64 = 1
+LENGTH_DELIMITED = 2
+
+
+def lonlat_to_tile_fraction(lon, lat, zoom):
+    """
+    Return the fractional tile coordinates of a point at a zoom level
+
+    Args:
+        lon (float): Longitude.
+        lat (float): Latitude.
+        zoom (int): Zoom level.
+
+    Returns:
+        Tuple of x, y where the integer parts are the column and row of
+        the tile containing the point, in the XYZ scheme, and the
+        fractional parts are the position of the point within the tile.
+
+    """
+    n = 2 ** zoom
+    lat = max(min(lat, MAX_LATITUDE), -MAX_LATITUDE)
+    lat_rad = math.radians(lat)
+    x = (lon + 180.0) / 360.0 * n
+    y = (1.0 - math.log(math.tan(lat_rad) + 1.0 / math.cos(lat_rad)) /
+         math.pi) / 2.0 * n
+    return x, y
+
+
+def tile_bounds(zoom, x, y):
+    """
+    Return the bounds of a tile in longitude and latitude
+
+    Returns:
+        Tuple of west, south, east, north.
+
+    """
+    n = 2.0 ** zoom
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return (x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0,
+            lat(y))
+
+
+def tiles_for_extent(extent, zoom):
+    """
+    Generate the tiles that cover a bounding box at a zoom level
+
+    Args:
+        extent: Tuple of xmin, ymin, xmax, ymax in longitude and latitude,
+            as returned by ``GEOSGeometry.extent``.
+        zoom (int): Zoom level.
+
+    Yields:
+        Tuples of zoom, x, y in the XYZ scheme.
+
+    """
+    xmin, ymin, xmax, ymax = extent
+    max_index = 2 ** zoom - 1
+    x0, y0 = lonlat_to_tile_fraction(xmin, ymax, zoom)
+    x1, y1 = lonlat_to_tile_fraction(xmax, ymin, zoom)
+    for x in range(int(x0), min(int(x1), max_index) + 1):
+        for y in range(int(y0), min(int(y1), max_index) + 1):
+            yield zoom, x, y
+
+
+def _zigzag(n):
+    return (n << 1) ^ (n >> 63)
+
+
+def _varint(n):
+    encoded = bytearray()
+    while True:
+        byte = n & 0x7f
+        n >>= 7
+        if n:
+            encoded.append(byte | 0x80)
+        else:
+            encoded.append(byte)
+            return bytes(encoded)
+
+
+def _key(field_number, wire_type):
+    return _varint((field_number << 3) | wire_type)
+
+
+def _varint_field(field_number, value):
+    return _key(field_number, VARINT) + _varint(value)
+
+
+def _bytes_field(field_number, value):
+    if not isinstance(value, bytes):
+        value = value.encode('utf-8')
+    return _key(field_number, LENGTH_DELIMITED) + _varint(len(value)) + value
+
+
+def _packed_field(field_number, values):
+    return _bytes_field(field_number, b''.join(_varint(v) for v in values))
+
+
+def _command(command_id, count):
+    return (command_id & 0x7) | (count << 3)
+
+
+def _ring_area(ring):
+    """Return twice the signed area of a ring, in tile coordinates"""
+    return sum(x0 * y1 - x1 * y0
+               for (x0, y0), (x1, y1) in zip(ring, ring[1:] + ring[:1]))
+
+
+def encode_polygon_geometry(polygons):
+    """
+    Encode polygons as a vector tile geometry command sequence
+
+    Args:
+        polygons: List of polygons in tile coordinates.  Each polygon is a
+            list of rings, exterior ring first, and each ring a list of
+            integer (x, y) tuples.  Rings may, but don't have to, repeat
+            their first point at the end.
+
+    Returns:
+        List of integers of the encoded commands and parameters.  The
+        list is empty if all the polygons collapsed to nothing at this
+        resolution.
+
+    """
+    commands = []
+    cursor = (0, 0)
+    for polygon in polygons:
+        for i, ring in enumerate(polygon):
+            points = []
+            for point in ring:
+                if not points or points[-1] != point:
+                    points.append(point)
+            if len(points) > 1 and points[0] == points[-1]:
+                points.pop()
+
+            area = _ring_area(points) if len(points) >= 3 else 0
+            if area == 0:
+                if i == 0:
+                    # Without an exterior ring, skip the whole polygon
+                    break
+                continue
+
+            # Exterior rings have a positive area and interior rings a
+            # negative area in tile coordinates, where y points down
+            if (area > 0) != (i == 0):
+                points.reverse()
+
+            commands.append(_command(MOVE_TO, 1))
+            for j, (x, y) in enumerate(points):
+                if j == 1:
+                    commands.append(_command(LINE_TO, len(points) - 1))
+                commands.append(_zigzag(x - cursor[0]))
+                commands.append(_zigzag(y - cursor[1]))
+                cursor = (x, y)
+            commands.append(_command(CLOSE_PATH, 1))
+
+    return commands
+
+
+def _encode_value(value):
+    if isinstance(value, bool):
+        return _varint_field(7, int(value))
+    if isinstance(value, int):
+        if value < 0:
+            return _varint_field(6, _zigzag(value))
+        return _varint_field(5, value)
+    if isinstance(value, float):
+        return _key(3, FIXED64) + struct.pack('<d', value)
+    return _bytes_field(1, str(value))
+
+
+def encode_layer(name, features, extent=DEFAULT_EXTENT):
+    """
+    Encode a vector tile layer
+
+    Args:
+        name (str): Layer name.
+        features: Iterable of tuples of an encoded geometry, as returned by
+            ``encode_polygon_geometry()``, and a dictionary of
+            properties.  Properties with a value of ``None`` are omitted.
+        extent (int): Size of the tile coordinate grid.
+
+    Returns:
+        Bytes of the serialized Layer message.
+
+    """
+    keys = []
+    key_indexes = {}
+    values = []
+    value_indexes = {}
+    encoded_features = []
+    for geometry, properties in features:
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+
+            if key not in key_indexes:
+                key_indexes[key] = len(keys)
+                keys.append(key)
+
+            value_key = (type(value), value)
+            if value_key not in value_indexes:
+                value_indexes[value_key] = len(values)
+                values.append(value)
+
+            tags.extend([key_indexes[key], value_indexes[value_key]])
+
+        encoded_features.append(
+            _packed_field(2, tags) +
+            _varint_field(3, POLYGON) +
+            _packed_field(4, geometry))
+
+    return b''.join(
+        [_varint_field(15, 2), _bytes_field(1, name)] +
+        [_bytes_field(2, f) for f in encoded_features] +
+        [_bytes_field(3, k) for k in keys] +
+        [_bytes_field(4, _encode_value(v)) for v in values] +
+        [_varint_field(5, extent)])
+
+
+def encode_tile(layers, extent=DEFAULT_EXTENT):
+    """
+    Encode a vector tile
+
+    Args:
+        layers: Iterable of tuples of a layer name and its features, as
+            expected by ``encode_layer()``.  Layers without any features
+            are omitted.
+        extent (int): Size of the tile coordinate grid.
+
+    Returns:
+        Bytes of the serialized Tile message.
+
+    """
+    return b''.join(_bytes_field(3, encode_layer(name, features, extent))
+                    for name, features in layers if features)
+
+
+class TileRenderer(object):
+    """
+    Clip geographies to tiles and encode them
+
+    Args:
+        layers: List of tuples of a layer name and a list of
+            ``(geometry, properties)`` tuples, where ``geometry`` is a
+            ``GEOSGeometry`` or its WKB and ``properties`` is a
+            dictionary.
+        extent (int): Size of the tile coordinate grid.
+        buffer (int): Number of tile units to include beyond the edges
+            of each tile.
+
+    """
+
+    def __init__(self, layers, extent=DEFAULT_EXTENT, buffer=DEFAULT_BUFFER):
+        self.extent = extent
+        self.buffer = buffer
+        self.layers = []
+        for name, features in layers:
+            geometries = []
+            for geometry, properties in features:
+                if not isinstance(geometry, GEOSGeometry):
+                    geometry = GEOSGeometry(memoryview(geometry))
+                if not geometry.valid:
+                    geometry = geometry.buffer(0)
+                geometries.append((geometry, geometry.extent, properties))
+            self.layers.append((name, geometries))
+
+        # Simplified geometries for the zoom level being rendered, by
+        # layer and feature index
+        self._simplified = {}
+        self._simplified_zoom = None
+
+    def _simplify(self, layer_index, feature_index, geometry, zoom):
+        if zoom != self._simplified_zoom:
+            self._simplified = {}
+            self._simplified_zoom = zoom
+
+        key = (layer_index, feature_index)
+        if key not in self._simplified:
+            # Simplify to about the size of a tile unit at this zoom level
+            tolerance = 360.0 / (2 ** zoom * self.extent)
+            self._simplified[key] = geometry.simplify(tolerance,
+                preserve_topology=True)
+
+        return self._simplified[key]
+
+    def _tile_coords(self, ring, zoom, x, y):
+        coords = []
+        for lon, lat in ring:
+            tile_x, tile_y = lonlat_to_tile_fraction(lon, lat, zoom)
+            coords.append((int(round((tile_x - x) * self.extent)),
+                           int(round((tile_y - y) * self.extent))))
+
+        return coords
+
+    def _polygons(self, geometry):
+        if geometry.geom_type == 'Polygon':
+            return [geometry]
+        if geometry.geom_type in ('MultiPolygon', 'GeometryCollection'):
+            return [p for g in geometry for p in self._polygons(g)]
+
+        # Clipping can leave lines and points along the tile's edges
+        return []
+
+    def render(self, zoom, x, y):
+        """
+        Render a tile
+
+        Returns:
+            Bytes of the encoded tile, or ``None`` if no geographies
+            intersect the tile.
+
+        """
+        west, south, east, north = tile_bounds(zoom, x, y)
+        pad_x = (east - west) * self.buffer / self.extent
+        pad_y = (north - south) * self.buffer / self.extent
+        clip_extent = (west - pad_x, south - pad_y, east + pad_x,
+                       north + pad_y)
+        clip = Polygon.from_bbox(clip_extent)
+
+        layers = []
+        for i, (name, geometries) in enumerate(self.layers):
+            features = []
+            for j, (geometry, extent, properties) in enumerate(geometries):
+                if (extent[0] > clip_extent[2] or extent[2] < clip_extent[0] or
+                        extent[1] > clip_extent[3] or
+                        extent[3] < clip_extent[1]):
+                    continue
+
+                clipped = self._simplify(i, j, geometry, zoom)\
+                    .intersection(clip)
+                polygons = [[self._tile_coords(ring.coords, zoom, x, y)
+                             for ring in polygon]
+                            for polygon in self._polygons(clipped)]
+                encoded = encode_polygon_geometry(polygons)
+                if encoded:
+                    features.append((encoded, properties))
+
+            layers.append((name, features))
+
+        if not any(features for name, features in layers):
+            return None
+
+        return encode_tile(layers, self.extent)
+
+
+class MBTilesWriter(object):
+    """
+    Write tiles to an MBTiles SQLite database
+
+    Args:
+        path (str): Path of the database file.  Existing tiles and
+            metadata are replaced.
+
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS metadata (name text, value text);
+            CREATE UNIQUE INDEX IF NOT EXISTS name ON metadata (name);
+            CREATE TABLE IF NOT EXISTS tiles (zoom_level integer,
+                tile_column integer, tile_row integer, tile_data blob);
+            CREATE UNIQUE INDEX IF NOT EXISTS tile_index ON tiles
+                (zoom_level, tile_column, tile_row);
+            DELETE FROM metadata;
+            DELETE FROM tiles;
+        """)
+
+    def write_metadata(self, metadata):
+        """
+        Write the tileset's metadata
+
+        Args:
+            metadata: Dictionary of metadata values.  Values that aren't
+                strings are serialized as JSON.
+
+        """
+        rows = []
+        for name, value in metadata.items():
+            if not isinstance(value, str):
+                value = json.dumps(value)
+            rows.append((name, value))
+
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO metadata (name, value) VALUES (?, ?)", rows)
+        self.connection.commit()
+
+    def write_tiles(self, tiles):
+        """
+        Write tiles
+
+        Args:
+            tiles: Iterable of tuples of zoom, x, y, in the XYZ scheme,
+                and the encoded tile.  The tile data is gzipped, and the
+                row flipped to the TMS scheme used by MBTiles.
+
+        """
+        rows = [(zoom, x, 2 ** zoom - 1 - y, sqlite3.Binary(_gzip(data)))
+                for zoom, x, y, data in tiles]
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO tiles "
+            "(zoom_level, tile_column, tile_row, tile_data) "
+            "VALUES (?, ?, ?, ?)", rows)
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+def _gzip(data):
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+        f.write(data)
+
+    return buf.getvalue()
+
+
+# Renderer for each worker process, set up once by ``init_worker()`` so
+# the geographies are only sent to each process once
+_renderer = None
+
+
+def init_worker(layers, extent=DEFAULT_EXTENT, buffer=DEFAULT_BUFFER):
+    """Set up the tile renderer in a worker process"""
+    global _renderer
+    _renderer = TileRenderer(layers, extent, buffer)
+
+
+def render_tile(tile):
+    """
+    Render a tile in a worker process
+
+    Args:
+        tile: Tuple of zoom, x, y.
+
+    Returns:
+        Tuple of zoom, x, y and the encoded tile, or ``None``.
+
+    """
+    zoom, x, y = tile
+    return zoom, x, y, _renderer.render(zoom, x, y)